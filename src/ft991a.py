@@ -2,29 +2,50 @@
 # When it's good, it's very good.
 # When it's bad, it's better than nothing.
 # When it lies to you, it may be a while before you realize something's wrong.
+import csv
+import functools
+import inspect
+import json
+import logging
+import os
+import queue
 import re
+import threading
 import time
-from collections import namedtuple
-from typing import Optional, Union
+from collections.abc import Mapping
+from types import FunctionType, MappingProxyType
+from typing import Callable, Optional, Union
 import serial
 
+from ft991a_auto_information import AutoInformation, FrameEvent
+from ft991a_cache import StateCache
 from ft991a_config import Ft991aConfig
+from ft991a_link import LinkProfile
+from ft991a_metrics import Metrics
+from ft991a_recorder import ReplaySerial, TrafficRecorder, load_recording
+from ft991a_responses import (InformationState, MemoryChannel, TunerState, decode_information,
+                              decode_memory_channel, decode_meter, decode_tuner, decode_tx_state, read_key)
+from ft991a_tune_cache import TuneCache
 from menu import Menu
 
 
-COMMANDS_CSV = "commands.csv"
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+COMMANDS_CSV = os.path.join(SRC_DIR, "commands.csv")
+
 DEBUG = False
 
+logger = logging.getLogger(__name__)
+
 
 def parse_raw_command_data():
-    hm_file = "archive/hm.txt"
+    hm_file = os.path.join(SRC_DIR, "archive", "hm.txt")
     with open(hm_file, "r") as hmf:
         data = hmf.read()
 
     data = data.split("\n")
 
     with open(COMMANDS_CSV, "w") as cof:
-        cof.write("command, description, set, read, answer\n")
+        cof.write("command,description,set,read,answer\n")
         for line in data:
             command, description, _set, _read, _answer, _ = line.split("\t")
 
@@ -32,11 +53,27 @@ def parse_raw_command_data():
             _read = 1 if _read == "O" else 0
             _answer = 1 if _answer == "O" else 0
 
-            s = f"{command.upper()}, {description.title()}, {_set}, {_read}, {_answer}\n"
+            s = f"{command.upper()},{description.title()},{_set},{_read},{_answer}\n"
             print(s)
             cof.write(s)
 
 
+# Decoders of answer types in Ft991aConfig.answer_types
+DECODERS = {
+    "int": int,
+    "bool": lambda value: value == "1",
+    "str": str,
+}
+
+
+def answer_pattern(command: str):
+    """Compiled pattern matching answer frame of command, parameter in group 1.
+
+    :param command: e.g. "FA" or "FA;"
+    """
+    return re.compile(fr"^{command[:2]}([\d+\-A-Za-z ]*);")
+
+
 class CommandError(Exception):
     pass
 
@@ -62,6 +99,12 @@ class Ft991aCommand:
         self.allow_read = allow_read
         self.allow_answer = allow_answer
 
+        # Codec, built once so sending and parsing do not compile or format anything per call
+        self.read_length = Ft991aConfig.read_parameter_length.get(command, 0)
+        self.pattern = answer_pattern(command)
+        self.decoder = DECODERS[Ft991aConfig.answer_types.get(command, "str")]
+        self.__bare = f"{command}{self.TERMINATOR}"
+
     @staticmethod
     def __check_command(command):
         if len(command) != 2:
@@ -73,28 +116,76 @@ class Ft991aCommand:
             raise ParameterError(f"Parameter type({repr(parameter)}) must be <str>.")
 
     def get(self, parameter: Optional[Union[str, int]] = None):
-        if parameter is not None:
-            self.__check_parameter(parameter)
-            return f"{self.command}{parameter}{self.TERMINATOR}"
-        return f"{self.command}{self.TERMINATOR}"
+        if parameter is None:
+            return self.__bare
+        self.__check_parameter(parameter)
+        if isinstance(parameter, bool):
+            parameter = int(parameter)
+        return f"{self.command}{parameter}{self.TERMINATOR}"
+
+    def is_read(self, command: str) -> bool:
+        """Is command (e.g. "AG0;") a read of this command and not a set (e.g. "AG0100;")?"""
+        return self.allow_read and len(command) - 3 <= self.read_length
+
+    def decode(self, answer: str):
+        """Typed value of answer parameter, read parameter stripped.
+
+        e.g.: FA "014250000" -> 14250000, AG "0100" -> 100, NB "01" -> True
+        """
+        return self.decoder(answer[self.read_length:])
 
     def __repr__(self):
         return f"<{self.command} {self.description}> <allow_set: {self.allow_set}>" \
                f" <allow_read: {self.allow_read}> <allow_answer: {self.allow_answer}>"
 
 
-def load_commands_to_objects():
-    with open(r"D:\Lesko\workspace\ham\Yaesu991aCAT\src\commands.csv", "r") as cf:
+def load_commands_to_objects(file_name: str = COMMANDS_CSV) -> dict:
+    with open(file_name, "r") as cf:
         data = cf.read()
 
     data = data.split("\n")
     out = {}
     for line in data[1:]:
-        line = line.split(",")
-        out[line[0]] = Ft991aCommand(*line)
+        if not line:
+            continue
+        command, description, allow_set, allow_read, allow_answer = line.split(",")
+        out[command] = Ft991aCommand(command, description,
+                                     allow_set == "1", allow_read == "1", allow_answer == "1")
     return out
 
 
+class CommandTable(Mapping):
+    """Read-only command -> Ft991aCommand table.
+
+    commands.csv is parsed on first access, once per process, so importing
+    the module does no file I/O and all Ft991a instances share the same table.
+    """
+
+    def __init__(self, file_name: str = COMMANDS_CSV):
+        self.file_name = file_name
+        self.__commands: Optional[MappingProxyType] = None
+        self.__lock = threading.Lock()
+
+    def __load(self) -> MappingProxyType:
+        if self.__commands is None:
+            with self.__lock:
+                if self.__commands is None:
+                    self.__commands = MappingProxyType(load_commands_to_objects(self.file_name))
+        return self.__commands
+
+    def __getitem__(self, command: str) -> "Ft991aCommand":
+        return self.__load()[command]
+
+    def __contains__(self, command) -> bool:
+        return command in self.__load()
+
+    def __iter__(self):
+        return iter(self.__load())
+
+    def __len__(self) -> int:
+        return len(self.__load())
+
+
 class CommandNotFoundError(Exception):
     pass
 
@@ -107,55 +198,688 @@ class ActionNotSupportedError(Exception):
     pass
 
 
+class LinkNotFoundError(Exception):
+    pass
+
+
 class MalformedResponse(Exception):
     pass
 
 
+class TuneTimeoutError(Exception):
+    pass
+
+
+COMMANDS = CommandTable()
+
+# Former names of response types
+AntennaTunerAnswer = TunerState
+ChannelInfo = MemoryChannel
+
+
+def parse_frequency(freq: Union[str, int]) -> str:
+    """Format frequency as 9 digit CAT parameter in Hz.
+
+    :param freq: int in Hz or string with suffix, e.g. "14.25M", "3500k"
+    :return: e.g. "014250000"
+    """
+    suffixes = Ft991aConfig.frequency_suffixes
+    if isinstance(freq, str):
+        suffix = freq[-1]
+        if suffix in suffixes:
+            s = f"{int(float(freq[:-1]) * suffixes[suffix]):0>9}"
+            if len(s) > 9:
+                raise ParseFrequencyError("Maximum supported freq exceeded.")
+            return s
+        else:
+            raise ParseFrequencyError(f"No unit suffix '{suffix}'.")
+    elif isinstance(freq, int):
+        # Assume Hz
+        s = f"{freq:0>9}"
+        if len(s) > 9:
+            raise ParseFrequencyError("Maximum supported freq exceeded.")
+        return s
+    else:
+        raise ParseFrequencyError("Frequency must be string.")
+
+
+def parse_answer(command: str, recv_str: str, raw=False) -> str:
+    """Extract answer to command from received frame.
+
+    :param command: command that was sent, e.g. "FA;"
+    :param recv_str: received frame, e.g. "FA014250000;"
+    :param raw: return complete frame instead of parameter only
+    :return: answer
+    """
+    code = command[:2]
+    pattern = COMMANDS[code].pattern if code in COMMANDS else answer_pattern(code)
+    m = pattern.match(recv_str)
+    if m:
+        return m.group(0) if raw else m.group(1)
+    # Check for error
+    if recv_str == "?;":
+        raise MalformedResponse(f"Command '{command}' returned error '{recv_str}'.")
+    else:
+        raise MalformedResponse(f"Command '{command}' returned unknown response '{recv_str}'.")
+
+
+def band_number(band: Union[str, int]) -> int:
+    """Find band number for "BS" command. Refer to Ft991a.set_band."""
+    bands = Ft991aConfig.bands
+
+    if isinstance(band, int):
+        if band in bands:
+            band_num = band
+        else:
+            raise ParameterError(f"No band entry for '{band}'")
+    elif isinstance(band, str):
+        for _band, name in bands.items():
+            if band in name:
+                band_num = _band
+                break
+        else:
+            raise ParameterError(f"No band entry for '{band}'")
+    else:
+        raise ParameterError("Band must be int or str.")
+    return band_num
+
+
+def format_memory_channel(channel: int, frequency: str, mode: str, tag: str = " "*12, clar_offset: int = 0,
+                          rx_clar=False, tx_clar=False, ctcss=False, operation_mode="simplex") -> str:
+    """Format parameter of "MT" write command. Refer to Ft991a.write_memory_channel."""
+    # TODO: implement checks for inputs
+    # Transceiver keeps only first 12 characters, longer tag would never match what is read back
+    if len(tag) > 12:
+        raise ParameterError(f"Tag of channel {channel} can be up to 12 characters long, not '{tag}'.")
+
+    frequency = parse_frequency(frequency)
+    clar_offset_dir = "+" if clar_offset >= 0 else "-"
+    rx_clar = "1" if rx_clar else "0"
+    tx_clar = "1" if tx_clar else "0"
+    mode = Ft991aConfig.r_modes[mode]
+    ctcss = Ft991aConfig.r_ctcss_states[ctcss]
+    operation_mode = Ft991aConfig.r_operation_modes[operation_mode]
+
+    #        P1           P2                            P3            P4        P5     P6   P7  P8  P9      P10
+    s = f"{channel:0>3}{frequency}{clar_offset_dir}{clar_offset:0>4}{rx_clar}{tx_clar}{mode}0{ctcss}00{operation_mode}0{tag: <12}"
+    return s
+
+
+def channel_info(channel: int, ans: Optional[str], raw=False):
+    """Decode answer to "MT" read command.
+
+    :param channel: channel that was read
+    :param ans: answer to "MT" command or None for empty channel
+    :param raw: refer to Ft991a.read_memory_channel
+    """
+    ch_info = decode_memory_channel(channel, ans)
+    if raw and ans is not None:
+        return ch_info.write_fields()
+    return ch_info
+
+
 class Ft991a:
-    COMMANDS = load_commands_to_objects()
+    COMMANDS = COMMANDS
 
-    def __init__(self, serial_port, baud_rate):
+    def __init__(self, serial_port, baud_rate, cache: bool = False):
+        """
+        :param serial_port: e.g. "COM3", "/dev/ttyUSB0"
+        :param baud_rate: must match CAT RATE (menu 031) of transceiver
+        :param cache: serve repeated reads from StateCache, refer to Ft991aConfig.cache_ttl
+        """
         self.serial_port = serial_port
         self.baud_rate = baud_rate
+        self.cache: Optional[StateCache] = StateCache() if cache else None
 
         self.function_menu = Menu()
 
         self.ser: Optional[serial.Serial] = None
+        self.__rx_buffer = b""
+
+        # Seconds between sending last command and receiving its answer.
+        # None if last command did not answer.
+        self.last_latency: Optional[float] = None
+        # Round trip times and pacing learned while talking to transceiver
+        self.link = LinkProfile()
+        # Frequency segments antenna tuner recently tuned, see tune()
+        self.tune_cache = TuneCache(serial_port)
+        # Traffic recording, see start_recording()
+        self.recorder: Optional[TrafficRecorder] = None
+        # Counters and latency histograms, see enable_metrics()
+        self.metrics: Optional[Metrics] = None
+        self.__call_depth = threading.local()
+        # Called before every command or batch chunk is written, Ft991aExecutor runs urgent calls from it
+        self.between_commands: Optional[Callable] = None
+
+        # Auto Information, see start_auto_information()
+        self.auto_information: Optional[AutoInformation] = None
+        self.__frames: Optional[queue.Queue] = None
+        self.__reader: Optional[threading.Thread] = None
+        self.__reader_running = False
 
     def open_serial(self):
         print(f"Opening serial <{self.serial_port} {self.baud_rate}>")
-        self.ser = serial.Serial(self.serial_port, self.baud_rate)
+        self.ser = serial.Serial(self.serial_port, self.baud_rate, timeout=Ft991aConfig.read_poll_interval)
         if not self.ser.is_open:
             self.ser.open()
 
+    @classmethod
+    def connect(cls, serial_port, upgrade: bool = True, cache: bool = False) -> "Ft991a":
+        """Open transceiver at whatever baud rate it is set to, optionally speed the link up
+        and calibrate deadlines. Refer to negotiate_link and calibrate_link.
+
+        e.g.:
+            ft = Ft991a.connect("/dev/ttyUSB0")
+
+        :param serial_port: e.g. "COM3", "/dev/ttyUSB0"
+        :param upgrade: set fastest CAT RATE and CAT TOT
+        :param cache: refer to Ft991a()
+        """
+        ft = cls(serial_port, cls.remembered_baud_rate(serial_port) or max(Ft991aConfig.cat_rates.values()), cache)
+        ft.open_serial()
+        try:
+            ft.negotiate_link(upgrade)
+            ft.calibrate_link()
+        except LinkNotFoundError:
+            ft.close_serial()
+            raise
+        return ft
+
+    @classmethod
+    def replay(cls, file_name: str, session: int = -1, speed: float = 1.0, strict: bool = True) -> "Ft991a":
+        """Talk to a traffic recording (see start_recording) instead of transceiver.
+        Writes must match recorded ones, answers come back with recorded timing.
+
+        e.g.:
+            ft = Ft991a.replay("traffic.log", speed=math.inf)
+            ft.read_vfo()
+
+        :param file_name: recording file
+        :param session: index of session in recording file, last one by default
+        :param speed: 1.0 for original timing, 10.0 ten times faster, math.inf without delays
+        :param strict: raise ReplayMismatchError if writes differ from recorded ones, otherwise skip them
+        """
+        recording = load_recording(file_name)[session]
+        ft = cls(recording.serial_port, recording.baud_rate)
+        ft.ser = ReplaySerial(recording, speed, strict)
+        return ft
+
+    def start_recording(self, file_name: str) -> TrafficRecorder:
+        """Append every write to and frame from transceiver, with timestamps, to file_name.
+
+        :return: TrafficRecorder
+        """
+        self.stop_recording()
+        self.recorder = TrafficRecorder(file_name, self.serial_port, self.baud_rate)
+        return self.recorder
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def enable_metrics(self, metrics: Optional[Metrics] = None) -> Metrics:
+        """Count calls, errors, bytes and latency of every CAT command and of every public
+        method (outermost call only, so link time is not counted twice). Disabled metrics
+        cost one None check per command.
+
+        :param metrics: Metrics to add to (e.g. shared by several transceivers), new one if None
+        :return: Metrics
+        """
+        enabled = self.metrics is not None
+        self.metrics = metrics if metrics is not None else Metrics({"port": self.serial_port})
+        # Methods are already instrumented, they report to whatever self.metrics is
+        if enabled:
+            return self.metrics
+        for cls in reversed(type(self).__mro__):
+            for name, attr in vars(cls).items():
+                if isinstance(attr, FunctionType) and not name.startswith("_") and \
+                        name not in ("enable_metrics", "disable_metrics") and \
+                        isinstance(inspect.getattr_static(self, name), FunctionType) and \
+                        not hasattr(inspect.getattr_static(self, name), "__wrapped__"):
+                    setattr(self, name, self.__instrument(name, getattr(self, name)))
+        return self.metrics
+
+    def disable_metrics(self):
+        self.metrics = None
+        for name in [name for name, attr in vars(self).items() if hasattr(attr, "__wrapped__")]:
+            delattr(self, name)
+
+    def __instrument(self, name: str, method):
+        local = self.__call_depth
+
+        @functools.wraps(method)
+        def instrumented(*args, **kwargs):
+            depth = getattr(local, "depth", 0)
+            local.depth = depth + 1
+            started = time.perf_counter()
+            error = False
+            try:
+                return method(*args, **kwargs)
+            except BaseException:
+                error = True
+                raise
+            finally:
+                local.depth = depth
+                if not depth and self.metrics is not None:
+                    self.metrics.observe_method(name, time.perf_counter() - started, error)
+
+        return instrumented
+
+    @staticmethod
+    def remembered_baud_rate(serial_port) -> Optional[int]:
+        """Baud rate negotiate_link() last found on serial_port, None if unknown."""
+        try:
+            with open(Ft991aConfig.link_settings_file, "r") as link_file:
+                return json.load(link_file).get(serial_port)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def __remember_baud_rate(serial_port, baud_rate: int):
+        try:
+            with open(Ft991aConfig.link_settings_file, "r") as link_file:
+                settings = json.load(link_file)
+        except (OSError, ValueError):
+            settings = {}
+        settings[serial_port] = baud_rate
+        with open(Ft991aConfig.link_settings_file, "w") as link_file:
+            json.dump(settings, link_file, indent=2)
+
+    def __set_baud_rate(self, baud_rate: int):
+        self.baud_rate = baud_rate
+        self.ser.baudrate = baud_rate
+        self.__discard_input()
+
+    def __identify(self) -> bool:
+        """Does FT-991A answer "ID;" at current baud rate?"""
+        # Terminate whatever transceiver made of previous garbage, its answer is discarded
+        self.__write(Ft991aCommand.TERMINATOR)
+        time.sleep(Ft991aConfig.set_deadline)
+        self.__discard_input()
+        try:
+            return self.__send_command("ID") == Ft991aConfig.radio_id
+        except (MalformedResponse, UnicodeDecodeError):
+            return False
+
+    def probe_baud_rate(self) -> int:
+        """Find baud rate transceiver's CAT RATE (menu 031) is set to by asking for its ID
+        at each rate, current one first. Port is left at found rate.
+
+        :return: baud rate
+        """
+        rates = sorted(Ft991aConfig.cat_rates.values(), reverse=True)
+        for baud_rate in [self.baud_rate] + [rate for rate in rates if rate != self.baud_rate]:
+            self.__set_baud_rate(baud_rate)
+            if self.__identify():
+                return baud_rate
+        raise LinkNotFoundError(f"No FT-991A answers on {self.serial_port} at {rates}.")
+
+    def calibrate_link(self, rounds: int = 5) -> dict:
+        """Measure round trip times of Ft991aConfig.calibration_commands, so deadlines
+        fit the link from the start. Measuring goes on during normal operation anyway.
+
+        :param rounds: times each command is sent
+        :return: learned link profile, refer to LinkProfile.profile
+        """
+        cache, self.cache = self.cache, None
+        try:
+            for _ in range(rounds):
+                for command in Ft991aConfig.calibration_commands:
+                    try:
+                        self.__ser_send(command)
+                    except MalformedResponse:
+                        pass
+        finally:
+            self.cache = cache
+        return self.link.profile()
+
+    def negotiate_link(self, upgrade: bool = True) -> int:
+        """Probe baud rate and optionally set fastest CAT RATE (menu 031) and shortest
+        CAT TOT (menu 032), reopening port at new rate. Found rate is remembered per
+        serial port in Ft991aConfig.link_settings_file and tried first next time.
+
+        Other programs using the same CAT port must be set to the new rate as well.
+
+        :param upgrade: change transceiver's CAT settings, otherwise only probe
+        :return: baud rate of the link
+        """
+        baud_rate = self.probe_baud_rate()
+        if upgrade:
+            fastest_tot = min(Ft991aConfig.cat_tots, key=Ft991aConfig.cat_tots.get)
+            fastest_rate = max(Ft991aConfig.cat_rates, key=Ft991aConfig.cat_rates.get)
+            if self.read_menu([32])[32] != fastest_tot:
+                self.write_menu({32: fastest_tot})
+            if baud_rate != Ft991aConfig.cat_rates[fastest_rate]:
+                # Transceiver switches right after this command, no answer comes back
+                self.write_menu({31: fastest_rate})
+                self.__set_baud_rate(Ft991aConfig.cat_rates[fastest_rate])
+                if not self.__identify():
+                    baud_rate = self.probe_baud_rate()
+                else:
+                    baud_rate = self.baud_rate
+        self.__remember_baud_rate(self.serial_port, baud_rate)
+        return baud_rate
+
     def close_serial(self):
+        if self.__reader is not None:
+            self.__reader_running = False
+            self.__reader.join()
+            self.__reader = None
+            self.__frames = None
         if self.ser.is_open:
             self.ser.close()
+        self.stop_recording()
 
-    def __ser_send(self, command, raw=False):
-        self.ser.reset_input_buffer()
-        self.ser.write(command.encode("utf-8"))
-        self.ser.flush()
+    @classmethod
+    def expects_answer(cls, command: str) -> bool:
+        """Does command (e.g. "FA;", "AG0100;") expect an answer from transceiver?
 
-        time.sleep(0.1)
-        if self.ser.in_waiting:
-            recv_str = self.ser.read(self.ser.in_waiting).decode("utf-8")
-            # Read answer if it was returned
-            m = re.search(fr"^{command[:2]}([\d+\-A-Za-z ]*);", recv_str)
-            if m:
-                if raw:
-                    return m.group(0)
-                return m.group(1)
-            # Check for error
-            else:
-                m = re.match(r"^\?;", recv_str)
-            if m:
-                raise MalformedResponse(f"Command '{command}' returned error '{recv_str}'.")
-            else:
-                raise MalformedResponse(f"Command '{command}' returned unknown response '{recv_str}'.")
-        # Command without answer
+        Unknown commands are assumed to answer.
+        """
+        codec = cls.COMMANDS.get(command[:2])
+        if codec is None:
+            return True
+        return codec.is_read(command)
+
+    @classmethod
+    def command_deadline(cls, command: str) -> float:
+        code = command[:2]
+        if code in Ft991aConfig.command_deadlines:
+            return Ft991aConfig.command_deadlines[code]
+        if cls.expects_answer(command):
+            return Ft991aConfig.read_deadline
+        return Ft991aConfig.set_deadline
+
+    def __read_frame(self, deadline: float) -> Optional[str]:
+        """Read next ";" terminated frame.
+
+        :param deadline: time.perf_counter() value after which reading is abandoned
+        :return: frame including terminator or None if deadline passed
+        """
+        # Auto Information reader owns the port, take frames from it
+        if self.__frames is not None:
+            try:
+                return self.__frames.get(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                return None
+
+        terminator = Ft991aCommand.TERMINATOR.encode("utf-8")
+        while True:
+            end = self.__rx_buffer.find(terminator)
+            if end >= 0:
+                frame = self.__rx_buffer[:end + 1].decode("utf-8")
+                self.__rx_buffer = self.__rx_buffer[end + 1:]
+                if self.recorder is not None:
+                    self.recorder.inbound(frame)
+                return frame
+            if time.perf_counter() >= deadline:
+                return None
+            chunk = self.ser.read(self.ser.in_waiting or 1)
+            if chunk:
+                self.__rx_buffer += chunk
+
+    def __discard_input(self):
+        if self.__frames is not None:
+            # Frames were already dispatched to Auto Information subscribers
+            while not self.__frames.empty():
+                self.__frames.get_nowait()
         else:
-            return None
+            self.ser.reset_input_buffer()
+            self.__rx_buffer = b""
+
+    def __read_auto_information(self):
+        terminator = Ft991aCommand.TERMINATOR.encode("utf-8")
+        rx_buffer = b""
+        while self.__reader_running:
+            chunk = self.ser.read(self.ser.in_waiting or 1)
+            if not chunk:
+                continue
+            rx_buffer += chunk
+            while True:
+                end = rx_buffer.find(terminator)
+                if end < 0:
+                    break
+                raw_frame, rx_buffer = rx_buffer[:end + 1], rx_buffer[end + 1:]
+                try:
+                    frame = raw_frame.decode("utf-8")
+                except UnicodeDecodeError:
+                    # Line noise, reader must keep running for commands waiting on frames
+                    logger.warning("Dropped undecodable frame %r from %s.", raw_frame, self.serial_port)
+                    continue
+                if self.recorder is not None:
+                    self.recorder.inbound(frame)
+                self.auto_information.dispatch(frame)
+                if self.cache is not None and frame != "?;":
+                    self.cache.update(frame)
+                self.__frames.put(frame)
+
+    def __write(self, data: str):
+        if self.recorder is not None:
+            self.recorder.outbound(data)
+        self.ser.write(data.encode("utf-8"))
+        self.ser.flush()
+
+    def __ser_send(self, command, raw=False):
+        expects_answer = self.expects_answer(command)
+        if self.cache is not None and expects_answer:
+            cached = self.cache.get(command)
+            if cached is not None:
+                return parse_answer(command, cached, raw)
+
+        if self.between_commands is not None:
+            self.between_commands()
+        self.__discard_input()
+        self.link.pace()
+        self.__write(command)
+
+        sent = time.perf_counter()
+        default_deadline = self.command_deadline(command)
+        learned_deadline = self.link.deadline(command, expects_answer, default_deadline)
+        deadline = sent + learned_deadline
+        self.last_latency = None
+        while True:
+            recv_str = self.__read_frame(deadline)
+            # Learned deadline missed, slow answer still gets default deadline
+            if recv_str is None and expects_answer and learned_deadline < default_deadline:
+                self.link.timeout(command)
+                learned_deadline = default_deadline
+                deadline = sent + default_deadline
+                continue
+            # Command without answer
+            if recv_str is None:
+                if expects_answer:
+                    self.link.timeout(command)
+                elif self.cache is not None:
+                    self.cache.update(command)
+                if self.metrics is not None:
+                    self.metrics.observe_command(command, time.perf_counter() - sent, len(command), 0,
+                                                 timeout=expects_answer)
+                return None
+            # Skip frames transceiver sent on its own in Auto Information mode
+            if self.__frames is not None and recv_str != "?;" and \
+                    (not expects_answer or recv_str[:2] != command[:2]):
+                continue
+            self.last_latency = time.perf_counter() - sent
+            self.link.observe(command, self.last_latency)
+            if self.metrics is not None:
+                self.metrics.observe_command(command, self.last_latency, len(command), len(recv_str),
+                                             error=recv_str == "?;")
+
+            ans = parse_answer(command, recv_str, raw)
+            if self.cache is not None and expects_answer:
+                self.cache.put(command, recv_str)
+            return ans
+
+    def __is_answer(self, frame: str, read_codes: set) -> bool:
+        """Outside of Auto Information mode every frame is an answer."""
+        return self.__frames is None or frame == "?;" or frame[:2] in read_codes
+
+    def __send_chunk(self, commands: list, raw=False) -> list:
+        """Write commands in one go and split answers back per command.
+
+        Answers come back in order of commands. Frames above number of expected answers
+        are errors ("?;") of set commands, which do not answer otherwise.
+
+        :return: answer, None or MalformedResponse instance for each command
+        """
+        if self.between_commands is not None:
+            self.between_commands()
+        self.__discard_input()
+        self.link.pace()
+        self.__write("".join(commands))
+
+        sent = time.perf_counter()
+        expects_answer = [self.expects_answer(command) for command in commands]
+        answers = sum(expects_answer)
+        reads = [command for command, answer in zip(commands, expects_answer) if answer]
+        read_codes = {command[:2] for command in reads}
+
+        # Collect all answers, each frame gives transceiver another read deadline.
+        # Frames come in order of commands: an answer belongs to next read, an error ("?;")
+        # to next command that has not got its frame yet, be it set or read.
+        frames = []
+        arrivals = []
+        position = 0
+        answered = 0
+        if reads:
+            read_deadline = max(self.link.deadline(command, True, Ft991aConfig.read_deadline) for command in reads)
+        while answered < answers:
+            frame = self.__read_frame(time.perf_counter() + read_deadline)
+            if frame is None:
+                self.link.timeout(reads[answered])
+                if read_deadline >= Ft991aConfig.read_deadline:
+                    break
+                # Learned deadline missed, slow answers still get default deadline
+                read_deadline = Ft991aConfig.read_deadline
+                continue
+            if not self.__is_answer(frame, read_codes):
+                continue
+            arrivals.append(time.perf_counter() - sent)
+            frames.append(frame)
+            if frame != "?;":
+                while position < len(commands) and not expects_answer[position]:
+                    position += 1
+            if position < len(commands) and expects_answer[position]:
+                if answered == 0:
+                    self.link.observe(reads[0], arrivals[-1])
+                answered += 1
+            position += 1
+        # Give set commands a chance to report an error. Transceiver answers in order, so when
+        # chunk ends with a read which answered, errors of all set commands came before it.
+        ends_with_read = expects_answer[-1] and answered == answers
+        if answers < len(commands) and not ends_with_read:
+            set_deadline = max(self.link.deadline(command, False, Ft991aConfig.set_deadline)
+                               for command, answer in zip(commands, expects_answer) if not answer)
+            while True:
+                frame = self.__read_frame(time.perf_counter() + set_deadline)
+                if frame is None:
+                    break
+                if self.__is_answer(frame, read_codes):
+                    arrivals.append(time.perf_counter() - sent)
+                    frames.append(frame)
+        self.last_latency = time.perf_counter() - sent if frames else None
+
+        results = []
+        # Index of frame each command got, None if it got none
+        used = []
+        surplus = len(frames) - answers
+        reads_left = answers
+        i = 0
+        for command, answer in zip(commands, expects_answer):
+            frame = frames[i] if i < len(frames) else None
+            if not answer:
+                # Error belongs to set command only if remaining frames still cover remaining reads
+                if frame == "?;" and surplus > 0 and len(frames) - i - 1 >= reads_left:
+                    results.append(MalformedResponse(f"Command '{command}' returned error '{frame}'."))
+                    used.append(i)
+                    surplus -= 1
+                    i += 1
+                else:
+                    results.append(None)
+                    used.append(None)
+                continue
+
+            reads_left -= 1
+            used.append(i if frame is not None else None)
+            i += 1
+            if frame is None:
+                results.append(MalformedResponse(f"Command '{command}' returned no response."))
+                continue
+            if frame == "?;":
+                results.append(MalformedResponse(f"Command '{command}' returned error '{frame}'."))
+                continue
+            try:
+                results.append(parse_answer(command, frame, raw))
+            except MalformedResponse as err:
+                results.append(err)
+                continue
+            if self.cache is not None:
+                self.cache.put(command, frame)
+
+        if self.cache is not None:
+            for command, answer, result in zip(commands, expects_answer, results):
+                if not answer and result is None:
+                    self.cache.update(command)
+        if self.metrics is not None:
+            for command, answer, index in zip(commands, expects_answer, used):
+                frame = frames[index] if index is not None else ""
+                self.metrics.observe_command(command, arrivals[index] if index is not None else None,
+                                             len(command), len(frame), error=frame == "?;",
+                                             timeout=answer and index is None)
+        return results
+
+    def batch(self, commands, raw=False, raise_errors=True) -> list:
+        """Send many commands with as few writes as transceiver's input buffer allows.
+
+        e.g.:
+            ft.batch(["FA", ("EX", "032"), ("MD", "0C"), "SH020;"])
+
+        :param commands: list of commands, each one of
+                         "FA" ............... command without parameter
+                         ("EX", "032") ...... command and parameter
+                         "EX032;" ........... complete command
+        :param raw: return complete answers (e.g. "FA014250000;") instead of parameters only
+        :param raise_errors: if False failed commands get MalformedResponse instance in place of answer,
+                             otherwise first error is raised after the whole batch was sent
+        :return: list of answers in order of commands, None for commands without answer
+        """
+        encoded = []
+        for command in commands:
+            parameter = None
+            if not isinstance(command, str):
+                command, parameter = command
+            elif command.endswith(Ft991aCommand.TERMINATOR):
+                command, parameter = command[:2], command[2:-1] or None
+            encoded.append(self.__get_command(command).get(parameter))
+
+        results = []
+        chunk = []
+        chunk_size = 0
+        for command in encoded:
+            if chunk and chunk_size + len(command) > Ft991aConfig.batch_write_size:
+                results.extend(self.__send_chunk(chunk, raw))
+                chunk = []
+                chunk_size = 0
+            chunk.append(command)
+            chunk_size += len(command)
+        if chunk:
+            results.extend(self.__send_chunk(chunk, raw))
+
+        if raise_errors:
+            for result in results:
+                if isinstance(result, MalformedResponse):
+                    raise result
+        return results
+
+    def invalidate_cache(self, command: Optional[str] = None):
+        """Forget cached answers so next read goes to transceiver.
+
+        :param command: command code (e.g. "FA") or read command (e.g. "AG0;"), None for all
+        :return: None
+        """
+        if self.cache is not None:
+            self.cache.invalidate(command)
 
     def debug_send(self, command):
         return self.__ser_send(command, raw=True)
@@ -168,27 +892,42 @@ class Ft991a:
     def __send_command(self, command, parameter=None):
         return self.__ser_send(self.__get_command(command).get(parameter))
 
+    def read_command(self, command: str, parameter: Optional[Union[str, int]] = None):
+        """Read any command, also ones without a method of their own, and decode its answer.
+
+        e.g.:
+            ft.read_command("FA") -> 14250000
+            ft.read_command("NB", 0) -> False
+            ft.read_command("CT", 0) -> "0"
+
+        :param command: command, e.g. "NB"
+        :param parameter: read parameter (e.g. 0 for main band), refer to Ft991aConfig.read_parameter_length
+        :return: answer without read parameter, typed as in Ft991aConfig.answer_types
+        """
+        codec = self.__get_command(command)
+        if not codec.allow_read:
+            raise ActionNotSupportedError(f"Command '{command}' can not be read.")
+        return codec.decode(self.__ser_send(codec.get(parameter)))
+
+    def set_command(self, command: str, parameter: Optional[Union[str, int, bool]] = None):
+        """Set any command, also ones without a method of their own.
+
+        e.g.:
+            ft.set_command("NB", "01")
+            ft.set_command("LK", True)
+
+        :param command: command, e.g. "NB"
+        :param parameter: complete set parameter, bool is sent as 1/0
+        :return: None
+        """
+        codec = self.__get_command(command)
+        if not codec.allow_set:
+            raise ActionNotSupportedError(f"Command '{command}' can not be set.")
+        return self.__ser_send(codec.get(parameter))
+
     @staticmethod
     def __parse_frequency(freq: Union[str, int]) -> str:
-
-        suffixes = Ft991aConfig.frequency_suffixes
-        if isinstance(freq, str):
-            suffix = freq[-1]
-            if suffix in suffixes:
-                s = f"{int(float(freq[:-1]) * suffixes[suffix]):0>9}"
-                if len(s) > 9:
-                    raise ParseFrequencyError("Maximum supported freq exceeded.")
-                return s
-            else:
-                raise ParseFrequencyError(f"No unit suffix '{suffix}'.")
-        elif isinstance(freq, int):
-            # Assume Hz
-            s = f"{freq:0>9}"
-            if len(s) > 9:
-                raise ParseFrequencyError("Maximum supported freq exceeded.")
-            return s
-        else:
-            raise ParseFrequencyError("Frequency must be string.")
+        return parse_frequency(freq)
 
     def vfoa_to_vfob(self):
         """Copies VFO-B frequency and data to VFO-A.
@@ -214,32 +953,83 @@ class Ft991a:
         :param action: "ON" ..... turn tuner on
                        "OFF" .... turn tuner off
                        "TUNE" ... start tuning
-        :keyword wait_complete: only for TUNE. Waits for tune process to complete
+        :keyword wait_complete: only for TUNE. Waits for tune process to complete, refer to wait_tune_complete
         :return: None
         """
         actions = Ft991aConfig.antenna_tuner_actions
         action = action.upper()
         if action not in actions:
             raise ActionNotSupportedError(f"Action '{action}' is not supported with 'AC' command.")
-        if action == "TUNE":
-            ans = self.__send_command("AC", f"00{actions[action]}")
-            if kwargs.get("wait_complete", False):
-                while self.read_antenna_tuner().tune:
-                    time.sleep(0.5)
+        ans = self.__send_command("AC", f"00{actions[action]}")
+        if action == "TUNE" and kwargs.get("wait_complete", False):
+            self.wait_tune_complete()
+        return ans
 
-            return ans
+    def wait_tune_complete(self, timeout: float = Ft991aConfig.tuner_timeout) -> TunerState:
+        """Wait for antenna tuner to finish tuning.
+
+        Tuner state is polled every Ft991aConfig.tuner_poll_interval seconds at first and less
+        often the longer tuning takes (up to Ft991aConfig.tuner_max_poll_interval). In Auto Information
+        mode "AC" frame from transceiver ends the wait between polls.
+
+        :param timeout: seconds to wait
+        :return: TunerState after tuning
+        """
+        changed = threading.Event()
+
+        def on_frame(event):
+            if event.command == "AC":
+                changed.set()
+
+        if self.__frames is not None:
+            self.auto_information.subscribe(on_frame, FrameEvent)
+        try:
+            give_up = time.monotonic() + timeout
+            interval = Ft991aConfig.tuner_poll_interval
+            while True:
+                state = self.read_antenna_tuner()
+                if not state.tune:
+                    return state
+                if time.monotonic() > give_up:
+                    raise TuneTimeoutError(f"Antenna tuner did not finish tuning in {timeout}s.")
+                changed.wait(interval)
+                changed.clear()
+                interval = min(interval * Ft991aConfig.tuner_poll_backoff, Ft991aConfig.tuner_max_poll_interval)
+        finally:
+            if self.__frames is not None:
+                self.auto_information.unsubscribe(on_frame)
+
+    def tune(self, frequency: Optional[Union[str, int]] = None, force: bool = False) -> bool:
+        """Tune antenna tuner on frequency, unless its segment was tuned recently.
+
+        Tuner memorizes its match per frequency, so for a segment in tune_cache turning
+        the tuner on is enough. Refer to Ft991aConfig.tune_segment_width and tune_cache_ttl.
+
+        :param frequency: set VFO-A to frequency first, e.g. "14.073M". None for current VFO-A frequency
+        :param force: tune even if segment was tuned recently
+        :return: True if tuner tuned, False if tuning was skipped
+        """
+        if frequency is None:
+            frequency = self.read_vfo()
+        else:
+            frequency = int(self.__parse_frequency(frequency))
+            self.set_vfo(frequency)
+        if not force and self.tune_cache.is_tuned(frequency):
+            if not self.read_antenna_tuner().on:
+                self.antenna_tuner_ctrl("ON")
+            return False
+        self.antenna_tuner_ctrl("TUNE")
+        if self.wait_tune_complete().on:
+            self.tune_cache.remember(frequency)
+        return True
 
     def read_antenna_tuner(self):
         """Read status of on-board antenna tuner.
 
-        :return: namedtuple [on: bool ..... tuner on
+        :return: TunerState [on: bool ..... tuner on
                              tune: bool ... tune process active]
         """
-        AntennaTunerAnswer = namedtuple("AntennaTunerAnswer", "on tune")
-        ans = self.__send_command("AC")
-        ans = AntennaTunerAnswer(on=True if ans[-1] == "1" else False, 
-                                 tune=True if ans[-1] == "2" else False)
-        return ans
+        return decode_tuner(self.__send_command("AC"))
 
     def set_af_gain(self, gain: int):
         """Set AF (audio) gain. Sets the receiver audio volume level.
@@ -255,9 +1045,46 @@ class Ft991a:
 
         :return: AF gain
         """
-        return int(self.__send_command("AG", parameter="0"))
+        return self.read_command("AG", "0")
 
-    # TODO: implement "AI  -  auto information"
+    def start_auto_information(self) -> AutoInformation:
+        """Turn Auto Information on. Transceiver then reports changes (frequency, mode, TX, ...)
+        on its own. A background thread reads them, keeps AutoInformation.state up to date
+        and calls subscribers. Commands keep working as usual in the meantime.
+
+        :return: AutoInformation to subscribe to
+        """
+        if self.auto_information is None:
+            self.auto_information = AutoInformation()
+        if self.__reader is None:
+            self.__discard_input()
+            self.__frames = queue.Queue()
+            self.__reader_running = True
+            self.__reader = threading.Thread(target=self.__read_auto_information,
+                                             name="Ft991aAutoInformation", daemon=True)
+            self.__reader.start()
+        self.__send_command("AI", parameter="1")
+        return self.auto_information
+
+    def stop_auto_information(self):
+        """Turn Auto Information off and stop background reader.
+
+        :return: None
+        """
+        self.__send_command("AI", parameter="0")
+        if self.__reader is not None:
+            self.__reader_running = False
+            self.__reader.join()
+            self.__reader = None
+            self.__frames = None
+            self.__discard_input()
+
+    def is_auto_information_on(self) -> bool:
+        """Read current state of Auto Information.
+
+        :return: state of Auto Information
+        """
+        return self.read_command("AI")
 
     # TODO: implement "AM  -  VFO-A to memory chanel"
 
@@ -279,7 +1106,7 @@ class Ft991a:
 
         :return: state of auto-notch
         """
-        return bool(int(self.__send_command("BC", parameter="0")[-1]))
+        return self.read_command("BC", "0")
 
     def band_down(self):
         """One band down.
@@ -311,7 +1138,7 @@ class Ft991a:
 
         :return: state of auto-notch
         """
-        return bool(int(self.__send_command("BI")[-1]))
+        return self.read_command("BI")
 
     def set_manual_notch_state(self, on: bool):
         """NOTCH
@@ -354,22 +1181,7 @@ class Ft991a:
         :param band:
         :return:
         """
-        bands = Ft991aConfig.bands
-
-        if isinstance(band, int):
-            if band in bands:
-                band_num = band
-            else:
-                raise ParameterError(f"No band entry for '{band}'")
-        elif isinstance(band, str):
-            for _band, name in bands.items():
-                if band in name:
-                    band_num = _band
-                    break
-            else:
-                raise ParameterError(f"No band entry for '{band}'")
-        else:
-            raise ParameterError("Band must be int or str.")
+        band_num = band_number(band)
         return self.__send_command("BS", parameter=f"{band_num:0>2}")
 
     def read_menu_function(self, num):
@@ -382,6 +1194,31 @@ class Ft991a:
         param = self.function_menu.get_menu_function(num).format_param(param)
         return self.__send_command(command, parameter=param)
 
+    def read_menu(self, items) -> dict:
+        """Read many menu items in one pipelined exchange.
+
+        e.g.:
+            ft.read_menu([31, "CAT TOT"]) -> {31: "3", 32: "1"}
+
+        :param items: menu numbers or function names
+        :return: {menu number: P2 value}
+        """
+        menu_items = [self.function_menu.get_menu_function(item) for item in items]
+        answers = self.batch([("EX", item.read_command()) for item in menu_items])
+        return {item.num: ans[3:] for item, ans in zip(menu_items, answers)}
+
+    def write_menu(self, settings: dict):
+        """Write many menu items in one pipelined exchange.
+        All values are checked against menu ranges before anything is sent.
+
+        e.g.:
+            ft.write_menu({"CAT TOT": 1, 64: "+1500"})
+
+        :param settings: {menu number or function name: value}
+        :return: None
+        """
+        self.batch(self.function_menu.write_commands(settings))
+
     def is_rx_busy(self) -> bool:
         """IS RX busy (is squelch opened)?
 
@@ -415,7 +1252,48 @@ class Ft991a:
         :return: frequency in hertz
         """
         command = "FA" if ab == "A" else "FB"
-        return int(self.__send_command(command))
+        return self.read_command(command)
+
+    def set_mode(self, mode: str):
+        """Set operating mode of main band.
+
+        :param mode: name from Ft991aConfig.modes, e.g. "USB", "DATA-USB"
+        :return: None
+        """
+        if mode not in Ft991aConfig.r_modes:
+            raise ParameterError(f"Mode can be one of {list(Ft991aConfig.r_modes)}, not '{mode}'.")
+        return self.__send_command("MD", parameter=f"0{Ft991aConfig.r_modes[mode]}")
+
+    def read_mode(self) -> str:
+        """Read operating mode of main band.
+
+        :return: name from Ft991aConfig.modes, e.g. "DATA-USB"
+        """
+        ans = self.read_command("MD", "0")
+        return Ft991aConfig.modes.get(ans, ans)
+
+    def read_status(self) -> InformationState:
+        """Read main band status in one round trip ("IF"): frequency, mode, clarifier,
+        VFO/memory, CTCSS and repeater shift.
+
+        :return: InformationState [memory_channel: int .. 1 - 117
+                                   frequency: int ....... frequency in Hz
+                                   clar_offset: int ..... -9999 - 9999 Hz
+                                   rx_clar: bool ........ state, on/off
+                                   tx_clar: bool ........ state, on/off
+                                   mode: str ............ mode as LSB, USB, FM, ...
+                                   memory_mode: str ..... VFO, memory, ...
+                                   ctcss: bool/str ...... off/'CTCSS ENC/DEC'/'CTCSS ENC'
+                                   operation_mode: str .. simplex or +/-]
+        """
+        return decode_information(self.__send_command("IF"))
+
+    def read_opposite_status(self) -> InformationState:
+        """Read opposite band (VFO-B) status in one round trip ("OI"). Refer to read_status.
+
+        :return: InformationState
+        """
+        return decode_information(self.__send_command("OI"))
 
     def set_mic_gain(self, mic_gain: int):
         """Set microphone gain.
@@ -430,7 +1308,7 @@ class Ft991a:
 
         :return: microphone gain, between 0 - 100
         """
-        return int(self.__send_command("MG"))
+        return self.read_command("MG")
 
     def write_memory_channel(self, channel: int, frequency: str, mode: str, tag: str = " "*12, clar_offset: int = 0,
                              rx_clar=False, tx_clar=False, ctcss=False, operation_mode="simplex"):
@@ -448,18 +1326,8 @@ class Ft991a:
         :param operation_mode: operational mode [simplex, plus shift, minus shift]
         """
 
-        # TODO: implement checks for inputs
-
-        frequency = self.__parse_frequency(frequency)
-        clar_offset_dir = "+" if clar_offset >= 0 else "-"
-        rx_clar = "1" if rx_clar else "0"
-        tx_clar = "1" if tx_clar else "0"
-        mode = Ft991aConfig.r_modes[mode]
-        ctcss = Ft991aConfig.r_ctcss_states[ctcss]
-        operation_mode = Ft991aConfig.r_operation_modes[operation_mode]
-
-        #        P1           P2                            P3            P4        P5     P6   P7  P8  P9      P10
-        s = f"{channel:0>3}{frequency}{clar_offset_dir}{clar_offset:0>4}{rx_clar}{tx_clar}{mode}0{ctcss}00{operation_mode}0{tag: <12}"
+        s = format_memory_channel(channel, frequency, mode, tag, clar_offset,
+                                  rx_clar, tx_clar, ctcss, operation_mode)
         self.__send_command("MT", parameter=s)
 
     def read_memory_channel(self, channel: int, raw=False):
@@ -468,7 +1336,7 @@ class Ft991a:
         :param channel: channel, between 0 - 117
         :param raw: if true it will return data in a form
                     ready to be written back into memory with self.write_memory_channel(**)
-        :return: namedtuple ChannelInfo [channel: int .......... 0 - 117
+        :return: MemoryChannel [channel: int .......... 0 - 117
                                          frequency: int ........ frequency in Hz
                                          clar_offset: int ...... 0 - 9999 Hz
                                          rx_clar: bool ......... state, on/off]
@@ -480,31 +1348,11 @@ class Ft991a:
                                          tag: str .............. tag up to 12 characters long (ASCII)]
         :return: dict refer to raw parameter documentation
         """
-        ChannelInfo = namedtuple("ChannelInfo",
-                                 "channel frequency clar_offset rx_clar tx_clar "
-                                 "mode memory_mode ctcss operation_mode tag")
         try:
             ans = self.__send_command("MT", parameter=f"{channel:0>3}")
         except MalformedResponse:
-            return ChannelInfo(*[None]*10)
-
-        ch_info = ChannelInfo(
-            channel=channel,
-            frequency=int(ans[3:12]),
-            clar_offset=int(ans[12:17]), 
-            rx_clar=True if ans[17] == "1" else False, 
-            tx_clar=True if ans[18] == "1" else False, 
-            mode=Ft991aConfig.modes[ans[19]],
-            memory_mode=Ft991aConfig.memory_mode[ans[20]],
-            ctcss=Ft991aConfig.ctcss_states[ans[21]],
-            operation_mode=Ft991aConfig.operation_modes[ans[24]],
-            tag=ans[-12:].strip()
-        )
-        if raw:
-            write_fields = ("channel", "frequency", "mode", "tag", "clar_offset",
-                            "rx_clar", "tx_clar", "ctcss", "operation_mode")
-            return {field: ch_info.__getattribute__(field) for field in ch_info._fields if field in write_fields}
-        return ch_info
+            ans = None
+        return channel_info(channel, ans, raw)
 
     def set_output_rf_power(self, power: int):
         """Set output RF power.
@@ -518,19 +1366,43 @@ class Ft991a:
 
         :return: set power in W
         """
-        return int(self.__send_command("PC"))
+        return self.read_command("PC")
 
     def power_on(self):
         """Power transceiver on.
 
+        Dummy command wakes transceiver up, "PS1;" has to follow 1 - 2s later. Wake-up gap
+        is kept in link profile (LinkProfile.wake_gap) and widened after a failed attempt.
+        Nothing else may be sent in between, so between_commands is not called until done.
+
         :return: None
         """
         time_between_dummy = Ft991aConfig.time_between_dummy
         if time_between_dummy < 1.1:
             raise ValueError(f"time_beetween_dummy must be at least 1.1s not {time_between_dummy}s.")
-        self.__ser_send("DD;")  # Dummy command
-        time.sleep(time_between_dummy)
-        return self.__send_command("PS", parameter="1")
+        between_commands, self.between_commands = self.between_commands, None
+        try:
+            for _ in range(Ft991aConfig.power_on_attempts):
+                self.__discard_input()
+                self.__write("PS;")  # Dummy command
+                time.sleep(self.link.wake_gap)
+                self.__send_command("PS", parameter="1")
+                if self.__wait_power_on():
+                    return None
+                self.link.wake_failed()
+        finally:
+            self.between_commands = between_commands
+        raise LinkNotFoundError(f"Transceiver on {self.serial_port} did not power on.")
+
+    def __wait_power_on(self) -> bool:
+        timeout = time.perf_counter() + Ft991aConfig.power_on_timeout
+        while time.perf_counter() < timeout:
+            try:
+                if self.__send_command("PS") == "1":
+                    return True
+            except MalformedResponse:
+                pass
+        return False
 
     def power_off(self):
         """Power transceiver off.
@@ -541,8 +1413,18 @@ class Ft991a:
 
     def __read_meter(self, meter: str):
         command = Ft991aConfig.r_meter_reading[meter]
-        ans = self.__send_command("RM", parameter=command)
-        return int(ans[-3:])
+        return self.read_command("RM", command)
+
+    def read_meters(self, meters=("SM", "COMP", "ALC", "PO", "SWR", "ID", "VDD")) -> tuple:
+        """Read many meters in one pipelined exchange.
+
+        :param meters: "SM" and/or names from Ft991aConfig.r_meter_reading
+        :return: MeterReading for each meter
+        """
+        commands = [("SM", "0") if meter == "SM" else ("RM", Ft991aConfig.r_meter_reading[meter])
+                    for meter in meters]
+        answers = self.batch(commands)
+        return tuple(decode_meter(command, ans) for (command, _), ans in zip(commands, answers))
 
     def read_meter_compression(self):
         """Read meter - compression.
@@ -598,7 +1480,7 @@ class Ft991a:
 
         :return: S-meter reading, between 0 - 255
         """
-        return int(self.__send_command("SM", parameter="0"))
+        return self.read_command("SM", "0")
 
     def set_squelch_level(self, squelch: int):
         """Set squelch level.
@@ -615,7 +1497,7 @@ class Ft991a:
 
         :return: squelch level.
         """
-        return int(self.__send_command("SQ", parameter="0"))
+        return self.read_command("SQ", "0")
 
     def read_tx_state(self) -> str:
         """Read current TX status.
@@ -624,7 +1506,7 @@ class Ft991a:
                  "OFF" ......... TX is off
                  "RADIO_ON" .... TX is on via PTT
         """
-        return Ft991aConfig.tx_state[self.__send_command("TX")]
+        return decode_tx_state(self.__send_command("TX")).state
 
     def tx_on(self):
         """TX on - start transmitting.
@@ -640,16 +1522,145 @@ class Ft991a:
         """
         return self.__send_command("TX", parameter="0")
 
+    def __snapshot_reads(self) -> list:
+        reads = []
+        for code, command in self.COMMANDS.items():
+            if not command.allow_set or not command.allow_read or code in Ft991aConfig.snapshot_skip_commands:
+                continue
+            if code == "EX":
+                reads.extend(f"EX{item.num:0>3};" for item in self.function_menu.MENU_ITEMS)
+            elif code == "MT":
+                reads.extend(f"MT{ch:0>3};" for ch in range(1, 118))
+            else:
+                reads.append(f"{code}{'0' * Ft991aConfig.read_parameter_length.get(code, 0)};")
+        return reads
+
+    @staticmethod
+    def __normalize_answer(read: str, answer: str) -> str:
+        # Transceiver answers "MT" with currently selected channel, not the one that was read
+        if read[:2] == "MT":
+            return f"{read[:5]}{answer[5:]}"
+        return answer
+
+    def snapshot(self) -> dict:
+        """Capture all settings (menu, memory channels and front panel) in batches.
+
+        Empty memory channels and settings transceiver refuses to read are left out.
+        Refer to Ft991aConfig.snapshot_skip_commands.
+
+        :return: dict of read command -> answer, e.g. {"AG0;": "AG0100;", "EX031;": "EX0313;"}.
+                 Answer is also the set command that restores the setting.
+        """
+        reads = self.__snapshot_reads()
+        answers = self.batch(reads, raw=True, raise_errors=False)
+        return {read: self.__normalize_answer(read, answer) for read, answer in zip(reads, answers)
+                if isinstance(answer, str)}
+
+    def restore(self, snapshot: dict) -> list:
+        """Bring transceiver back to snapshot. Current settings are read first and only
+        the ones that differ are sent, in order of Ft991aConfig.restore_order.
+        Settings in Ft991aConfig.restore_skip are never sent.
+
+        :param snapshot: as returned by self.snapshot() or self.load_snapshot()
+        :return: list of sent set commands
+        """
+        reads = [read for read in snapshot if read not in Ft991aConfig.restore_skip]
+        current = self.batch(reads, raw=True, raise_errors=False)
+        changes = [snapshot[read] for read, answer in zip(reads, current)
+                   if not isinstance(answer, str) or self.__normalize_answer(read, answer) != snapshot[read]]
+
+        order = Ft991aConfig.restore_order
+        changes.sort(key=lambda command: order.index(command[:2] if command[:2] in order else "*"))
+        if changes:
+            self.batch(changes)
+        self.invalidate_cache()
+        return changes
+
+    @staticmethod
+    def save_snapshot(snapshot: dict, file_name: str):
+        """Write snapshot to file, one answer per line."""
+        with open(file_name, "w") as s_file:
+            for answer in snapshot.values():
+                s_file.write(f"{answer}\n")
+
+    @staticmethod
+    def load_snapshot(file_name: str) -> dict:
+        """Read snapshot written by save_snapshot()."""
+        with open(file_name, "r") as s_file:
+            answers = s_file.read().split("\n")
+        return {read_key(answer): answer for answer in answers if answer.endswith(Ft991aCommand.TERMINATOR)}
+
+    def read_memory_bank(self, channels=range(1, 118)) -> dict:
+        """Read many memory channels in batches.
+
+        :param channels: channels to read, all by default
+        :return: dict of channel -> ChannelInfo, None for empty channel
+        """
+        channels = list(channels)
+        answers = self.batch([("MT", f"{ch:0>3}") for ch in channels], raise_errors=False)
+        return {ch: channel_info(ch, ans) if isinstance(ans, str) else None
+                for ch, ans in zip(channels, answers)}
+
+    @staticmethod
+    def load_memory_plan(file_name: str) -> list:
+        """Read channel plan from CSV file.
+
+        Header holds parameter names of write_memory_channel, e.g.:
+            channel,frequency,mode,tag,operation_mode
+            1,145.6875M,FM,Zagarski vrh,-
+
+        :return: list of dicts, ready for write_memory_plan
+        """
+        int_fields = ("channel", "clar_offset")
+        bool_fields = ("rx_clar", "tx_clar")
+        plan = []
+        with open(file_name, "r", newline="") as plan_file:
+            for row in csv.DictReader(plan_file):
+                channel = {}
+                for field, value in row.items():
+                    value = value.strip()
+                    if not value:
+                        continue
+                    if field in int_fields or (field == "frequency" and value.isdigit()):
+                        value = int(value)
+                    elif field in bool_fields:
+                        value = value.lower() in ("1", "true", "on", "yes")
+                    elif field == "ctcss" and value.lower() in ("0", "false", "off"):
+                        value = False
+                    channel[field] = value
+                plan.append(channel)
+        return plan
+
+    def write_memory_plan(self, plan) -> list:
+        """Program memory channels, touching only channels whose content differs.
+
+        :param plan: list of dicts with parameters of write_memory_channel
+                     or name of CSV file (refer to load_memory_plan)
+        :return: list of written channels
+        """
+        if isinstance(plan, str):
+            plan = self.load_memory_plan(plan)
+        targets = {channel["channel"]: format_memory_channel(**channel) for channel in plan}
+        channels = list(targets)
+        current = self.batch([("MT", f"{ch:0>3}") for ch in channels], raise_errors=False)
+
+        # Channel number in answer is not reliable, compare the rest
+        changed = [ch for ch, ans in zip(channels, current)
+                   if not isinstance(ans, str) or ans[3:] != targets[ch][3:]]
+        if changed:
+            self.batch([("MT", targets[ch]) for ch in changed])
+        return changed
+
     def list_menu_settings(self):
-        for opt in range(1, 154):
-            s = f"EX{opt:0>3};"
+        commands = [f"EX{item.read_command()};" for item in self.function_menu.MENU_ITEMS]
+        answers = self.batch(commands, raw=True, raise_errors=False)
+        for s, ans in zip(commands, answers):
             print(s, end=" - ")
-            ans = self.debug_send(s)
             print(ans)
 
     def list_memory(self):
-        for ch in range(1, 118):
-            print(self.read_memory_channel(ch, raw=True))
+        for ch, ch_info in self.read_memory_bank().items():
+            print(ch_info if ch_info is not None else f"{ch:0>3} - empty")
 
 
 if __name__ == '__main__':
@@ -658,72 +1669,38 @@ if __name__ == '__main__':
 
 
     def write_repeaters_to_memory():
-        ft.write_memory_channel(1, frequency="145.6875M", mode="FM", operation_mode="-", tag="Zagarski vrh")  # Zagarski vrh S55VZV
-        ft.write_memory_channel(2, frequency="145.775M", mode="FM", operation_mode="-", tag="Krim S55VLJ")  # Krim S55VLJ
-        ft.write_memory_channel(3, frequency="145.6125M", mode="FM", operation_mode="-", tag="Mohor S55VKR")  # Mohor S55VKR
-        ft.write_memory_channel(4, frequency="145.7875M", mode="FM", operation_mode="-", tag="Mozirje")  # Spodnje Krase (Mozirje) S55VMO
-        ft.write_memory_channel(5, frequency="145.650M", mode="FM", operation_mode="-", tag="Kup S55VBG")  # Kup (Podbrdo) S55VBG
-        ft.write_memory_channel(6, frequency="145.625M", mode="FM", operation_mode="-", tag="Nanos S55VKP")  # Nanos S55VKP
-        ft.write_memory_channel(7, frequency="145.725M", mode="FM", operation_mode="-", tag="Vojsko")  # Vojsko S55VID
-        ft.write_memory_channel(8, frequency="145.700M", mode="FM", operation_mode="-", tag="Mrzlica")  # Mrzlica S55VCE
-
-        ft.write_memory_channel(20, frequency="145.550M", mode="FM", tag="CQ FM SOTA")
-        ft.write_memory_channel(21, frequency="144.300M", mode="USB", tag="CQ SSB")
-        ft.write_memory_channel(22, frequency="145.325M", mode="FM", tag="V26 S51SLO")
-
-        ft.write_memory_channel(40, frequency="438.925M", mode="FM", operation_mode="-", tag="Krvavec")  # Krvavec S55UK
+        repeaters = [
+            dict(channel=1, frequency="145.6875M", mode="FM", operation_mode="-", tag="Zagarski vrh"),  # Zagarski vrh S55VZV
+            dict(channel=2, frequency="145.775M", mode="FM", operation_mode="-", tag="Krim S55VLJ"),  # Krim S55VLJ
+            dict(channel=3, frequency="145.6125M", mode="FM", operation_mode="-", tag="Mohor S55VKR"),  # Mohor S55VKR
+            dict(channel=4, frequency="145.7875M", mode="FM", operation_mode="-", tag="Mozirje"),  # Spodnje Krase (Mozirje) S55VMO
+            dict(channel=5, frequency="145.650M", mode="FM", operation_mode="-", tag="Kup S55VBG"),  # Kup (Podbrdo) S55VBG
+            dict(channel=6, frequency="145.625M", mode="FM", operation_mode="-", tag="Nanos S55VKP"),  # Nanos S55VKP
+            dict(channel=7, frequency="145.725M", mode="FM", operation_mode="-", tag="Vojsko"),  # Vojsko S55VID
+            dict(channel=8, frequency="145.700M", mode="FM", operation_mode="-", tag="Mrzlica"),  # Mrzlica S55VCE
+
+            dict(channel=20, frequency="145.550M", mode="FM", tag="CQ FM SOTA"),
+            dict(channel=21, frequency="144.300M", mode="USB", tag="CQ SSB"),
+            dict(channel=22, frequency="145.325M", mode="FM", tag="V26 S51SLO"),
+
+            dict(channel=40, frequency="438.925M", mode="FM", operation_mode="-", tag="Krvavec"),  # Krvavec S55UK
+        ]
+        print(f"Written channels: {ft.write_memory_plan(repeaters)}")
 
     def save_current_settings():
         s_t = time.time()
-        all_settings = []
-        for _, command in ft.COMMANDS.items():
-            if command.allow_set == "1" and command.allow_read == "1":
-                suffix = ""
-                if command.command in "AG BC CT GT IS NA NB NL NR OS PA RA RG RL SH SM SQ".split(" "):
-                    suffix = "0"
-                elif command.command == "EX":
-                    print("Menu...")
-                    for item in range(1, 154):
-                        s = f"EX{item:0>3};"
-                        ans = ft.debug_send(s)
-                        all_settings.append(ans)
-                    continue
-                if command.command in "BP CN CO DT KM LM MD ML MR MT OI PB PR RI RM".split(" "):
-                    print(f"Skipping command {command} ...")
-                    continue
-                s = f"{command.command}{suffix};"
-                ans = ft.debug_send(s)
-                all_settings.append(ans)
-        print("Memory...")
-        for item in range(1, 118):
-            s = f"MT{item:0>3};"
-            try:
-                ans = ft.debug_send(s)
-            except MalformedResponse:
-                continue
-            all_settings.append(ans)
+        all_settings = ft.snapshot()
 
         tit = time.time() - s_t
         print(f"It took {tit}sec to read {len(all_settings)} settings, that is {len(all_settings)/tit} settings/sec")
-        print(all_settings)
+        print(list(all_settings.values()))
 
-        with open("last_settings.dat", "w") as s_file:
-            for setting in all_settings:
-                s_file.write(f"{setting}\n")
+        ft.save_snapshot(all_settings, "last_settings.dat")
 
 
     def load_settings_dat(dat_name):
-        with open(dat_name, "r") as dat_file:
-            all_settings = dat_file.read()
-        all_settings = all_settings.split("\n")
-        for setting in all_settings:
-            if setting in "EX0313; EX087G0O4Y; FT0; PS;".split(" "):
-                print(f"Skipping {setting}")
-                continue
-            try:
-                ft.debug_send(setting)
-            except MalformedResponse as err:
-                print(f"Error {setting} - {err}")
+        changed = ft.restore(ft.load_snapshot(dat_name))
+        print(f"Restored {len(changed)} settings: {changed}")
 
 
     save_current_settings()
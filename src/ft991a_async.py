@@ -0,0 +1,426 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import asyncio
+import logging
+import time
+from typing import Optional, Union
+import serial
+
+from ft991a import (Ft991a, Ft991aCommand, CommandNotFoundError, ActionNotSupportedError, LinkNotFoundError,
+                    ParameterError, MalformedResponse, TuneTimeoutError, parse_frequency, parse_answer, channel_info,
+                    band_number, format_memory_channel)
+from ft991a_config import Ft991aConfig
+from ft991a_link import LinkProfile
+from ft991a_responses import InformationState, decode_information, decode_meter, decode_tuner, decode_tx_state
+from menu import Menu
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSerialTransport:
+    """Non-blocking serial port for asyncio.
+
+    Incoming bytes are split into ";" terminated frames as they arrive.
+    Uses event loop's reader callback where supported (POSIX), otherwise polls the port
+    every Ft991aConfig.read_poll_interval without blocking the loop.
+    """
+
+    def __init__(self, serial_port, baud_rate):
+        self.serial_port = serial_port
+        self.baud_rate = baud_rate
+
+        self.ser: Optional[serial.Serial] = None
+        self.__rx_buffer = b""
+        self.__frames: Optional[asyncio.Queue] = None
+        self.__poll_task: Optional[asyncio.Task] = None
+        self.__loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def open(self):
+        self.__loop = asyncio.get_running_loop()
+        self.__frames = asyncio.Queue()
+        self.ser = serial.Serial(self.serial_port, self.baud_rate, timeout=0)
+        if not self.ser.is_open:
+            self.ser.open()
+        try:
+            self.__loop.add_reader(self.ser.fileno(), self.__on_readable)
+        except (NotImplementedError, AttributeError):
+            self.__poll_task = self.__loop.create_task(self.__poll())
+
+    async def close(self):
+        if self.__poll_task is not None:
+            self.__poll_task.cancel()
+            self.__poll_task = None
+        elif self.ser is not None and self.ser.is_open:
+            self.__loop.remove_reader(self.ser.fileno())
+        if self.ser is not None and self.ser.is_open:
+            self.ser.close()
+
+    def __on_readable(self):
+        self.__feed(self.ser.read(self.ser.in_waiting or 1))
+
+    async def __poll(self):
+        while True:
+            waiting = self.ser.in_waiting
+            if waiting:
+                self.__feed(self.ser.read(waiting))
+            else:
+                await asyncio.sleep(Ft991aConfig.read_poll_interval)
+
+    def __feed(self, data: bytes):
+        terminator = Ft991aCommand.TERMINATOR.encode("utf-8")
+        self.__rx_buffer += data
+        while True:
+            end = self.__rx_buffer.find(terminator)
+            if end < 0:
+                break
+            frame = self.__rx_buffer[:end + 1]
+            self.__rx_buffer = self.__rx_buffer[end + 1:]
+            try:
+                self.__frames.put_nowait(frame.decode("utf-8"))
+            except UnicodeDecodeError:
+                # Line noise, dropping it keeps reader callback (or poll task) alive
+                logger.warning("Dropped undecodable frame %r from %s.", frame, self.serial_port)
+
+    def discard_input(self):
+        """Drop all frames received so far."""
+        self.__rx_buffer = b""
+        while not self.__frames.empty():
+            self.__frames.get_nowait()
+
+    def write(self, data: str):
+        self.ser.write(data.encode("utf-8"))
+
+    async def read_frame(self, timeout: float) -> Optional[str]:
+        """Wait for next frame.
+
+        :param timeout: seconds to wait
+        :return: frame including terminator or None if nothing arrived in time
+        """
+        try:
+            return await asyncio.wait_for(self.__frames.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class AsyncFt991a:
+    """asyncio version of Ft991a.
+
+    Public methods mirror Ft991a as coroutines, refer to Ft991a for documentation
+    of parameters and returned values. Commands are sent one at a time, concurrent
+    callers wait for their turn without blocking the event loop. Methods taking many
+    settings (read_menu, write_menu, read_meters) send them one after another instead
+    of pipelining them.
+
+    Not mirrored (use Ft991a, e.g. through Ft991aExecutor, for these): batch, snapshot/restore,
+    memory bank and memory plan, Auto Information, cache, metrics, traffic recording,
+    connect/negotiate_link/calibrate_link and tune with its tune cache.
+    """
+    COMMANDS = Ft991a.COMMANDS
+
+    def __init__(self, serial_port, baud_rate):
+        self.serial_port = serial_port
+        self.baud_rate = baud_rate
+
+        self.function_menu = Menu()
+
+        self.transport = AsyncSerialTransport(serial_port, baud_rate)
+        self.__lock: Optional[asyncio.Lock] = None
+
+        # Seconds between sending last command and receiving its answer.
+        # None if last command did not answer.
+        self.last_latency: Optional[float] = None
+        # Round trip times learned while talking to transceiver, refer to Ft991a.link
+        self.link = LinkProfile()
+
+    async def open_serial(self):
+        print(f"Opening serial <{self.serial_port} {self.baud_rate}>")
+        self.__lock = asyncio.Lock()
+        await self.transport.open()
+
+    async def close_serial(self):
+        await self.transport.close()
+
+    async def __ser_send(self, command, raw=False):
+        async with self.__lock:
+            self.transport.discard_input()
+            self.transport.write(command)
+
+            sent = time.perf_counter()
+            self.last_latency = None
+            expects_answer = Ft991a.expects_answer(command)
+            default_deadline = Ft991a.command_deadline(command)
+            learned_deadline = self.link.deadline(command, expects_answer, default_deadline)
+            recv_str = await self.transport.read_frame(learned_deadline)
+            # Learned deadline missed, slow answer still gets default deadline
+            if recv_str is None and expects_answer and learned_deadline < default_deadline:
+                self.link.timeout(command)
+                recv_str = await self.transport.read_frame(max(sent + default_deadline - time.perf_counter(), 0))
+            # Command without answer
+            if recv_str is None:
+                if expects_answer:
+                    self.link.timeout(command)
+                return None
+            self.last_latency = time.perf_counter() - sent
+            self.link.observe(command, self.last_latency)
+            return parse_answer(command, recv_str, raw)
+
+    async def debug_send(self, command):
+        return await self.__ser_send(command, raw=True)
+
+    def __get_command(self, command):
+        if command in self.COMMANDS:
+            return self.COMMANDS[command]
+        raise CommandNotFoundError(f"Command '{command}' not supported.")
+
+    async def __send_command(self, command, parameter=None):
+        return await self.__ser_send(self.__get_command(command).get(parameter))
+
+    async def read_command(self, command: str, parameter: Optional[Union[str, int]] = None):
+        """Read any command and decode its answer. Refer to Ft991a.read_command."""
+        codec = self.__get_command(command)
+        if not codec.allow_read:
+            raise ActionNotSupportedError(f"Command '{command}' can not be read.")
+        return codec.decode(await self.__ser_send(codec.get(parameter)))
+
+    async def set_command(self, command: str, parameter: Optional[Union[str, int, bool]] = None):
+        """Set any command. Refer to Ft991a.set_command."""
+        codec = self.__get_command(command)
+        if not codec.allow_set:
+            raise ActionNotSupportedError(f"Command '{command}' can not be set.")
+        return await self.__ser_send(codec.get(parameter))
+
+    async def vfoa_to_vfob(self):
+        return await self.__send_command("AB")
+
+    async def vfob_to_vfoa(self):
+        return await self.__send_command("BA")
+
+    async def antenna_tuner_ctrl(self, action: str, **kwargs):
+        """Control of on-board antenna tuner. Refer to Ft991a.antenna_tuner_ctrl.
+
+        With wait_complete=True coroutine finishes when tuning is done, other
+        coroutines keep running in the meantime.
+        """
+        actions = Ft991aConfig.antenna_tuner_actions
+        action = action.upper()
+        if action not in actions:
+            raise ActionNotSupportedError(f"Action '{action}' is not supported with 'AC' command.")
+        ans = await self.__send_command("AC", f"00{actions[action]}")
+        if action == "TUNE" and kwargs.get("wait_complete", False):
+            await self.wait_tune_complete()
+        return ans
+
+    async def wait_tune_complete(self, timeout: float = Ft991aConfig.tuner_timeout):
+        """Poll tuner with growing interval until it finishes. Refer to Ft991a.wait_tune_complete."""
+        give_up = time.monotonic() + timeout
+        interval = Ft991aConfig.tuner_poll_interval
+        while True:
+            state = await self.read_antenna_tuner()
+            if not state.tune:
+                return state
+            if time.monotonic() > give_up:
+                raise TuneTimeoutError(f"Antenna tuner did not finish tuning in {timeout}s.")
+            await asyncio.sleep(interval)
+            interval = min(interval * Ft991aConfig.tuner_poll_backoff, Ft991aConfig.tuner_max_poll_interval)
+
+    async def read_antenna_tuner(self):
+        return decode_tuner(await self.__send_command("AC"))
+
+    async def set_af_gain(self, gain: int):
+        if gain < 0 < 256:
+            raise ParameterError(f"Gain can be between 0 and 255, not '{gain}'.")
+        await self.__send_command("AG", f"0{gain:0>3}")
+
+    async def read_af_gain(self) -> int:
+        return await self.read_command("AG", "0")
+
+    async def set_auto_notch(self, on: bool):
+        state = 1 if on else 0
+        return await self.__send_command("BC", parameter=f"0{state}")
+
+    async def read_auto_notch_on(self) -> bool:
+        return await self.read_command("BC", "0")
+
+    async def band_down(self):
+        return await self.__send_command("BD", parameter="0")
+
+    async def band_up(self):
+        return await self.__send_command("BU", parameter="0")
+
+    async def set_break_in(self, on):
+        state = 1 if on else 0
+        return await self.__send_command("BI", parameter=f"{state}")
+
+    async def is_break_in_on(self) -> bool:
+        return await self.read_command("BI")
+
+    async def set_manual_notch_state(self, on: bool):
+        state = 1 if on else 0
+        return await self.__send_command("BP", parameter=f"00{state}")
+
+    async def set_manual_notch_level(self, level: int):
+        if 1 > level > 3200:
+            raise ParameterError(f"Manual-notch level can be between 0 and 3200, not '{level}'.")
+        level = level // 10
+        return await self.__send_command("BP", parameter=f"01{level:0>3}")
+
+    async def read_manual_notch_level(self) -> int:
+        ans = await self.__send_command("BP", parameter="01")
+        return int(ans[-3:]) * 10
+
+    async def is_manual_notch_on(self) -> bool:
+        return bool(int((await self.__send_command("BP", parameter="00"))[-1]))
+
+    async def set_band(self, band):
+        band_num = band_number(band)
+        return await self.__send_command("BS", parameter=f"{band_num:0>2}")
+
+    async def read_menu_function(self, num):
+        param = self.function_menu.get_menu_function(num).read_command()
+        return await self.__send_command("EX", parameter=param)
+
+    async def write_menu_function(self, num, param):
+        param = self.function_menu.get_menu_function(num).format_param(param)
+        return await self.__send_command("EX", parameter=param)
+
+    async def read_menu(self, items) -> dict:
+        menu_items = [self.function_menu.get_menu_function(item) for item in items]
+        return {item.num: (await self.__send_command("EX", parameter=item.read_command()))[3:]
+                for item in menu_items}
+
+    async def write_menu(self, settings: dict):
+        for command in self.function_menu.write_commands(settings):
+            await self.__ser_send(command)
+
+    async def is_rx_busy(self) -> bool:
+        return bool(int((await self.__send_command("BY", ))[-2]))
+
+    async def set_vfo(self, frequency: Union[str, int], ab: str = "A"):
+        command = "FA" if ab == "A" else "FB"
+        return await self.__send_command(command, parse_frequency(frequency))
+
+    async def read_vfo(self, ab: str = "A") -> int:
+        command = "FA" if ab == "A" else "FB"
+        return await self.read_command(command)
+
+    async def set_mode(self, mode: str):
+        if mode not in Ft991aConfig.r_modes:
+            raise ParameterError(f"Mode can be one of {list(Ft991aConfig.r_modes)}, not '{mode}'.")
+        return await self.__send_command("MD", parameter=f"0{Ft991aConfig.r_modes[mode]}")
+
+    async def read_mode(self) -> str:
+        ans = await self.read_command("MD", "0")
+        return Ft991aConfig.modes.get(ans, ans)
+
+    async def read_status(self) -> InformationState:
+        """Read main band status in one round trip ("IF"). Refer to Ft991a.read_status."""
+        return decode_information(await self.__send_command("IF"))
+
+    async def read_opposite_status(self) -> InformationState:
+        """Read opposite band status in one round trip ("OI"). Refer to Ft991a.read_status."""
+        return decode_information(await self.__send_command("OI"))
+
+    async def set_mic_gain(self, mic_gain: int):
+        return await self.__send_command("MG", parameter=f"{mic_gain:0>3}")
+
+    async def read_mic_gain(self):
+        return await self.read_command("MG")
+
+    async def write_memory_channel(self, channel: int, frequency: str, mode: str, tag: str = " "*12,
+                                   clar_offset: int = 0, rx_clar=False, tx_clar=False, ctcss=False,
+                                   operation_mode="simplex"):
+        s = format_memory_channel(channel, frequency, mode, tag, clar_offset,
+                                  rx_clar, tx_clar, ctcss, operation_mode)
+        await self.__send_command("MT", parameter=s)
+
+    async def read_memory_channel(self, channel: int, raw=False):
+        try:
+            ans = await self.__send_command("MT", parameter=f"{channel:0>3}")
+        except MalformedResponse:
+            ans = None
+        return channel_info(channel, ans, raw)
+
+    async def set_output_rf_power(self, power: int):
+        await self.__send_command("PC", parameter=f"{power:0>3}")
+
+    async def read_output_rf_power(self):
+        return await self.read_command("PC")
+
+    async def power_on(self):
+        time_between_dummy = Ft991aConfig.time_between_dummy
+        if time_between_dummy < 1.1:
+            raise ValueError(f"time_beetween_dummy must be at least 1.1s not {time_between_dummy}s.")
+        for _ in range(Ft991aConfig.power_on_attempts):
+            async with self.__lock:
+                self.transport.discard_input()
+                self.transport.write("PS;")  # Dummy command
+            await asyncio.sleep(self.link.wake_gap)
+            await self.__send_command("PS", parameter="1")
+            if await self.__wait_power_on():
+                return None
+            self.link.wake_failed()
+        raise LinkNotFoundError(f"Transceiver on {self.serial_port} did not power on.")
+
+    async def __wait_power_on(self) -> bool:
+        timeout = time.perf_counter() + Ft991aConfig.power_on_timeout
+        while time.perf_counter() < timeout:
+            try:
+                if await self.__send_command("PS") == "1":
+                    return True
+            except MalformedResponse:
+                pass
+        return False
+
+    async def power_off(self):
+        return await self.__send_command("PS", parameter="0")
+
+    async def __read_meter(self, meter: str):
+        command = Ft991aConfig.r_meter_reading[meter]
+        return await self.read_command("RM", command)
+
+    async def read_meters(self, meters=("SM", "COMP", "ALC", "PO", "SWR", "ID", "VDD")) -> tuple:
+        readings = []
+        for meter in meters:
+            command = ("SM", "0") if meter == "SM" else ("RM", Ft991aConfig.r_meter_reading[meter])
+            readings.append(decode_meter(command[0], await self.__send_command(*command)))
+        return tuple(readings)
+
+    async def read_meter_compression(self):
+        return await self.__read_meter("COMP")
+
+    async def read_meter_alc(self):
+        return await self.__read_meter("ALC")
+
+    async def read_meter_power(self):
+        return await self.__read_meter("PO")
+
+    async def read_meter_swr(self):
+        return await self.__read_meter("SWR")
+
+    async def read_meter_id(self):
+        return await self.__read_meter("ID")
+
+    async def read_meter_vdd(self):
+        return await self.__read_meter("VDD")
+
+    async def read_smeter(self) -> int:
+        return await self.read_command("SM", "0")
+
+    async def set_squelch_level(self, squelch: int):
+        if squelch < 0 or squelch > 100:
+            raise ParameterError(f"Squelch level can be between 0 and 100, not '{squelch}'.")
+        return await self.__send_command("SQ", parameter=f"0{squelch:0>3}")
+
+    async def read_squelch(self) -> int:
+        return await self.read_command("SQ", "0")
+
+    async def read_tx_state(self) -> str:
+        return decode_tx_state(await self.__send_command("TX")).state
+
+    async def tx_on(self):
+        return await self.__send_command("TX", parameter="1")
+
+    async def tx_off(self):
+        return await self.__send_command("TX", parameter="0")
@@ -0,0 +1,138 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import logging
+import threading
+import time
+from collections import namedtuple
+from typing import Callable, Optional
+
+from ft991a_config import Ft991aConfig
+from ft991a_responses import InformationState, TxState, decode_information, decode_tx_state
+
+
+logger = logging.getLogger(__name__)
+
+FrequencyEvent = namedtuple("FrequencyEvent", "vfo frequency")
+ModeEvent = namedtuple("ModeEvent", "mode")
+TxEvent = TxState
+InformationEvent = InformationState
+# Any other frame transceiver sends in Auto Information mode
+FrameEvent = namedtuple("FrameEvent", "command parameter")
+
+
+def parse_information(ans: str) -> InformationEvent:
+    """Decode parameter of "IF" (or "OI") answer.
+
+    :param ans: e.g. "001014250000+000000C00000"
+    """
+    return decode_information(ans)
+
+
+def parse_frame(frame: str):
+    """Turn frame sent by transceiver into event.
+
+    :param frame: e.g. "FA014250000;"
+    :return: event or None for error frames ("?;")
+    """
+    command, parameter = frame[:2], frame[2:-1]
+    if command == "?;" or not parameter:
+        return None
+    try:
+        if command in ("FA", "FB"):
+            return FrequencyEvent(vfo=command[1], frequency=int(parameter))
+        if command == "MD":
+            return ModeEvent(mode=Ft991aConfig.modes.get(parameter[-1], parameter[-1]))
+        if command == "TX":
+            return decode_tx_state(parameter)
+        if command == "IF" and len(parameter) >= 25:
+            return parse_information(parameter)
+    except ValueError:
+        pass
+    return FrameEvent(command=command, parameter=parameter)
+
+
+class RigState:
+    """Last known state of transceiver, kept up to date by Auto Information frames.
+
+    Attributes are None until transceiver reports them.
+    """
+
+    def __init__(self):
+        self.vfo_a: Optional[int] = None
+        self.vfo_b: Optional[int] = None
+        self.mode: Optional[str] = None
+        self.tx_state: Optional[str] = None
+        self.information: Optional[InformationEvent] = None
+
+        # time.monotonic() of last update
+        self.updated: Optional[float] = None
+
+    def apply(self, event):
+        if isinstance(event, FrequencyEvent):
+            if event.vfo == "A":
+                self.vfo_a = event.frequency
+            else:
+                self.vfo_b = event.frequency
+        elif isinstance(event, ModeEvent):
+            self.mode = event.mode
+        elif isinstance(event, TxEvent):
+            self.tx_state = event.state
+        elif isinstance(event, InformationEvent):
+            self.information = event
+            self.vfo_a = event.frequency if event.memory_mode == "VFO" else self.vfo_a
+            self.mode = event.mode
+        else:
+            return
+        self.updated = time.monotonic()
+
+    def __repr__(self):
+        return f"<vfo_a: {self.vfo_a} vfo_b: {self.vfo_b} mode: {self.mode} tx_state: {self.tx_state}>"
+
+
+class AutoInformation:
+    """Dispatches frames transceiver sends on its own when Auto Information ("AI1;") is on.
+
+    e.g.:
+        ai = ft.start_auto_information()
+        ai.subscribe(print, FrequencyEvent)
+        print(ai.state.vfo_a)
+    """
+
+    def __init__(self):
+        self.state = RigState()
+        self.__subscribers = []
+        self.__lock = threading.Lock()
+
+    def subscribe(self, callback: Callable, event_type: Optional[type] = None):
+        """Call callback(event) for every event of event_type (all events if None).
+
+        Callbacks run on the reader thread and must return quickly.
+        """
+        with self.__lock:
+            self.__subscribers.append((callback, event_type))
+
+    def unsubscribe(self, callback: Callable):
+        with self.__lock:
+            self.__subscribers = [(cb, et) for cb, et in self.__subscribers if cb != callback]
+
+    def dispatch(self, frame: str):
+        """Update state and call subscribers. Failing subscriber is logged and does not
+        keep other subscribers (or reader thread) from running."""
+        try:
+            event = parse_frame(frame)
+        except Exception:
+            logger.exception("Could not parse Auto Information frame %r.", frame)
+            return
+        if event is None:
+            return
+        self.state.apply(event)
+        with self.__lock:
+            subscribers = list(self.__subscribers)
+        for callback, event_type in subscribers:
+            if event_type is None or isinstance(event, event_type):
+                try:
+                    callback(event)
+                except Exception:
+                    logger.exception("Auto Information subscriber %r failed on %r.", callback, event)
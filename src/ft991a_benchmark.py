@@ -0,0 +1,157 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from ft991a import Ft991a
+from ft991a_emulator import Ft991aEmulator
+from ft991a_metrics import Metrics
+from ft991a_profile import Profile, ProfileSwitcher
+from ft991a_scanner import BandScanner
+
+
+def percentile(ordered: list, p: float) -> float:
+    """Nearest-rank percentile of sorted list."""
+    rank = min(max(math.ceil(p / 100 * len(ordered)), 1), len(ordered))
+    return ordered[rank - 1]
+
+
+def run_case(name: str, func, iterations: int, metrics: Metrics) -> dict:
+    """Call func iterations times and summarize its latency.
+
+    :param metrics: enabled on Ft991a func uses, counts CAT commands func actually sends
+    """
+    latencies = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()  # Warm up
+        metrics.reset()
+        started = time.perf_counter()
+        for _ in range(iterations):
+            call_started = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - call_started)
+        total = time.perf_counter() - started
+    commands = sum(command.calls for command in metrics.commands.values())
+    latencies.sort()
+    return {
+        "name": name,
+        "iterations": iterations,
+        "commands_per_call": commands / iterations,
+        "total_s": total,
+        "calls_per_s": iterations / total,
+        "commands_per_s": commands / total,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "p99_s": percentile(latencies, 99),
+        "max_s": latencies[-1],
+    }
+
+
+def measure_import(module: str, iterations: int = 10) -> dict:
+    """Import module in fresh interpreters and summarize how long the import takes.
+
+    :param module: e.g. "ft991a", "scripts.ft8"
+    """
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    latencies = sorted(float(subprocess.run([sys.executable, "-c", code], cwd=src_dir, check=True,
+                                            capture_output=True, text=True).stdout)
+                       for _ in range(iterations))
+    return {
+        "module": module,
+        "iterations": iterations,
+        "p50_s": percentile(latencies, 50),
+        "max_s": latencies[-1],
+    }
+
+
+def run_benchmarks(iterations: int = 100, bulk_iterations: int = 5, model_wire_time: bool = True,
+                   response_latency: float = 0.001) -> dict:
+    """Run all benchmark cases against a local Ft991aEmulator.
+
+    :param iterations: calls of single command cases
+    :param bulk_iterations: calls of cases dumping whole menu or memory
+    :param model_wire_time: emulate transmit time at 38400 baud
+    :param response_latency: emulated processing time of each command in seconds
+    """
+    emulator = Ft991aEmulator(model_wire_time=model_wire_time, response_latency=response_latency)
+    emulator.start()
+    ft = Ft991a(emulator.port, 38400)
+    with contextlib.redirect_stdout(io.StringIO()):
+        ft.open_serial()
+    for ch in range(1, 118, 2):
+        ft.write_memory_channel(ch, frequency=145000000 + ch * 12500, mode="FM", tag=f"CH {ch}")
+
+    scanner = BandScanner(ft, "14M", "14.35M", "5k", dwell=0.0, restore=False)
+    rollback_file = os.path.join(tempfile.mkdtemp(), "rollback.json")
+    switcher = ProfileSwitcher(ft, rollback_file=rollback_file)
+    profiles = [Profile.load("ft8"), Profile.load("ssb")]
+
+    def switch_profile():
+        # Alternate, so every call changes settings
+        profiles.reverse()
+        switcher.apply(profiles[0])
+    cases = [
+        ("read_vfo", ft.read_vfo, iterations),
+        ("read_smeter", ft.read_smeter, iterations),
+        ("read_status", ft.read_status, iterations),
+        ("set_vfo", lambda: ft.set_vfo("14.074M"), iterations),
+        ("read_memory_channel", lambda: ft.read_memory_channel(1), iterations),
+        ("list_menu_settings", ft.list_menu_settings, bulk_iterations),
+        ("list_memory", ft.list_memory, bulk_iterations),
+        ("band_scan", scanner.scan, bulk_iterations),
+        ("profile_switch", switch_profile, bulk_iterations),
+    ]
+    try:
+        metrics = ft.enable_metrics()
+        results = [run_case(name, func, case_iterations, metrics) for name, func, case_iterations in cases]
+    finally:
+        ft.close_serial()
+        emulator.stop()
+        if os.path.exists(rollback_file):
+            os.remove(rollback_file)
+
+    return {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "model_wire_time": model_wire_time,
+        "response_latency_s": response_latency,
+        "cases": results,
+        "imports": [measure_import(module) for module in ("ft991a", "scripts.ft8")],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CAT throughput and latency against emulated FT-991A.")
+    parser.add_argument("-o", "--output", type=str, default="benchmark.json", help="JSON file to write results to")
+    parser.add_argument("-n", "--iterations", type=int, default=100, help="Calls of single command cases")
+    parser.add_argument("-b", "--bulk-iterations", type=int, default=5, help="Calls of menu/memory dump cases")
+    parser.add_argument("--no-wire-time", action="store_true", default=False, help="Do not emulate 38400 baud")
+    parser.add_argument("--latency", type=float, default=0.001, help="Emulated processing time per command")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.iterations, args.bulk_iterations, not args.no_wire_time, args.latency)
+    with open(args.output, "w") as out_file:
+        json.dump(results, out_file, indent=2)
+
+    for case in results["cases"]:
+        print(f"{case['name']:<22} {case['commands_per_s']:>9.1f} commands/s  p50 {case['p50_s'] * 1e3:7.2f}ms  "
+              f"p95 {case['p95_s'] * 1e3:7.2f}ms  p99 {case['p99_s'] * 1e3:7.2f}ms")
+    for case in results["imports"]:
+        print(f"import {case['module']:<15} p50 {case['p50_s'] * 1e3:7.2f}ms  max {case['max_s'] * 1e3:7.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
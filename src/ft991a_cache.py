@@ -0,0 +1,71 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import threading
+import time
+from typing import Optional
+
+from ft991a_config import Ft991aConfig
+from ft991a_responses import read_key
+
+
+class StateCache:
+    """Write-through cache of answers to read commands.
+
+    Entries are keyed by read command (e.g. "AG0;") and hold complete answer frame
+    (e.g. "AG0100;"). Set commands of most commands have the same form as the answer
+    to their read, so a successful set is stored as the new answer.
+    Only commands with TTL in Ft991aConfig.cache_ttl are cached.
+    """
+
+    def __init__(self, ttl: Optional[dict] = None):
+        self.ttl = Ft991aConfig.cache_ttl if ttl is None else ttl
+        self.__entries = {}
+        self.__lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, command: str) -> Optional[str]:
+        """Cached answer frame to read command or None if missing or stale."""
+        ttl = self.ttl.get(command[:2])
+        if not ttl:
+            return None
+        with self.__lock:
+            entry = self.__entries.get(command)
+        if entry is not None and time.monotonic() - entry[1] < ttl:
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        return None
+
+    def put(self, command: str, frame: str):
+        """Store answer frame to read command."""
+        if command[:2] in self.ttl:
+            with self.__lock:
+                self.__entries[command] = (frame, time.monotonic())
+
+    def update(self, frame: str):
+        """Store state from successful set command or frame sent by transceiver on its own."""
+        code = frame[:2]
+        if code in self.ttl:
+            self.put(read_key(frame), frame)
+        if code in Ft991aConfig.cache_invalidated_by:
+            for invalidated in Ft991aConfig.cache_invalidated_by[code]:
+                self.invalidate(invalidated)
+
+    def invalidate(self, command: Optional[str] = None):
+        """Drop cached entries.
+
+        :param command: command code (e.g. "FA") or read command (e.g. "AG0;"),
+                        None drops everything
+        """
+        with self.__lock:
+            if command is None:
+                self.__entries.clear()
+            elif len(command) == 2:
+                for key in [key for key in self.__entries if key[:2] == command]:
+                    del self.__entries[key]
+            else:
+                self.__entries.pop(command, None)
@@ -2,6 +2,7 @@
 # When it's good, it's very good.
 # When it's bad, it's better than nothing.
 # When it lies to you, it may be a while before you realize something's wrong.
+import os
 from dataclasses import dataclass
 
 
@@ -11,6 +12,180 @@ class Ft991aConfig:
     # Time between dummy command and on command.
     # Must be between 1s sand 2s
     time_between_dummy = 1.1
+    max_time_between_dummy = 1.9
+
+    # Power on attempts and seconds to wait for transceiver to report it is on after each
+    power_on_attempts = 3
+    power_on_timeout = 5.0
+
+    # Poll interval of serial reads in seconds.
+    # Reader wakes up at least this often while waiting for a response.
+    read_poll_interval = 0.002
+
+    # Seconds to wait for an answer to a read command before giving up.
+    read_deadline = 0.5
+
+    # Seconds to wait after a set command for a possible error ("?;").
+    # Set commands do not answer when successful.
+    set_deadline = 0.03
+
+    # Per-command deadlines (seconds) overriding read_deadline/set_deadline.
+    command_deadlines = {
+        "PS": 1.0,
+    }
+
+    # Answer to "ID;", identifies FT-991A
+    radio_id = "0670"
+
+    # CAT RATE (menu 031) setting -> baud rate
+    cat_rates = {
+        "0": 4800,
+        "1": 9600,
+        "2": 19200,
+        "3": 38400,
+    }
+
+    # CAT TOT (menu 032) setting -> seconds
+    cat_tots = {
+        "0": 0.01,
+        "1": 0.1,
+        "2": 1.0,
+        "3": 3.0,
+    }
+
+    # Link settings found by Ft991a.negotiate_link(), per serial port
+    link_settings_file = os.path.join(os.path.expanduser("~"), ".ft991a_link.json")
+
+    # Adaptive deadlines, see LinkProfile.
+    # Learned deadline of a command is smoothed round trip time + link_deadline_factor * its variation,
+    # used after link_min_samples answers and kept between link_min_deadline and link_max_deadline.
+    link_min_samples = 3
+    link_deadline_factor = 4
+    link_min_deadline = 0.02
+    link_max_deadline = 2.0
+    # Gap between writes after a missed answer, doubled on every miss, halved on every answer
+    link_min_gap = 0.001
+    link_max_gap = 0.1
+
+    # Commands Ft991a.calibrate_link() measures
+    calibration_commands = ("ID;", "FA;", "IF;", "AG0;", "EX032;", "SM0;")
+
+    # Maximum number of bytes written to transceiver in one go when batching commands.
+    # Kept well below size of transceiver's CAT input buffer.
+    batch_write_size = 128
+
+    # Seconds BandScanner waits after moving VFO for receiver (and S-meter) to settle
+    scan_dwell = 0.03
+
+    # TCP port of rigctld compatible server (Hamlib's default)
+    rigctld_port = 4532
+    # Hamlib mode names -> names in modes
+    rigctl_modes = {
+        "LSB": "LSB", "USB": "USB", "CW": "CW", "CWR": "CW-R", "AM": "AM", "AMN": "AM-N", "FM": "FM",
+        "FMN": "FM-N", "RTTY": "RTTY-LSB", "RTTYR": "RTTY_USB", "PKTLSB": "DATA-LSB", "PKTUSB": "DATA-USB",
+        "PKTFM": "DATA-FM", "C4FM": "C4FM",
+    }
+    # S-meter reading (0 - 255) -> dB relative to S9, points between are interpolated
+    smeter_db = ((0, -54), (12, -48), (27, -42), (40, -36), (55, -30), (65, -24), (80, -18), (95, -12),
+                 (112, -6), (130, 0), (150, 10), (172, 20), (190, 30), (220, 40), (240, 50), (255, 60))
+    # SWR meter reading (0 - 255) -> SWR
+    swr_ratio = ((0, 1.0), (26, 1.2), (52, 1.5), (89, 2.0), (126, 3.0), (255, 10.0))
+
+    # Metrics, see Ft991a.enable_metrics().
+    # Latency histograms keep values within 1/histogram_sub_buckets (power of two) up to histogram_max_latency
+    # seconds, Prometheus export sums them into metrics_buckets (seconds).
+    histogram_sub_buckets = 16
+    histogram_max_latency = 60.0
+    metrics_buckets = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+    metrics_port = 9991
+
+    # Priority of Ft991a methods run through Ft991aExecutor, lower runs first.
+    # Methods not listed get default_priority.
+    default_priority = 10
+    # Calls of this priority or lower do not wait for call in progress to finish,
+    # they run between its commands
+    preempt_priority = 0
+    method_priorities = {
+        "tx_off": 0,
+        "tx_on": 0,
+        "power_off": 0,
+    }
+
+    # Seconds an answer to read command is served from Ft991a cache (see Ft991a(cache=True)).
+    # Commands not listed are never cached (e.g. "SM", "RM" meters).
+    cache_ttl = {
+        "FA": 1.0,
+        "FB": 1.0,
+        "AG": 10.0,
+        "SQ": 10.0,
+        "PC": 10.0,
+        "MG": 10.0,
+    }
+
+    # Cached commands invalidated when a command changes them as a side effect.
+    cache_invalidated_by = {
+        "AB": ("FB",),
+        "BA": ("FA",),
+        "SV": ("FA", "FB"),
+        "BD": ("FA",),
+        "BU": ("FA",),
+        "BS": ("FA",),
+        "UP": ("FA",),
+        "DN": ("FA",),
+        "CH": ("FA",),
+        "MA": ("FA",),
+        "MC": ("FA",),
+        "VM": ("FA",),
+        "QR": ("FA",),
+        "PS": tuple(cache_ttl),
+    }
+
+    # Commands left out of Ft991a.snapshot(). Read-only ones are left out anyway.
+    snapshot_skip_commands = ("BP", "CN", "CO", "DT", "KM", "LM", "MR", "PB")
+
+    # Settings (read commands) Ft991a.restore() never sends back.
+    restore_skip = (
+        "EX031;",  # CAT RATE, changing it drops the link
+        "EX087;",  # RADIO ID, read only
+        "FT;",
+        "PS;",
+        "TX;",
+        "MX;",
+        "SC;",
+        "AC;",  # Tuner state, sending "tuning" back would start a tune
+        "AI;",  # Auto information, Ft991a tracks whether it is on itself
+    )
+
+    # Order in which Ft991a.restore() sends changed settings, "*" stands for all other commands.
+    # Menu and memory first, mode before its filter width, frequency last.
+    restore_order = ("EX", "MT", "MC", "MD", "NA", "SH", "*", "FA", "FB")
+
+    # Settings operating profiles changed (see ProfileSwitcher), kept for rollback per serial port
+    profile_rollback_file = os.path.join(os.path.expanduser("~"), ".ft991a_rollback.json")
+    # Times ProfileSwitcher.apply() sends settings that did not read back as set
+    profile_verify_attempts = 2
+
+    # Number of parameter characters a read command of given type carries.
+    # Anything longer is a set command (e.g. "AG0;" reads, "AG0100;" sets).
+    read_parameter_length = {
+        "AG": 1, "BC": 1, "BP": 2, "CN": 2, "CO": 2, "CT": 1, "DT": 1, "EX": 3, "GT": 1, "IS": 1,
+        "KM": 1, "LM": 1, "MD": 1, "ML": 1, "MR": 3, "MT": 3, "NA": 1, "NB": 1, "NL": 1, "NR": 1,
+        "OS": 1, "PA": 1, "PB": 1, "PR": 1, "RA": 1, "RG": 1, "RI": 1, "RL": 1, "RM": 1, "SH": 1,
+        "SM": 1, "SQ": 1,
+    }
+
+    # How Ft991a.read() decodes answer (without read parameter) of given command.
+    # "int" ... number, e.g. "FA014250000;" -> 14250000
+    # "bool" .. on/off, e.g. "NB01;" -> True
+    # Commands not listed are returned as string.
+    answer_types = {
+        "AG": "int", "BP": "int", "CN": "int", "FA": "int", "FB": "int", "IS": "int", "KP": "int",
+        "KS": "int", "MC": "int", "MG": "int", "ML": "int", "NL": "int", "PC": "int", "PL": "int",
+        "RG": "int", "RL": "int", "RM": "int", "SD": "int", "SM": "int", "SQ": "int", "VD": "int",
+        "VG": "int",
+        "AI": "bool", "BC": "bool", "BI": "bool", "CS": "bool", "FS": "bool", "LK": "bool", "MX": "bool",
+        "NB": "bool", "PS": "bool", "RT": "bool", "TS": "bool", "VX": "bool", "XT": "bool",
+    }
 
     modes = {
         "1": "LSB",
@@ -37,6 +212,19 @@ class Ft991aConfig:
         "TUNE": 2
     }
 
+    # Waiting for antenna tuner to finish: "AC" is polled every tuner_poll_interval seconds at first,
+    # interval grows by tuner_poll_backoff up to tuner_max_poll_interval
+    tuner_poll_interval = 0.05
+    tuner_poll_backoff = 1.5
+    tuner_max_poll_interval = 0.25
+    tuner_timeout = 30.0
+
+    # Tune results remembered by Ft991a.tune(), per serial port and frequency segment.
+    # Tuner recalls its match for a segment tuned within tune_cache_ttl seconds, so tuning it again is skipped.
+    tune_cache_file = os.path.join(os.path.expanduser("~"), ".ft991a_tune.json")
+    tune_segment_width = 50_000
+    tune_cache_ttl = 7 * 24 * 3600
+
     bands = {
         0: ("1.8", "160m"),
         1: ("3.5", "80m"),
@@ -62,7 +250,10 @@ class Ft991aConfig:
 
     memory_mode = {
         "0": "VFO",
-        "1": "memory"
+        "1": "memory",
+        "2": "memory tune",
+        "3": "QMB",
+        "5": "PMS"
     }
 
     ctcss_states = {
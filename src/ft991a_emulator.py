@@ -0,0 +1,294 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import os
+import random
+import select
+import termios
+import threading
+import time
+import tty
+from typing import Optional
+
+from ft991a import Ft991a, Ft991aCommand, parse_frequency, read_key
+from ft991a_config import Ft991aConfig
+from menu import Menu, MenuItemNotFoundError
+
+
+# Answers of read commands the emulator starts with, in addition to settings file.
+DEFAULT_STATE = [
+    "AC000;", "AG0100;", "AI0;", "BC00;", "BI0;", "BP00000;", "BP01000;", "BY00;", "CN00000;", "CO00000;",
+    "CS0;", "CT00;", "DA000209;", "DT020181018;", "FA014250000;", "FB007074000;", "FS1;", "FT0;", "GT03;",
+    "ID0670;", "IS0+0000;", "KP40;", "KR0;", "KS020;", "LK0;", "LM00;", "MC001;", "MD02;", "MG030;",
+    "ML0000;", "MS3;", "MX0;", "NA00;", "NB00;", "NL0005;", "NR00;", "OS00;", "PA00;", "PB00;", "PC050;",
+    "PL010;", "PR00;", "PS1;", "RA00;", "RG0255;", "RI00;", "RL001;", "RS0;", "RT0;", "SC0;", "SD0200;",
+    "SH014;", "SQ0000;", "TS0;", "TX0;", "UL0;", "VD0500;", "VG050;", "VX0;", "XT0;",
+    "EX0313;", "EX0321;",
+]
+
+# termios speed constants of baud rates FT-991A supports
+TERMIOS_BAUD_RATES = {getattr(termios, f"B{baud}"): baud for baud in Ft991aConfig.cat_rates.values()}
+
+
+class Ft991aEmulator:
+    """Software FT-991A serving CAT protocol on a pseudo-terminal (Linux/macOS).
+
+    Commands and their set/read flags come from commands.csv, menu items from menu.csv.
+    Emulator keeps state of every readable command, both VFOs, 117 memory channels,
+    153 menu items and meters, and answers "?;" to anything it does not understand.
+
+    e.g.:
+        emulator = Ft991aEmulator()
+        emulator.start()
+        ft = Ft991a(emulator.port, 38400)
+        ft.open_serial()
+    """
+
+    def __init__(self, settings_file: Optional[str] = None, model_wire_time: bool = False,
+                 model_cat_tot: bool = False, response_latency: float = 0.0, tune_time: float = 0.5,
+                 model_baud_rate: bool = False):
+        """
+        :param settings_file: file with one answer per line (e.g. last_settings.dat) to start from
+        :param model_wire_time: delay input and answers by their transmit time at CAT RATE (menu 031)
+        :param model_cat_tot: drop incomplete commands after CAT TOT (menu 032) of silence
+        :param model_baud_rate: ignore input while port's baud rate does not match CAT RATE (menu 031)
+        :param response_latency: seconds transceiver needs to process a command
+        :param tune_time: seconds antenna tuner takes to tune
+        """
+        self.model_wire_time = model_wire_time
+        self.model_cat_tot = model_cat_tot
+        self.model_baud_rate = model_baud_rate
+        self.response_latency = response_latency
+        self.tune_time = tune_time
+
+        self.commands = Ft991a.COMMANDS
+        self.menu = Menu()
+
+        # Read command (e.g. "AG0;") -> answer (e.g. "AG0100;")
+        self.state = {}
+        self.reset(settings_file)
+
+        # Meter readings, 0 - 255, "SM" and names from Ft991aConfig.meter_reading
+        self.meters = {meter: 0 for meter in ("SM", *Ft991aConfig.r_meter_reading)}
+        self.noise = 0
+        # Carriers on air, frequency in Hz -> S-meter level (0 - 255) within signal_width of it
+        self.signals = {}
+        self.signal_width = 2500
+
+        self.received = 0
+        self.__master: Optional[int] = None
+        self.__slave: Optional[int] = None
+        self.__thread: Optional[threading.Thread] = None
+        self.__running = False
+        self.__write_lock = threading.Lock()
+        self.__tune_done = 0.0
+        # Time of dummy command waking powered off transceiver up
+        self.__woken = 0.0
+
+    def reset(self, settings_file: Optional[str] = None):
+        self.state = {}
+        for item in self.menu.MENU_ITEMS:
+            digits = max(item.digits, 1)
+            self.state[f"EX{item.num:0>3};"] = f"EX{item.num:0>3}{'0' * digits};"
+        for answer in DEFAULT_STATE:
+            self.state[read_key(answer)] = answer
+        if settings_file is not None:
+            with open(settings_file, "r") as s_file:
+                for answer in s_file.read().split("\n"):
+                    # Memory channel answers do not carry channel number reliably
+                    if answer.endswith(Ft991aCommand.TERMINATOR) and not answer.startswith("MT"):
+                        self.state[read_key(answer)] = answer
+
+    @property
+    def port(self) -> str:
+        """Name of serial port to open, e.g. "/dev/pts/3"."""
+        return os.ttyname(self.__slave)
+
+    def menu_value(self, num: int) -> str:
+        return self.state[f"EX{num:0>3};"][5:-1]
+
+    def start(self):
+        self.__master, self.__slave = os.openpty()
+        tty.setraw(self.__slave)
+        tty.setraw(self.__master)
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__serve, name="Ft991aEmulator", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__running = False
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+        os.close(self.__master)
+        os.close(self.__slave)
+
+    def __wire_time(self, n_bytes: int) -> float:
+        if not self.model_wire_time:
+            return 0.0
+        # 8N1, 10 bits per byte
+        return n_bytes * 10 / Ft991aConfig.cat_rates[self.menu_value(31)]
+
+    def __baud_mismatch(self) -> bool:
+        speed = termios.tcgetattr(self.__slave)[5]
+        return TERMIOS_BAUD_RATES.get(speed) != Ft991aConfig.cat_rates[self.menu_value(31)]
+
+    def __write(self, data: str):
+        if not data:
+            return
+        time.sleep(self.__wire_time(len(data)))
+        with self.__write_lock:
+            os.write(self.__master, data.encode("utf-8"))
+
+    def __serve(self):
+        buffer = b""
+        last_byte = time.monotonic()
+        while self.__running:
+            readable, _, _ = select.select([self.__master], [], [], 0.05)
+            if not readable:
+                continue
+            data = os.read(self.__master, 1024)
+            if self.model_baud_rate and self.__baud_mismatch():
+                # Transceiver would only see garbage
+                continue
+            now = time.monotonic()
+            if self.model_cat_tot and buffer and now - last_byte > Ft991aConfig.cat_tots[self.menu_value(32)]:
+                buffer = b""
+            last_byte = now
+            self.received += len(data)
+            time.sleep(self.__wire_time(len(data)))
+            buffer += data
+            terminator = Ft991aCommand.TERMINATOR.encode("utf-8")
+            while terminator in buffer:
+                frame, buffer = buffer.split(terminator, 1)
+                if self.response_latency:
+                    time.sleep(self.response_latency)
+                try:
+                    answer = self.process(frame.decode("utf-8") + Ft991aCommand.TERMINATOR)
+                except (ValueError, KeyError, IndexError, UnicodeDecodeError, MenuItemNotFoundError):
+                    answer = "?;"
+                self.__write(answer)
+
+    def process(self, command: str) -> str:
+        """Execute one command.
+
+        :param command: e.g. "FA014250000;"
+        :return: answer, "" for set commands or "?;" for error
+        """
+        code = command[:2]
+        parameter = command[2:-1]
+        if self.state.get("PS;") == "PS0;":
+            return self.__powered_off(command)
+        if code not in self.commands:
+            return "?;"
+        cmd = self.commands[code]
+        if cmd.is_read(command):
+            return self.__read(code, parameter, command)
+        if not cmd.allow_set:
+            return "?;"
+        return self.__set(code, parameter, command)
+
+    def __powered_off(self, command: str) -> str:
+        # Powered off transceiver answers nothing, first command wakes it up and
+        # "PS1;" has to follow within 1 - 2 s
+        now = time.monotonic()
+        since_wake = now - self.__woken
+        if command == "PS1;" and 1.0 <= since_wake <= 2.0:
+            self.state["PS;"] = "PS1;"
+            self.__woken = 0.0
+        elif since_wake > 2.0:
+            self.__woken = now
+        return ""
+
+    def __read(self, code: str, parameter: str, command: str) -> str:
+        if code == "SM":
+            return f"SM0{self.__meter('SM'):0>3};"
+        if code == "BY":
+            # Squelch opens when S-meter is above squelch level (SQ 0 - 100)
+            busy = self.__meter("SM") > int(self.state["SQ0;"][3:-1]) * 255 // 100
+            return f"BY{int(busy)}0;"
+        if code == "RM":
+            return f"RM{parameter}{self.__meter(Ft991aConfig.meter_reading[parameter]):0>3};"
+        if code == "AC":
+            if self.__tune_done and time.monotonic() >= self.__tune_done:
+                self.__tune_done = 0.0
+                self.state["AC;"] = "AC001;"
+        if code in ("IF", "OI"):
+            return self.__information(code)
+        if command not in self.state:
+            return "?;"
+        return self.state[command]
+
+    def __set(self, code: str, parameter: str, command: str) -> str:
+        if code in ("FA", "FB"):
+            if len(parameter) != 9 or not parameter.isdigit():
+                return "?;"
+        elif code == "EX":
+            item = self.menu.get_menu_function(int(parameter[:3]))
+            if item.digits and len(parameter) - 3 != item.digits:
+                return "?;"
+        elif code == "MT":
+            if not 1 <= int(parameter[:3]) <= 117 or len(parameter) < 27:
+                return "?;"
+        elif code == "AC":
+            if parameter == "002":
+                self.__tune_done = time.monotonic() + self.tune_time
+                command = "AC002;"
+        elif code == "AB":
+            self.state["FB;"] = f"FB{self.state['FA;'][2:]}"
+        elif code == "BA":
+            self.state["FA;"] = f"FA{self.state['FB;'][2:]}"
+        elif code == "SV":
+            self.state["FA;"], self.state["FB;"] = f"FA{self.state['FB;'][2:]}", f"FB{self.state['FA;'][2:]}"
+        elif code in ("BU", "BD", "UP", "DN"):
+            step = {"BU": 1_000_000, "BD": -1_000_000, "UP": 10, "DN": -10}[code]
+            self.set_frequency(int(self.state["FA;"][2:-1]) + step)
+            return ""
+
+        if self.commands[code].allow_read:
+            self.state[read_key(command)] = command
+            self.__auto_information(command)
+        return ""
+
+    def __meter(self, meter: str) -> int:
+        value = self.meters[meter]
+        if meter == "SM" and self.signals:
+            frequency = int(self.state["FA;"][2:-1])
+            value = max([value] + [level for carrier, level in self.signals.items()
+                                   if abs(carrier - frequency) <= self.signal_width])
+        if self.noise:
+            value = min(max(value + random.randint(-self.noise, self.noise), 0), 255)
+        return value
+
+    def __information(self, code: str) -> str:
+        frequency = self.state["FA;" if code == "IF" else "FB;"][2:-1]
+        mode = self.state["MD0;"][-2]
+        memory_mode = "0"
+        return f"{code}{self.state['MC;'][2:-1]}{frequency}+000000{mode}{memory_mode}0000;"
+
+    def __auto_information(self, answer: str):
+        if self.state["AI;"] == "AI1;" and self.commands[answer[:2]].allow_read:
+            self.__write(answer)
+
+    def send_raw(self, data: bytes):
+        """Simulate transceiver sending data on its own, e.g. line noise b"\\xff\\xfe;"."""
+        with self.__write_lock:
+            os.write(self.__master, data)
+
+    def set_frequency(self, frequency, ab: str = "A"):
+        """Simulate turning of VFO knob."""
+        answer = f"F{ab}{parse_frequency(frequency)};"
+        self.state[f"F{ab};"] = answer
+        self.__auto_information(answer)
+
+
+if __name__ == '__main__':
+    emulator = Ft991aEmulator(settings_file="last_settings.dat")
+    emulator.start()
+    print(f"FT-991A emulator listening on {emulator.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        emulator.stop()
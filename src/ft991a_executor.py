@@ -0,0 +1,153 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+from typing import Optional
+
+from ft991a import Ft991a
+from ft991a_config import Ft991aConfig
+
+
+class LatencyStats:
+    """Latency between submitting a call and its completion."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, latency: float):
+        self.count += 1
+        self.total += latency
+        self.last = latency
+        if latency > self.max:
+            self.max = latency
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def __repr__(self):
+        return f"<count: {self.count} mean: {self.mean:.6f}s max: {self.max:.6f}s last: {self.last:.6f}s>"
+
+
+class Ft991aExecutor:
+    """Runs Ft991a methods on a single I/O worker thread which owns the serial port.
+
+    Calls from any thread are queued by priority (Ft991aConfig.method_priorities),
+    so tx_off, tx_on and power_off jump ahead of queued polls. Calls of
+    Ft991aConfig.preempt_priority or lower do not wait for a long call in progress
+    (snapshot, list_memory, tune, ...) either, worker runs them before next command or
+    batch chunk of that call is written (Ft991a.between_commands).
+
+    Worst case tx_off latency is therefore the longest of:
+        - command in flight, up to its deadline (Ft991a.command_deadline, 1 s for "PS"),
+        - batch chunk in flight (Ft991aConfig.batch_write_size bytes), up to read deadline
+          after its last answer,
+        - pause a call makes without sending anything: tuner poll interval
+          (Ft991aConfig.tuner_max_poll_interval) while tuning,
+        - whole power_on, which must not be interrupted between wake up and "PS1;".
+
+    e.g.:
+        executor = Ft991aExecutor(ft)
+        executor.start()
+        smeter = executor.read_smeter()     # Future
+        executor.tx_off().result()
+        executor.stop()
+    """
+    __STOP = object()
+
+    def __init__(self, ft: Ft991a):
+        self.ft = ft
+
+        self.__queue = queue.PriorityQueue()
+        self.__sequence = itertools.count()
+        self.__worker: Optional[threading.Thread] = None
+        self.__preempting = False
+
+        # Submit to completion latency per priority
+        self.latency = {}
+
+    def start(self):
+        self.ft.between_commands = self.__run_urgent
+        self.__worker = threading.Thread(target=self.__run, name="Ft991aExecutor", daemon=True)
+        self.__worker.start()
+
+    def stop(self, wait=True):
+        """Stop worker after all queued calls were run."""
+        self.__queue.put((float("inf"), next(self.__sequence), self.__STOP, None, None, None, None))
+        if wait and self.__worker is not None:
+            self.__worker.join()
+            self.ft.between_commands = None
+
+    def submit(self, method: str, *args, priority: Optional[int] = None, **kwargs) -> Future:
+        """Queue call of Ft991a method.
+
+        :param method: name of Ft991a method, e.g. "read_smeter"
+        :param priority: overrides priority from Ft991aConfig.method_priorities
+        :return: future with result of the call
+        """
+        if priority is None:
+            priority = Ft991aConfig.method_priorities.get(method, Ft991aConfig.default_priority)
+        return self.submit_call(getattr(self.ft, method), *args, priority=priority, **kwargs)
+
+    def submit_call(self, func, *args, priority: Optional[int] = None, **kwargs) -> Future:
+        """Queue any callable to run on worker thread, e.g. a script step taking Ft991a.
+
+        e.g.:
+            executor.submit_call(ft8.to_ft8, ft)
+
+        :param priority: defaults to Ft991aConfig.default_priority
+        :return: future with result of the call
+        """
+        if priority is None:
+            priority = Ft991aConfig.default_priority
+        future = Future()
+        self.__queue.put((priority, next(self.__sequence), func, args, kwargs, future, time.perf_counter()))
+        return future
+
+    def __getattr__(self, name):
+        if name.startswith("_") or not callable(getattr(Ft991a, name, None)):
+            raise AttributeError(name)
+        return partial(self.submit, name)
+
+    def __execute(self, item: tuple):
+        priority, _, func, args, kwargs, future, queued = item
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as err:
+            future.set_exception(err)
+        else:
+            future.set_result(result)
+        self.latency.setdefault(priority, LatencyStats()).add(time.perf_counter() - queued)
+
+    def __run_urgent(self):
+        """Run queued urgent calls in the middle of call in progress, between its commands."""
+        if self.__preempting or threading.current_thread() is not self.__worker:
+            return
+        self.__preempting = True
+        try:
+            while True:
+                # Only worker takes from queue, so smallest item can not change before get
+                with self.__queue.mutex:
+                    if not self.__queue.queue or self.__queue.queue[0][0] > Ft991aConfig.preempt_priority:
+                        return
+                self.__execute(self.__queue.get_nowait())
+        finally:
+            self.__preempting = False
+
+    def __run(self):
+        while True:
+            item = self.__queue.get()
+            if item[2] is self.__STOP:
+                return
+            self.__execute(item)
@@ -0,0 +1,174 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import argparse
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from typing import Callable, Optional
+
+from ft991a import Ft991a
+from ft991a_executor import Ft991aExecutor
+
+
+# Outcome of fleet operation on one transceiver, error is None on success
+FleetResult = namedtuple("FleetResult", "port value error elapsed")
+
+
+def timed(func: Callable, *args, **kwargs) -> tuple:
+    """Run func, never raise.
+
+    :return: (value, error, seconds)
+    """
+    started = time.perf_counter()
+    try:
+        return func(*args, **kwargs), None, time.perf_counter() - started
+    except Exception as err:
+        return None, err, time.perf_counter() - started
+
+
+class Ft991aFleet:
+    """Many transceivers, each on its own serial port, driven concurrently.
+
+    Every transceiver gets its own Ft991aExecutor, whose worker thread is the only one
+    talking to that port. Fleet operations are queued to all executors at once and
+    collected per port, so an operation takes about as long as on the slowest transceiver.
+    Failing transceivers do not stop the others, their error is in the result.
+
+    e.g.:
+        with Ft991aFleet(["/dev/ttyUSB0", "/dev/ttyUSB1"]) as fleet:
+            snapshots = fleet.run("snapshot")
+            fleet.call(ft8.to_ft8)
+    """
+
+    def __init__(self, serial_ports=(), upgrade: bool = False, cache: bool = False):
+        """
+        :param serial_ports: ports opened by open(), e.g. ["COM3", "COM4"]
+        :param upgrade: refer to Ft991a.connect, off so other CAT software keeps working
+        :param cache: refer to Ft991a()
+        """
+        self.serial_ports = list(serial_ports)
+        self.upgrade = upgrade
+        self.cache = cache
+
+        # Serial port -> opened Ft991a / its Ft991aExecutor
+        self.radios = {}
+        self.executors = {}
+
+    def add(self, ft: Ft991a):
+        """Take over opened Ft991a, its port is used only through fleet from now on."""
+        executor = Ft991aExecutor(ft)
+        executor.start()
+        self.radios[ft.serial_port] = ft
+        self.executors[ft.serial_port] = executor
+
+    def open(self) -> dict:
+        """Connect to all serial_ports concurrently. Ports that fail are left out of the fleet.
+
+        :return: {port: FleetResult}, value is Ft991a
+        """
+        ports = [port for port in self.serial_ports if port not in self.radios]
+        results = {}
+        if not ports:
+            return results
+        with ThreadPoolExecutor(max_workers=len(ports)) as pool:
+            outcomes = pool.map(lambda port: timed(Ft991a.connect, port, self.upgrade, self.cache), ports)
+            for port, (ft, error, elapsed) in zip(ports, outcomes):
+                if error is None:
+                    self.add(ft)
+                results[port] = FleetResult(port, ft, error, elapsed)
+        return results
+
+    def close(self):
+        for port, executor in self.executors.items():
+            executor.stop()
+            self.radios[port].close_serial()
+        self.radios = {}
+        self.executors = {}
+
+    def __enter__(self) -> "Ft991aFleet":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def call(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> dict:
+        """Run func(ft, *args, **kwargs) for every transceiver on its own executor.
+
+        :param timeout: seconds to wait for all transceivers, None for no limit
+        :return: {port: FleetResult}
+        """
+        futures = {port: executor.submit_call(timed, func, self.radios[port], *args, **kwargs)
+                   for port, executor in self.executors.items()}
+        give_up = None if timeout is None else time.monotonic() + timeout
+        results = {}
+        for port, future in futures.items():
+            try:
+                remaining = None if give_up is None else max(give_up - time.monotonic(), 0)
+                value, error, elapsed = future.result(remaining)
+            except TimeoutError:
+                future.cancel()
+                value, error, elapsed = None, TimeoutError(f"{port} did not finish in {timeout}s."), timeout
+            results[port] = FleetResult(port, value, error, elapsed)
+        return results
+
+    def run(self, method: str, *args, timeout: Optional[float] = None, **kwargs) -> dict:
+        """Call Ft991a method on every transceiver, e.g. fleet.run("set_vfo", "14.074M").
+
+        :return: {port: FleetResult}
+        """
+        return self.call(lambda ft, *a, **kw: getattr(ft, method)(*a, **kw), *args, timeout=timeout, **kwargs)
+
+
+def snapshot_file(directory: str, serial_port: str) -> str:
+    """e.g. ("snapshots", "/dev/ttyUSB0") -> "snapshots/dev_ttyUSB0.dat" """
+    return os.path.join(directory, f"{re.sub(r'[^A-Za-z0-9]+', '_', serial_port).strip('_')}.dat")
+
+
+def save_snapshot(ft: Ft991a, directory: str) -> int:
+    snapshot = ft.snapshot()
+    Ft991a.save_snapshot(snapshot, snapshot_file(directory, ft.serial_port))
+    return len(snapshot)
+
+
+def restore_snapshot(ft: Ft991a, directory: str) -> int:
+    return len(ft.restore(Ft991a.load_snapshot(snapshot_file(directory, ft.serial_port))))
+
+
+def main():
+    from scripts import ft8
+
+    actions = {
+        "status": lambda fleet, args: fleet.run("read_status"),
+        "snapshot": lambda fleet, args: fleet.call(save_snapshot, args.dir),
+        "restore": lambda fleet, args: fleet.call(restore_snapshot, args.dir),
+        "ft8": lambda fleet, args: fleet.call(ft8.to_ft8),
+    }
+    parser = argparse.ArgumentParser(description="Run the same operation on many FT-991A at once.")
+    parser.add_argument("action", choices=list(actions), help="status: read status, snapshot: save all settings, "
+                                                              "restore: restore saved settings, ft8: configure for FT8")
+    parser.add_argument("com_ports", nargs="+", help="COM ports FT991As are connected on")
+    parser.add_argument("-d", "--dir", type=str, default=".", help="Directory of snapshot files, one per port")
+    parser.add_argument("--upgrade", action="store_true", default=False, help="Set fastest CAT RATE")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    fleet = Ft991aFleet(args.com_ports, upgrade=args.upgrade)
+    results = fleet.open()
+    try:
+        results.update(actions[args.action](fleet, args))
+    finally:
+        fleet.close()
+    for port in args.com_ports:
+        result = results[port]
+        outcome = f"ERROR {result.error!r}" if result.error is not None else result.value
+        print(f"{port:<16} {result.elapsed:7.2f}s  {outcome}")
+    print(f"Done in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
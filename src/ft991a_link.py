@@ -0,0 +1,122 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import threading
+import time
+from typing import Optional
+
+from ft991a_config import Ft991aConfig
+
+
+class RoundTripStats:
+    """Smoothed round trip time and its variation (as in TCP retransmission timer, RFC 6298)."""
+    __slots__ = ("samples", "srtt", "rttvar", "timeouts")
+
+    def __init__(self):
+        self.samples = 0
+        self.srtt = 0.0
+        self.rttvar = 0.0
+        self.timeouts = 0
+
+    def observe(self, rtt: float):
+        if not self.samples:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.samples += 1
+
+    def timeout(self):
+        # Missed answer, widen the deadline until answers come in time again
+        self.timeouts += 1
+        self.rttvar = max(self.rttvar * 2, Ft991aConfig.link_min_deadline)
+
+    def deadline(self) -> float:
+        return self.srtt + Ft991aConfig.link_deadline_factor * self.rttvar
+
+
+class LinkProfile:
+    """Round trip times learned per command and pacing derived from them.
+
+    Deadlines come from round trips of the same command once it has been answered
+    Ft991aConfig.link_min_samples times, from Ft991aConfig deadlines until then.
+    Set commands wait for a possible error as long as an answer of the same command
+    (or of any command) takes. A missed answer widens deadlines and inserts a gap
+    between writes, which shrinks again while answers come in time.
+
+    e.g.:
+        ft.calibrate_link()
+        print(ft.link.profile())
+    """
+
+    def __init__(self):
+        # Seconds between writes
+        self.gap = 0.0
+        # Seconds between dummy command waking transceiver up and "PS1;", see Ft991a.power_on
+        self.wake_gap = Ft991aConfig.time_between_dummy
+        self.__commands = {}
+        self.__all = RoundTripStats()
+        self.__last_write = 0.0
+        self.__lock = threading.Lock()
+
+    def observe(self, command: str, rtt: float):
+        """Record round trip time of answered command (e.g. "FA;") in seconds."""
+        with self.__lock:
+            self.__commands.setdefault(command[:2], RoundTripStats()).observe(rtt)
+            self.__all.observe(rtt)
+            self.gap = self.gap / 2 if self.gap > Ft991aConfig.link_min_gap else 0.0
+
+    def timeout(self, command: str):
+        """Record missed answer of command."""
+        with self.__lock:
+            self.__commands.setdefault(command[:2], RoundTripStats()).timeout()
+            self.__all.timeout()
+            self.gap = min(max(self.gap * 2, Ft991aConfig.link_min_gap), Ft991aConfig.link_max_gap)
+
+    def deadline(self, command: str, expects_answer: bool, default: float) -> float:
+        """Seconds to wait for answer (or error) of command.
+
+        :param expects_answer: command is a read
+        :param default: deadline to use until enough round trips are known
+        """
+        code = command[:2]
+        if code in Ft991aConfig.command_deadlines:
+            return Ft991aConfig.command_deadlines[code]
+        learned = self.__learned_deadline(self.__commands.get(code))
+        if learned is None and not expects_answer:
+            learned = self.__learned_deadline(self.__all)
+        return default if learned is None else learned
+
+    @staticmethod
+    def __learned_deadline(stats: Optional[RoundTripStats]) -> Optional[float]:
+        if stats is None or stats.samples < Ft991aConfig.link_min_samples:
+            return None
+        return min(max(stats.deadline(), Ft991aConfig.link_min_deadline), Ft991aConfig.link_max_deadline)
+
+    def pace(self):
+        """Wait out the gap since previous write, call right before writing."""
+        if self.gap:
+            wait = self.__last_write + self.gap - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+        self.__last_write = time.perf_counter()
+
+    def wake_failed(self):
+        """Power on after wake_gap did not work, try a longer one next time."""
+        self.wake_gap = min(self.wake_gap + 0.3, Ft991aConfig.max_time_between_dummy)
+
+    def profile(self) -> dict:
+        """Learned link profile, e.g. {"gap": 0.0, "wake_gap": 1.1, "commands": {"FA": {"srtt": 0.004, ...}}, ...}"""
+        def summary(stats: RoundTripStats) -> dict:
+            return {"samples": stats.samples, "srtt": stats.srtt, "rttvar": stats.rttvar,
+                    "timeouts": stats.timeouts, "deadline": self.__learned_deadline(stats)}
+
+        with self.__lock:
+            return {
+                "gap": self.gap,
+                "wake_gap": self.wake_gap,
+                "commands": {code: summary(stats) for code, stats in sorted(self.__commands.items())},
+                "all": summary(self.__all),
+            }
@@ -0,0 +1,281 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import os
+import threading
+import time
+from array import array
+from typing import TYPE_CHECKING, Optional
+
+from ft991a_config import Ft991aConfig
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+
+class LatencyHistogram:
+    """Log-linear latency histogram (as HdrHistogram).
+
+    Latency is counted in microseconds. Values below 2 * sub_buckets get a bucket each, above that
+    every power of two is split into sub_buckets equal buckets, so a value is known within
+    1 / sub_buckets of itself. Values above Ft991aConfig.histogram_max_latency land in last bucket.
+    """
+
+    def __init__(self, sub_buckets: int = Ft991aConfig.histogram_sub_buckets):
+        self.sub_buckets = sub_buckets
+        self.__sub_bits = sub_buckets.bit_length() - 1
+        self.__max_us = int(Ft991aConfig.histogram_max_latency * 1e6)
+        self.counts = array("L", bytes(array("L").itemsize * (self.__index(self.__max_us) + 1)))
+
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def __index(self, us: int) -> int:
+        if us < 2 * self.sub_buckets:
+            return us
+        shift = us.bit_length() - self.__sub_bits - 1
+        return self.sub_buckets * (shift + 1) + (us >> shift) - self.sub_buckets
+
+    def __upper(self, index: int) -> float:
+        """Upper edge of bucket in seconds."""
+        if index < 2 * self.sub_buckets:
+            return (index + 1) / 1e6
+        shift = index // self.sub_buckets - 1
+        return ((index % self.sub_buckets + self.sub_buckets + 1) << shift) / 1e6
+
+    def add(self, latency: float):
+        """:param latency: seconds"""
+        us = min(max(int(latency * 1e6), 0), self.__max_us)
+        self.counts[self.__index(us)] += 1
+        self.count += 1
+        self.sum += latency
+        if self.min is None or latency < self.min:
+            self.min = latency
+        if self.max is None or latency > self.max:
+            self.max = latency
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Upper edge of bucket holding p-th percentile, in seconds.
+
+        :param p: between 0 and 100
+        """
+        if not self.count:
+            return None
+        rank = max(round(p / 100 * self.count), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.__upper(index), self.max)
+        return self.max
+
+    def cumulative(self, bounds: tuple) -> list:
+        """Number of latencies up to each bound (seconds), as Prometheus histogram buckets.
+        Bucket is counted up to a bound when its upper edge is not above it."""
+        out = []
+        seen = 0
+        index = 0
+        for bound in bounds:
+            while index < len(self.counts) and self.__upper(index) <= bound:
+                seen += self.counts[index]
+                index += 1
+            out.append(seen)
+        return out
+
+    def summary(self) -> dict:
+        return {"count": self.count, "sum": self.sum, "min": self.min, "max": self.max,
+                "p50": self.percentile(50), "p90": self.percentile(90), "p99": self.percentile(99)}
+
+
+class CommandMetrics:
+    """Counters of one CAT command code (e.g. "FA")."""
+    __slots__ = ("calls", "errors", "timeouts", "bytes_out", "bytes_in", "latency")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0  # Answered with "?;"
+        self.timeouts = 0  # Read without answer
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.latency = LatencyHistogram()
+
+
+class MethodMetrics:
+    """Counters of one Ft991a method (e.g. "read_smeter"), latency is link time it used."""
+    __slots__ = ("calls", "errors", "latency")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0  # Raised an exception
+        self.latency = LatencyHistogram()
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class Metrics:
+    """Call counts, errors, bytes and latency histograms per CAT command and per Ft991a method.
+
+    Collected only while enabled (Ft991a.enable_metrics()), then exported as dict (snapshot)
+    or Prometheus text format (prometheus, write, serve).
+
+    e.g.:
+        metrics = ft.enable_metrics()
+        ...
+        print(metrics.commands["FA"].latency.percentile(99))
+        metrics.serve(port=9991)    # http://127.0.0.1:9991/metrics
+    """
+
+    def __init__(self, labels: Optional[dict] = None):
+        """
+        :param labels: added to every exported sample, e.g. {"port": "/dev/ttyUSB0"}
+        """
+        self.labels = dict(labels or {})
+        self.commands = {}
+        self.methods = {}
+        self.started = time.time()
+        self.__lock = threading.Lock()
+        self.__server: Optional["ThreadingHTTPServer"] = None
+
+    def observe_command(self, command: str, latency: Optional[float], bytes_out: int, bytes_in: int,
+                        error: bool = False, timeout: bool = False):
+        """Record one CAT command.
+
+        :param command: e.g. "FA;"
+        :param latency: seconds from write to answer (or to giving up), None if unknown
+        """
+        with self.__lock:
+            metrics = self.commands.get(command[:2])
+            if metrics is None:
+                metrics = self.commands[command[:2]] = CommandMetrics()
+            metrics.calls += 1
+            metrics.errors += error
+            metrics.timeouts += timeout
+            metrics.bytes_out += bytes_out
+            metrics.bytes_in += bytes_in
+            if latency is not None:
+                metrics.latency.add(latency)
+
+    def observe_method(self, method: str, latency: float, error: bool = False):
+        with self.__lock:
+            metrics = self.methods.get(method)
+            if metrics is None:
+                metrics = self.methods[method] = MethodMetrics()
+            metrics.calls += 1
+            metrics.errors += error
+            metrics.latency.add(latency)
+
+    def reset(self):
+        with self.__lock:
+            self.commands = {}
+            self.methods = {}
+            self.started = time.time()
+
+    def snapshot(self) -> dict:
+        """All counters, e.g. {"commands": {"FA": {"calls": 3, ..., "latency": {"p50": 0.004, ...}}}, ...}"""
+        with self.__lock:
+            return {
+                "labels": dict(self.labels),
+                "started": self.started,
+                "commands": {code: {"calls": m.calls, "errors": m.errors, "timeouts": m.timeouts,
+                                    "bytes_out": m.bytes_out, "bytes_in": m.bytes_in,
+                                    "latency": m.latency.summary()}
+                             for code, m in sorted(self.commands.items())},
+                "methods": {name: {"calls": m.calls, "errors": m.errors, "latency": m.latency.summary()}
+                            for name, m in sorted(self.methods.items())},
+            }
+
+    def __labels(self, **labels) -> str:
+        labels = {**self.labels, **labels}
+        return ",".join(f'{name}="{escape_label(str(value))}"' for name, value in labels.items())
+
+    def __histogram(self, lines: list, name: str, histogram: LatencyHistogram, **labels):
+        bounds = Ft991aConfig.metrics_buckets
+        for bound, count in zip(bounds, histogram.cumulative(bounds)):
+            lines.append(f"{name}_bucket{{{self.__labels(**labels, le=bound)}}} {count}")
+        lines.append(f"{name}_bucket{{{self.__labels(**labels, le='+Inf')}}} {histogram.count}")
+        lines.append(f"{name}_sum{{{self.__labels(**labels)}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{self.__labels(**labels)}}} {histogram.count}")
+
+    def prometheus(self) -> str:
+        """All counters in Prometheus text exposition format."""
+        lines = []
+
+        def family(name: str, kind: str, description: str):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self.__lock:
+            commands = sorted(self.commands.items())
+            methods = sorted(self.methods.items())
+            counters = (
+                ("ft991a_command_calls_total", "CAT commands sent.", "calls"),
+                ("ft991a_command_errors_total", "CAT commands transceiver answered with error.", "errors"),
+                ("ft991a_command_timeouts_total", "CAT reads transceiver did not answer.", "timeouts"),
+                ("ft991a_command_bytes_out_total", "Bytes written to transceiver.", "bytes_out"),
+                ("ft991a_command_bytes_in_total", "Bytes received from transceiver.", "bytes_in"),
+            )
+            for name, description, field in counters:
+                family(name, "counter", description)
+                lines += [f"{name}{{{self.__labels(command=code)}}} {getattr(m, field)}" for code, m in commands]
+            family("ft991a_command_latency_seconds", "histogram", "Time from writing CAT command to its answer.")
+            for code, m in commands:
+                self.__histogram(lines, "ft991a_command_latency_seconds", m.latency, command=code)
+
+            family("ft991a_method_calls_total", "counter", "Ft991a method calls.")
+            lines += [f"ft991a_method_calls_total{{{self.__labels(method=name)}}} {m.calls}" for name, m in methods]
+            family("ft991a_method_errors_total", "counter", "Ft991a method calls that raised.")
+            lines += [f"ft991a_method_errors_total{{{self.__labels(method=name)}}} {m.errors}" for name, m in methods]
+            family("ft991a_method_latency_seconds", "histogram", "Duration of Ft991a method calls.")
+            for name, m in methods:
+                self.__histogram(lines, "ft991a_method_latency_seconds", m.latency, method=name)
+        return "\n".join(lines) + "\n"
+
+    def write(self, file_name: str):
+        """Write prometheus() to file_name (e.g. for node_exporter's textfile collector)."""
+        text = self.prometheus()
+        with open(f"{file_name}.tmp", "w") as metrics_file:
+            metrics_file.write(text)
+        # Replace at once, so collector never reads half written file
+        os.replace(f"{file_name}.tmp", file_name)
+
+    def serve(self, host: str = "127.0.0.1", port: int = Ft991aConfig.metrics_port) -> "ThreadingHTTPServer":
+        """Serve prometheus() on http://host:port/metrics from a background thread.
+
+        :param port: 0 for any free port (refer to returned server's server_address)
+        """
+        # Imported here, http.server alone would double import time of ft991a
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.stop_serving()
+        self.__server = ThreadingHTTPServer((host, port), Handler)
+        self.__server.daemon_threads = True
+        threading.Thread(target=self.__server.serve_forever, name="Ft991aMetrics", daemon=True).start()
+        return self.__server
+
+    def stop_serving(self):
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
@@ -0,0 +1,250 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import argparse
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from typing import Optional
+
+from ft991a import Ft991a, MalformedResponse, ParameterError, parse_frequency, read_key
+from ft991a_config import Ft991aConfig
+from menu import Menu
+
+PROFILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+# Outcome of ProfileSwitcher.apply(), changes are set commands sent, elapsed is in seconds
+ProfileResult = namedtuple("ProfileResult", "profile changes elapsed")
+
+
+class ProfileError(Exception):
+    pass
+
+
+class ProfileVerifyError(Exception):
+    pass
+
+
+class Profile:
+    """Operating profile: menu values and front panel state transceiver should be in.
+
+    Profiles are JSON files, e.g. profiles/ft8.json:
+        {
+          "name": "FT8",
+          "description": "...",
+          "mode": "DATA-USB",                       <- name from Ft991aConfig.modes, optional
+          "frequency": "14.074M",                   <- VFO-A, refer to parse_frequency, optional
+          "menu": {"CAT TOT": "1", "064": "+1500"}, <- menu number or function name: P2 value
+          "panel": {"AG0": "000", "PC": "008"}      <- read command without ";": its set parameter
+        }
+    """
+
+    def __init__(self, name: str, description: str = "", mode: Optional[str] = None,
+                 frequency: Optional[str] = None, menu: Optional[dict] = None, panel: Optional[dict] = None):
+        self.name = name
+        self.description = description
+        self.mode = mode
+        self.frequency = frequency
+        self.menu = dict(menu or {})
+        self.panel = dict(panel or {})
+
+    def __repr__(self):
+        return f"<Profile '{self.name}' menu: {len(self.menu)} panel: {len(self.panel)}>"
+
+    @classmethod
+    def load(cls, name: str) -> "Profile":
+        """Load profile from JSON file.
+
+        :param name: file name or name of profile in PROFILES_DIR, e.g. "ft8"
+        """
+        file_name = name if os.path.isfile(name) else os.path.join(PROFILES_DIR, f"{name.lower()}.json")
+        try:
+            with open(file_name, "r") as profile_file:
+                settings = json.load(profile_file)
+        except OSError:
+            raise ProfileError(f"No profile '{name}', available: {available_profiles()}.") from None
+        except ValueError as err:
+            raise ProfileError(f"Profile '{file_name}' is not valid JSON: {err}") from None
+        unknown = set(settings) - {"name", "description", "mode", "frequency", "menu", "panel"}
+        if unknown:
+            raise ProfileError(f"Profile '{file_name}' has unknown keys {sorted(unknown)}.")
+        settings.setdefault("name", os.path.splitext(os.path.basename(file_name))[0])
+        return cls(**settings)
+
+    def targets(self) -> dict:
+        """Every setting of profile as set command, checked against menu ranges and mode names.
+
+        :return: {read command: set command}, e.g. {"EX032;": "EX0321;", "MD0;": "MD0C;"},
+                 in order of Ft991aConfig.restore_order
+        """
+        targets = {}
+        for command in Menu().write_commands(self.menu):
+            targets[read_key(command)] = command
+        if self.mode is not None:
+            if self.mode not in Ft991aConfig.r_modes:
+                raise ParameterError(f"Mode can be one of {list(Ft991aConfig.r_modes)}, not '{self.mode}'.")
+            targets["MD0;"] = f"MD0{Ft991aConfig.r_modes[self.mode]};"
+        for read, parameter in self.panel.items():
+            command = f"{read}{parameter};"
+            if read_key(command) != f"{read};":
+                raise ProfileError(f"Panel setting '{read}' of profile '{self.name}' is not a read command.")
+            targets[f"{read};"] = command
+        if self.frequency is not None:
+            targets["FA;"] = f"FA{parse_frequency(self.frequency)};"
+
+        order = Ft991aConfig.restore_order
+        return dict(sorted(targets.items(), key=lambda item: order.index(item[0][:2] if item[0][:2] in order else "*")))
+
+
+def available_profiles() -> list:
+    return sorted(os.path.splitext(name)[0] for name in os.listdir(PROFILES_DIR) if name.endswith(".json"))
+
+
+class ProfileSwitcher:
+    """Switches transceiver between profiles sending only settings that differ.
+
+    Current values of profile's settings are read in one batch, values that are about to change
+    are kept in Ft991aConfig.profile_rollback_file (per serial port) and changed settings are sent
+    in one batch and read back to verify them. Rollback file keeps value a setting had before first
+    profile changed it, so rollback() returns to state before any profile, however many were applied.
+
+    e.g.:
+        switcher = ProfileSwitcher(ft)
+        switcher.apply(Profile.load("ft8"))
+        switcher.apply(Profile.load("rtty"))
+        switcher.rollback()
+    """
+    __lock = threading.Lock()
+
+    def __init__(self, ft: Ft991a, rollback_file: Optional[str] = None):
+        """
+        :param ft: opened Ft991a
+        :param rollback_file: defaults to Ft991aConfig.profile_rollback_file
+        """
+        self.ft = ft
+        self.rollback_file = Ft991aConfig.profile_rollback_file if rollback_file is None else rollback_file
+
+    def __read_file(self) -> dict:
+        try:
+            with open(self.rollback_file, "r") as rollback_file:
+                return json.load(rollback_file)
+        except (OSError, ValueError):
+            return {}
+
+    def __write_file(self, rollbacks: dict):
+        with open(self.rollback_file, "w") as rollback_file:
+            json.dump(rollbacks, rollback_file, indent=2)
+
+    def saved(self) -> dict:
+        """Settings rollback() would restore, {read command: answer}."""
+        with ProfileSwitcher.__lock:
+            return self.__read_file().get(self.ft.serial_port, {})
+
+    def __save(self, originals: dict):
+        # Settings already saved keep their value from before first profile
+        with ProfileSwitcher.__lock:
+            rollbacks = self.__read_file()
+            rollbacks[self.ft.serial_port] = {**originals, **rollbacks.get(self.ft.serial_port, {})}
+            self.__write_file(rollbacks)
+
+    def current(self, reads) -> dict:
+        """Read settings in one batch, ones transceiver refuses to read are left out.
+
+        :return: {read command: answer}
+        """
+        reads = list(reads)
+        answers = self.ft.batch(reads, raw=True, raise_errors=False)
+        return {read: answer for read, answer in zip(reads, answers) if isinstance(answer, str)}
+
+    def deltas(self, profile: Profile) -> list:
+        """Set commands that would bring transceiver to profile, nothing is sent."""
+        targets = profile.targets()
+        current = self.current(targets)
+        return [command for read, command in targets.items() if current.get(read) != command]
+
+    def apply(self, profile: Profile, verify: bool = True) -> ProfileResult:
+        """Bring transceiver to profile.
+
+        :param verify: read changed settings back, resend the ones that did not take
+                       (up to Ft991aConfig.profile_verify_attempts times) and raise
+                       ProfileVerifyError if some still differ
+        :return: ProfileResult
+        """
+        started = time.perf_counter()
+        targets = profile.targets()
+        current = self.current(targets)
+        changes = [command for read, command in targets.items() if current.get(read) != command]
+        if not changes:
+            return ProfileResult(profile.name, [], time.perf_counter() - started)
+
+        self.__save({read_key(command): current[read_key(command)] for command in changes
+                     if read_key(command) in current and read_key(command) not in Ft991aConfig.restore_skip})
+        pending = changes
+        for _ in range(Ft991aConfig.profile_verify_attempts if verify else 1):
+            self.ft.batch(pending, raise_errors=False)
+            self.ft.invalidate_cache()
+            if not verify:
+                break
+            readback = self.current(read_key(command) for command in pending)
+            pending = [command for command in pending if readback.get(read_key(command)) != command]
+            if not pending:
+                break
+        if verify and pending:
+            raise ProfileVerifyError(f"Profile '{profile.name}': transceiver did not take {pending}.")
+        return ProfileResult(profile.name, changes, time.perf_counter() - started)
+
+    def rollback(self) -> list:
+        """Restore settings saved by apply() and forget them.
+
+        :return: list of sent set commands
+        """
+        saved = self.saved()
+        changes = self.ft.restore(saved) if saved else []
+        with ProfileSwitcher.__lock:
+            rollbacks = self.__read_file()
+            rollbacks.pop(self.ft.serial_port, None)
+            self.__write_file(rollbacks)
+        return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Switch Yaesu FT-991A between operating profiles.")
+    parser.add_argument("com_port", help="COM port on which FT991A is connected", type=str)
+    parser.add_argument("profile", nargs="?", default=None,
+                        help=f"Profile name ({', '.join(available_profiles())}) or JSON file, "
+                             f"omit with --rollback")
+    parser.add_argument("-r", "--rollback", action="store_true", default=False,
+                        help="Restore settings from before first applied profile")
+    parser.add_argument("-n", "--dry-run", action="store_true", default=False,
+                        help="Only print settings that would change")
+    parser.add_argument("--no-verify", action="store_true", default=False, help="Do not read settings back")
+    args = parser.parse_args()
+    if args.profile is None and not args.rollback:
+        parser.error("profile or --rollback is required")
+
+    ft = Ft991a.connect(args.com_port, upgrade=False)
+    try:
+        switcher = ProfileSwitcher(ft)
+        if args.rollback:
+            started = time.perf_counter()
+            changes = switcher.rollback()
+            print(f"Rolled back {len(changes)} settings in {time.perf_counter() - started:.2f}s")
+        elif args.dry_run:
+            for command in switcher.deltas(Profile.load(args.profile)):
+                print(command)
+        else:
+            result = switcher.apply(Profile.load(args.profile), verify=not args.no_verify)
+            for command in result.changes:
+                print(command)
+            print(f"{result.profile}: {len(result.changes)} settings changed in {result.elapsed:.2f}s")
+    except (ProfileError, ProfileVerifyError, MalformedResponse) as err:
+        print(f"ERROR {err}")
+    finally:
+        ft.close_serial()
+
+
+if __name__ == '__main__':
+    main()
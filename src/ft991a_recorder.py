@@ -0,0 +1,226 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import argparse
+import threading
+import time
+from collections import namedtuple
+from typing import Optional
+
+from ft991a_config import Ft991aConfig
+
+
+# Recording file is plain text, appended to by every session:
+#   # ft991a-traffic 1 /dev/ttyUSB0 38400 1700000000.123
+#   0 > FA;
+#   4210 < FA014250000;
+# Session header (port, baud rate, wall clock start) is followed by one line per write (">")
+# and per received frame ("<"), time in microseconds since session start (time.perf_counter()).
+HEADER = "# ft991a-traffic 1"
+OUTBOUND = ">"
+INBOUND = "<"
+
+Record = namedtuple("Record", "time direction data")
+Recording = namedtuple("Recording", "serial_port baud_rate started records")
+
+
+class ReplayMismatchError(Exception):
+    pass
+
+
+class TrafficRecorder:
+    """Appends everything written to and received from transceiver to a recording file.
+
+    e.g.:
+        ft.start_recording("traffic.log")
+        ...
+        ft.stop_recording()
+    """
+
+    def __init__(self, file_name: str, serial_port: str, baud_rate: int):
+        self.file_name = file_name
+        self.__file = open(file_name, "a", buffering=1)
+        self.__lock = threading.Lock()
+        self.__started = time.perf_counter()
+        self.__file.write(f"{HEADER} {serial_port} {baud_rate} {time.time():.3f}\n")
+
+        self.records = 0
+
+    def __record(self, direction: str, data: str):
+        offset = round((time.perf_counter() - self.__started) * 1e6)
+        with self.__lock:
+            self.__file.write(f"{offset} {direction} {data}\n")
+            self.records += 1
+
+    def outbound(self, data: str):
+        """Record data written to transceiver, e.g. "FA;AG0;" """
+        self.__record(OUTBOUND, data)
+
+    def inbound(self, frame: str):
+        """Record frame received from transceiver, e.g. "FA014250000;" """
+        self.__record(INBOUND, frame)
+
+    def close(self):
+        with self.__lock:
+            self.__file.close()
+
+
+def load_recording(file_name: str) -> list:
+    """Sessions of recording file.
+
+    :return: list of Recording, oldest first. Record times are in seconds since session start
+    """
+    sessions = []
+    with open(file_name, "r") as recording_file:
+        for line in recording_file:
+            line = line.rstrip("\n")
+            if line.startswith(HEADER):
+                serial_port, baud_rate, started = line[len(HEADER):].split()
+                sessions.append(Recording(serial_port, int(baud_rate), float(started), []))
+            elif line and sessions:
+                offset, direction, data = line.split(" ", 2)
+                sessions[-1].records.append(Record(int(offset) / 1e6, direction, data))
+    return sessions
+
+
+class ReplaySerial:
+    """Stands in for serial.Serial and answers writes the way transceiver did in a recording,
+    refer to Ft991a.replay().
+
+    Each write must match next recorded write. Frames received after it in the recording
+    become readable at their original delay, divided by speed (math.inf for no delay at all).
+    With strict=False unexpected writes are skipped instead of raising ReplayMismatchError,
+    they get no answer.
+    """
+
+    def __init__(self, recording: Recording, speed: float = 1.0, strict: bool = True):
+        self.recording = recording
+        self.speed = speed
+        self.strict = strict
+
+        self.port = recording.serial_port
+        self.baudrate = recording.baud_rate
+        self.timeout = Ft991aConfig.read_poll_interval
+        self.is_open = True
+
+        self.__records = recording.records
+        self.__next = 0
+        # (time.perf_counter() when due, data) of answers not read yet
+        self.__pending = []
+        self.__lock = threading.Condition()
+
+        self.writes = 0
+        self.mismatches = 0
+
+    def __find_write(self, data: str) -> Optional[int]:
+        for i in range(self.__next, len(self.__records)):
+            record = self.__records[i]
+            if record.direction == OUTBOUND:
+                if record.data == data:
+                    return i
+                if self.strict:
+                    raise ReplayMismatchError(f"Expected write '{record.data}', got '{data}'.")
+        if self.strict:
+            raise ReplayMismatchError(f"Recording has no more writes, got '{data}'.")
+        return None
+
+    def write(self, data: bytes) -> int:
+        data = data.decode("utf-8")
+        now = time.perf_counter()
+        with self.__lock:
+            self.writes += 1
+            i = self.__find_write(data)
+            if i is None:
+                self.mismatches += 1
+                return len(data)
+            written = self.__records[i].time
+            self.__next = i + 1
+            while self.__next < len(self.__records) and self.__records[self.__next].direction == INBOUND:
+                record = self.__records[self.__next]
+                self.__pending.append((now + (record.time - written) / self.speed, record.data.encode("utf-8")))
+                self.__next += 1
+            self.__lock.notify_all()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def __due(self) -> int:
+        """Number of pending answers readable by now, answers are read in order."""
+        now = time.perf_counter()
+        due = 0
+        while due < len(self.__pending) and self.__pending[due][0] <= now:
+            due += 1
+        return due
+
+    @property
+    def in_waiting(self) -> int:
+        with self.__lock:
+            return sum(len(data) for _, data in self.__pending[:self.__due()])
+
+    def read(self, size: int = 1) -> bytes:
+        give_up = time.perf_counter() + self.timeout
+        with self.__lock:
+            while True:
+                due = self.__due()
+                if due:
+                    data = b"".join(data for _, data in self.__pending[:due])
+                    data, rest = data[:size], data[size:]
+                    self.__pending = ([(0.0, rest)] if rest else []) + self.__pending[due:]
+                    return data
+                now = time.perf_counter()
+                if now >= give_up:
+                    return b""
+                wait = give_up - now
+                if self.__pending:
+                    wait = min(wait, self.__pending[0][0] - now)
+                self.__lock.wait(wait)
+
+    def reset_input_buffer(self):
+        with self.__lock:
+            self.__pending = self.__pending[self.__due():]
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    @property
+    def finished(self) -> bool:
+        """All recorded writes were replayed."""
+        return not any(record.direction == OUTBOUND for record in self.__records[self.__next:])
+
+
+def round_trips(recording: Recording) -> dict:
+    """Time from each write to first frame received after it, per command.
+
+    :return: {command code: [seconds, ...]}, e.g. {"FA": [0.0042, 0.0039]}
+    """
+    trips = {}
+    records = recording.records
+    for i, record in enumerate(records):
+        if record.direction != OUTBOUND:
+            continue
+        if i + 1 < len(records) and records[i + 1].direction == INBOUND:
+            trips.setdefault(record.data[:2], []).append(records[i + 1].time - record.time)
+    return trips
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize round trip times in FT-991A traffic recording.")
+    parser.add_argument("file", help="Recording file written by Ft991a.start_recording()")
+    parser.add_argument("-s", "--session", type=int, default=-1, help="Session index, defaults to last one")
+    args = parser.parse_args()
+
+    recording = load_recording(args.file)[args.session]
+    print(f"{recording.serial_port} {recording.baud_rate} baud, {len(recording.records)} records, "
+          f"started {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(recording.started))}")
+    for code, trips in sorted(round_trips(recording).items()):
+        trips.sort()
+        print(f"{code}  n {len(trips):>6}  p50 {trips[len(trips) // 2] * 1e3:8.2f}ms  max {trips[-1] * 1e3:8.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+from dataclasses import dataclass
+from typing import Optional, Union
+
+from ft991a_config import Ft991aConfig
+
+
+def read_key(command: str) -> str:
+    """Read command returning the setting command (read or set) refers to.
+    Keys Ft991a snapshots and StateCache entries alike.
+
+    e.g.: "AG0100;" -> "AG0;", "FA014250000;" -> "FA;", "EX0313;" -> "EX031;"
+    """
+    code = command[:2]
+    parameter = command[2:-1]
+    return f"{code}{parameter[:Ft991aConfig.read_parameter_length.get(code, 0)]};"
+
+
+class Response:
+    """Base of composite replies. Subclasses are frozen, slotted dataclasses,
+    so instances are small, hashable and can be pickled.
+    """
+    __slots__ = ()
+
+    def __reduce__(self):
+        # Frozen instances can not be restored by setattr, rebuild them through __init__
+        return self.__class__, tuple(getattr(self, field) for field in self.__slots__)
+
+
+@dataclass(frozen=True)
+class TunerState(Response):
+    """Answer to "AC" read."""
+    __slots__ = ("on", "tune")
+    on: bool  # Tuner on
+    tune: bool  # Tune process active
+
+
+@dataclass(frozen=True)
+class MemoryChannel(Response):
+    """Answer to "MT" read, all fields None for empty channel."""
+    __slots__ = ("channel", "frequency", "clar_offset", "rx_clar", "tx_clar",
+                 "mode", "memory_mode", "ctcss", "operation_mode", "tag")
+    channel: Optional[int]
+    frequency: Optional[int]
+    clar_offset: Optional[int]
+    rx_clar: Optional[bool]
+    tx_clar: Optional[bool]
+    mode: Optional[str]
+    memory_mode: Optional[str]
+    ctcss: Union[bool, str, None]
+    operation_mode: Optional[str]
+    tag: Optional[str]
+
+    def write_fields(self) -> dict:
+        """Keyword arguments of Ft991a.write_memory_channel() writing this channel back."""
+        return {"channel": self.channel, "frequency": self.frequency, "clar_offset": self.clar_offset,
+                "rx_clar": self.rx_clar, "tx_clar": self.tx_clar, "mode": self.mode, "ctcss": self.ctcss,
+                "operation_mode": self.operation_mode, "tag": self.tag}
+
+
+@dataclass(frozen=True)
+class InformationState(Response):
+    """Answer to "IF" (main band) or "OI" (opposite band) read."""
+    __slots__ = ("memory_channel", "frequency", "clar_offset", "rx_clar", "tx_clar",
+                 "mode", "memory_mode", "ctcss", "operation_mode")
+    memory_channel: int
+    frequency: int
+    clar_offset: int
+    rx_clar: bool
+    tx_clar: bool
+    mode: str
+    memory_mode: str
+    ctcss: Union[bool, str]
+    operation_mode: str
+
+
+@dataclass(frozen=True)
+class MeterReading(Response):
+    """Answer to "SM" or "RM" read."""
+    __slots__ = ("meter", "value")
+    meter: str  # "SM" or name from Ft991aConfig.r_meter_reading
+    value: int  # 0 - 255
+
+
+@dataclass(frozen=True)
+class TxState(Response):
+    """Answer to "TX" read."""
+    __slots__ = ("state",)
+    state: str  # Value from Ft991aConfig.tx_state
+
+    @property
+    def transmitting(self) -> bool:
+        return self.state != "OFF"
+
+
+EMPTY_CHANNEL = MemoryChannel(*[None] * 10)
+
+# Answers without read parameter to TunerState, only 3 possible
+TUNER_STATES = {
+    "000": TunerState(on=False, tune=False),
+    "001": TunerState(on=True, tune=False),
+    "002": TunerState(on=False, tune=True),
+}
+
+# Answers of "TX" read to TxState, only 3 possible
+TX_STATES = {key: TxState(state=state) for key, state in Ft991aConfig.tx_state.items()}
+
+
+def decode_tuner(ans: str) -> TunerState:
+    """:param ans: parameter of "AC" answer, e.g. "001" """
+    return TUNER_STATES.get(ans) or TunerState(on=ans[-1] == "1", tune=ans[-1] == "2")
+
+
+def decode_memory_channel(channel: int, ans: Optional[str]) -> MemoryChannel:
+    """:param ans: parameter of "MT" answer or None for empty channel"""
+    if ans is None:
+        return EMPTY_CHANNEL
+    return MemoryChannel(
+        channel=channel,
+        frequency=int(ans[3:12]),
+        clar_offset=int(ans[12:17]),
+        rx_clar=ans[17] == "1",
+        tx_clar=ans[18] == "1",
+        mode=Ft991aConfig.modes[ans[19]],
+        memory_mode=Ft991aConfig.memory_mode[ans[20]],
+        ctcss=Ft991aConfig.ctcss_states[ans[21]],
+        operation_mode=Ft991aConfig.operation_modes[ans[24]],
+        tag=ans[-12:].strip()
+    )
+
+
+def decode_information(ans: str) -> InformationState:
+    """:param ans: parameter of "IF"/"OI" answer, e.g. "001014250000+000000C00000" """
+    return InformationState(
+        memory_channel=int(ans[0:3]),
+        frequency=int(ans[3:12]),
+        clar_offset=int(ans[12:17]),
+        rx_clar=ans[17] == "1",
+        tx_clar=ans[18] == "1",
+        mode=Ft991aConfig.modes.get(ans[19], ans[19]),
+        memory_mode=Ft991aConfig.memory_mode.get(ans[20], ans[20]),
+        ctcss=Ft991aConfig.ctcss_states.get(ans[21], ans[21]),
+        operation_mode=Ft991aConfig.operation_modes.get(ans[24], ans[24])
+    )
+
+
+def decode_meter(command: str, ans: str) -> MeterReading:
+    """
+    :param command: "SM" or "RM"
+    :param ans: parameter of answer, e.g. "0128", "6012"
+    """
+    meter = "SM" if command == "SM" else Ft991aConfig.meter_reading.get(ans[0], ans[0])
+    return MeterReading(meter=meter, value=int(ans[1:]))
+
+
+def decode_tx_state(ans: str) -> TxState:
+    """:param ans: parameter of "TX" answer, e.g. "0" """
+    return TX_STATES.get(ans) or TxState(state=ans)
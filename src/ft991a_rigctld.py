@@ -0,0 +1,352 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import argparse
+import socketserver
+import threading
+from concurrent.futures import Future
+from typing import Optional
+
+from ft991a import (Ft991a, ActionNotSupportedError, MalformedResponse, ParameterError, ParseFrequencyError)
+from ft991a_config import Ft991aConfig
+from ft991a_executor import Ft991aExecutor
+
+
+# Hamlib error codes
+RIG_OK = 0
+RIG_EINVAL = -1
+RIG_ENIMPL = -4
+RIG_EIO = -6
+RIG_EPROTO = -8
+RIG_ENAVAIL = -11
+
+# Long command -> (short command, number of arguments, names of returned values in extended response)
+RIGCTL_COMMANDS = {
+    "set_freq": ("F", 1, ()),
+    "get_freq": ("f", 0, ("Frequency",)),
+    "set_mode": ("M", 2, ()),
+    "get_mode": ("m", 0, ("Mode", "Passband")),
+    "set_vfo": ("V", 1, ()),
+    "get_vfo": ("v", 0, ("VFO",)),
+    "set_ptt": ("T", 1, ()),
+    "get_ptt": ("t", 0, ("PTT",)),
+    "set_split_vfo": ("S", 2, ()),
+    "get_split_vfo": ("s", 0, ("Split", "TX VFO")),
+    "set_level": ("L", 2, ()),
+    "get_level": ("l", 1, ("Level Value",)),
+    "get_info": ("_", 0, ("Info",)),
+    "set_powerstat": (None, 1, ()),
+    "get_powerstat": (None, 0, ("Power Status",)),
+    "chk_vfo": (None, 0, ("ChkVFO",)),
+    "dump_state": (None, 0, ()),
+    "quit": ("q", 0, ()),
+}
+SHORT_COMMANDS = {short: long for long, (short, _, _) in RIGCTL_COMMANDS.items() if short is not None}
+SHORT_COMMANDS["Q"] = "quit"
+
+# Hamlib mode bits of modes in Ft991aConfig.rigctl_modes (except C4FM, which Hamlib does not list)
+MODE_BITS = {"AM": 1 << 0, "CW": 1 << 1, "USB": 1 << 2, "LSB": 1 << 3, "RTTY": 1 << 4, "FM": 1 << 5,
+             "CWR": 1 << 7, "RTTYR": 1 << 8, "PKTLSB": 1 << 10, "PKTUSB": 1 << 11, "PKTFM": 1 << 12}
+ALL_MODES = sum(MODE_BITS.values())
+# Hamlib level bits
+LEVEL_BITS = {"AF": 1 << 3, "SQL": 1 << 5, "RFPOWER": 1 << 12, "MICGAIN": 1 << 13, "RAWSTR": 1 << 26,
+              "SWR": 1 << 28, "ALC": 1 << 29, "STRENGTH": 1 << 30}
+SET_LEVELS = ("AF", "SQL", "RFPOWER", "MICGAIN")
+
+
+class RigctlError(Exception):
+    def __init__(self, code: int, message: str = ""):
+        super().__init__(message or f"Hamlib error {code}")
+        self.code = code
+
+
+def interpolate(table: tuple, raw: int) -> float:
+    """Calibrate meter reading by linear interpolation between (raw, value) points of table."""
+    for (raw_low, low), (raw_high, high) in zip(table, table[1:]):
+        if raw <= raw_high:
+            return low + (high - low) * (max(raw, raw_low) - raw_low) / (raw_high - raw_low)
+    return table[-1][1]
+
+
+def dump_state() -> list:
+    """Capabilities in rigctld "dump_state" format (protocol version 0)."""
+    ranges = [
+        # start, end, modes, low power, high power, VFOs, antennas
+        f"30000.000000 56000000.000000 {ALL_MODES:#x} -1 -1 0x3 0x1",
+        f"118000000.000000 164000000.000000 {ALL_MODES:#x} -1 -1 0x3 0x1",
+        f"420000000.000000 470000000.000000 {ALL_MODES:#x} -1 -1 0x3 0x1",
+        "0 0 0 0 0 0 0",
+        f"1800000.000000 54000000.000000 {ALL_MODES:#x} 5000 100000 0x3 0x1",
+        f"144000000.000000 148000000.000000 {ALL_MODES:#x} 5000 50000 0x3 0x1",
+        f"430000000.000000 450000000.000000 {ALL_MODES:#x} 5000 50000 0x3 0x1",
+        "0 0 0 0 0 0 0",
+    ]
+    steps = [f"{ALL_MODES:#x} 10", "0 0"]
+    filters = [f"{MODE_BITS['USB'] | MODE_BITS['LSB'] | MODE_BITS['PKTUSB'] | MODE_BITS['PKTLSB']:#x} 3000",
+               f"{MODE_BITS['CW'] | MODE_BITS['CWR']:#x} 500",
+               f"{MODE_BITS['AM']:#x} 6000",
+               f"{MODE_BITS['FM'] | MODE_BITS['PKTFM']:#x} 16000",
+               "0 0"]
+    get_levels = sum(LEVEL_BITS.values())
+    set_levels = sum(LEVEL_BITS[level] for level in SET_LEVELS)
+    return ["0", "1035", "2", *ranges, *steps, *filters,
+            "9999", "9999", "0", "0",  # max RIT, max XIT, max IF shift, announces
+            "", "",  # preamps, attenuators
+            "0x0", "0x0", f"{get_levels:#x}", f"{set_levels:#x}", "0x0", "0x0"]
+
+
+class RigctlHandler(socketserver.StreamRequestHandler):
+    """One client connection. Lines are split into commands (short "f" or long "\\get_freq",
+    "+" in front asks for extended response), each followed by its arguments.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            tokens = line.decode("ascii", "replace").split()
+            while tokens:
+                token = tokens.pop(0)
+                extended = token.startswith("+")
+                token = token.lstrip("+")
+                command = token[1:] if token.startswith("\\") else SHORT_COMMANDS.get(token, token)
+                if command == "quit":
+                    return
+                n_args = RIGCTL_COMMANDS[command][1] if command in RIGCTL_COMMANDS else 0
+                args, tokens = tokens[:n_args], tokens[n_args:]
+                self.wfile.write(self.server.respond(command, args, extended).encode("ascii"))
+
+
+class Ft991aRigctlServer(socketserver.ThreadingTCPServer):
+    """rigctld compatible TCP server sharing one Ft991a among many clients
+    (e.g. WSJT-X as "Hamlib NET rigctl", loggers, dashboards).
+
+    All clients go through one Ft991aExecutor, so serial link is used by one command at a time.
+    Identical reads from different clients while one is queued or in flight share its result
+    (e.g. five clients polling frequency cost one "FA;" round trip). A set command stops later
+    reads from joining reads queued before it.
+
+    e.g.:
+        server = Ft991aRigctlServer(ft, port=4532)
+        server.start()
+        ...
+        server.stop()
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, ft: Ft991a, host: str = "127.0.0.1", port: int = Ft991aConfig.rigctld_port):
+        """
+        :param ft: opened Ft991a, used only by server's executor from now on
+        :param host: address to listen on, "0.0.0.0" for all interfaces
+        :param port: TCP port, 0 for any free one (refer to server_address)
+        """
+        super().__init__((host, port), RigctlHandler)
+        self.executor = Ft991aExecutor(ft)
+        self.__in_flight = {}
+        # Reentrant, done callback runs right away in submitting thread if call already finished
+        self.__lock = threading.RLock()
+        self.__thread: Optional[threading.Thread] = None
+        self.__handlers = {
+            "set_freq": self.__set_freq, "get_freq": self.__get_freq,
+            "set_mode": self.__set_mode, "get_mode": self.__get_mode,
+            "set_vfo": self.__set_vfo, "get_vfo": self.__get_vfo,
+            "set_ptt": self.__set_ptt, "get_ptt": self.__get_ptt,
+            "set_split_vfo": self.__set_split_vfo, "get_split_vfo": self.__get_split_vfo,
+            "set_level": self.__set_level, "get_level": self.__get_level,
+            "get_info": self.__get_info, "chk_vfo": self.__chk_vfo, "dump_state": dump_state,
+            "set_powerstat": self.__set_powerstat, "get_powerstat": self.__get_powerstat,
+        }
+
+        self.commands = 0
+        self.reads = 0
+        self.coalesced = 0
+
+    def start(self):
+        self.executor.start()
+        self.__thread = threading.Thread(target=self.serve_forever, name="Ft991aRigctlServer", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.executor.stop()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def read(self, method: str, *args):
+        """Call reading Ft991a method through executor, joining identical call already queued."""
+        key = (method, args)
+        with self.__lock:
+            self.reads += 1
+            future = self.__in_flight.get(key)
+            if future is None:
+                future = self.executor.submit(method, *args)
+                self.__in_flight[key] = future
+                future.add_done_callback(lambda done: self.__read_done(key, done))
+            else:
+                self.coalesced += 1
+        return future.result()
+
+    def __read_done(self, key: tuple, future: Future):
+        with self.__lock:
+            if self.__in_flight.get(key) is future:
+                del self.__in_flight[key]
+
+    def call(self, method: str, *args):
+        """Call setting Ft991a method through executor."""
+        with self.__lock:
+            self.__in_flight.clear()
+            future = self.executor.submit(method, *args)
+        return future.result()
+
+    def respond(self, command: str, args: list, extended: bool = False) -> str:
+        """Execute one rigctl command.
+
+        :return: response text, e.g. "14074000\\n", "RPRT 0\\n"
+        """
+        self.commands += 1
+        try:
+            if command not in self.__handlers:
+                raise RigctlError(RIG_ENIMPL, f"Command '{command}' not implemented.")
+            if len(args) != RIGCTL_COMMANDS[command][1]:
+                raise RigctlError(RIG_EINVAL, f"Command '{command}' needs {RIGCTL_COMMANDS[command][1]} arguments.")
+            values = self.__handlers[command](*args)
+            code = RIG_OK
+        except RigctlError as err:
+            values, code = None, err.code
+        except (ParameterError, ParseFrequencyError, ActionNotSupportedError, ValueError, KeyError):
+            values, code = None, RIG_EINVAL
+        except MalformedResponse:
+            values, code = None, RIG_EPROTO
+        except Exception:
+            values, code = None, RIG_EIO
+
+        if extended:
+            lines = [f"{command}: {' '.join(args)}".rstrip()]
+            if values is not None:
+                lines += [f"{name}: {value}" for name, value in zip(RIGCTL_COMMANDS[command][2], values)] \
+                    if RIGCTL_COMMANDS[command][2] else list(values)
+            lines.append(f"RPRT {code}")
+            return "\n".join(lines) + "\n"
+        if values is None:
+            return f"RPRT {code}\n"
+        return "".join(f"{value}\n" for value in values)
+
+    def __set_freq(self, frequency: str):
+        self.call("set_vfo", int(float(frequency)))
+
+    def __get_freq(self):
+        return self.read("read_vfo"),
+
+    def __set_mode(self, mode: str, passband: str):
+        # Passband is left to transceiver's width setting
+        if mode not in Ft991aConfig.rigctl_modes:
+            raise RigctlError(RIG_EINVAL, f"Mode '{mode}' not supported.")
+        self.call("set_mode", Ft991aConfig.rigctl_modes[mode])
+
+    def __get_mode(self):
+        mode = self.read("read_mode")
+        names = {name: rigctl for rigctl, name in Ft991aConfig.rigctl_modes.items()}
+        return names.get(mode, mode), 0
+
+    def __set_vfo(self, vfo: str):
+        if vfo not in ("VFOA", "currVFO"):
+            raise RigctlError(RIG_ENAVAIL, "Only VFOA can be selected.")
+
+    def __get_vfo(self):
+        return "VFOA",
+
+    def __set_ptt(self, ptt: str):
+        self.call("tx_on" if int(ptt) else "tx_off")
+
+    def __get_ptt(self):
+        return int(self.read("read_tx_state") != "OFF"),
+
+    def __set_split_vfo(self, split: str, tx_vfo: str):
+        self.call("set_command", "FT", "1" if int(split) else "0")
+
+    def __get_split_vfo(self):
+        split = self.read("read_command", "FT") == "1"
+        return int(split), "VFOB" if split else "VFOA"
+
+    def __set_level(self, level: str, value: str):
+        value = float(value)
+        if level == "AF":
+            self.call("set_af_gain", round(value * 255))
+        elif level == "SQL":
+            self.call("set_squelch_level", round(value * 100))
+        elif level == "RFPOWER":
+            self.call("set_output_rf_power", max(round(value * 100), 5))
+        elif level == "MICGAIN":
+            self.call("set_mic_gain", round(value * 100))
+        else:
+            raise RigctlError(RIG_EINVAL, f"Level '{level}' can not be set.")
+
+    def __get_level(self, level: str):
+        if level == "STRENGTH":
+            return round(interpolate(Ft991aConfig.smeter_db, self.read("read_smeter"))),
+        if level == "RAWSTR":
+            return self.read("read_smeter"),
+        if level == "SWR":
+            return f"{interpolate(Ft991aConfig.swr_ratio, self.read('read_meter_swr')):.6f}",
+        if level == "ALC":
+            return f"{self.read('read_meter_alc') / 255:.6f}",
+        scales = {"AF": ("read_af_gain", 255), "SQL": ("read_squelch", 100),
+                  "RFPOWER": ("read_output_rf_power", 100), "MICGAIN": ("read_mic_gain", 100)}
+        if level not in scales:
+            raise RigctlError(RIG_EINVAL, f"Level '{level}' can not be read.")
+        method, scale = scales[level]
+        return f"{self.read(method) / scale:.6f}",
+
+    def __get_info(self):
+        return "Yaesu FT-991A",
+
+    def __chk_vfo(self):
+        return 0,
+
+    def __set_powerstat(self, status: str):
+        self.call("power_on" if int(status) else "power_off")
+
+    def __get_powerstat(self):
+        return int(self.read("read_command", "PS")),
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rigctld compatible server sharing one FT-991A among many clients.")
+    parser.add_argument("com_port", nargs="?", default=None, help="COM port on which FT991A is connected")
+    parser.add_argument("-T", "--listen-addr", type=str, default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("-t", "--port", type=int, default=Ft991aConfig.rigctld_port, help="TCP port to listen on")
+    parser.add_argument("--no-upgrade", action="store_true", default=False, help="Keep transceiver's CAT RATE")
+    parser.add_argument("--emulator", action="store_true", default=False,
+                        help="Serve emulated transceiver instead of COM port")
+    args = parser.parse_args()
+
+    emulator = None
+    if args.emulator:
+        from ft991a_emulator import Ft991aEmulator
+        emulator = Ft991aEmulator()
+        emulator.start()
+        ft = Ft991a(emulator.port, 38400)
+        ft.open_serial()
+    elif args.com_port is not None:
+        ft = Ft991a.connect(args.com_port, upgrade=not args.no_upgrade)
+    else:
+        parser.error("com_port or --emulator is required")
+
+    server = Ft991aRigctlServer(ft, args.listen_addr, args.port)
+    server.start()
+    print(f"Listening on {server.server_address[0]}:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        ft.close_serial()
+        if emulator is not None:
+            emulator.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import time
+from array import array
+from typing import Optional, Union
+
+from ft991a import Ft991a, MalformedResponse, ParameterError, parse_frequency
+from ft991a_config import Ft991aConfig
+
+
+class ScanResult:
+    """Signal level per frequency of one sweep, backed by arrays.
+
+    Storage for all points is allocated up front, count tells how many were measured
+    (less than all when scan stopped on busy frequency).
+    """
+
+    def __init__(self, frequencies: array):
+        self.frequencies = frequencies
+        self.levels = array("H", bytes(2 * len(frequencies)))
+        self.count = 0
+        # Frequency scan stopped on, None if it went through whole range
+        self.busy_frequency: Optional[int] = None
+        # Points without S-meter reading (level left at 0)
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """(frequency, level) of measured points."""
+        return zip(self.frequencies[:self.count], self.levels[:self.count])
+
+    @property
+    def points_per_second(self) -> float:
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+    def strongest(self) -> Optional[tuple]:
+        """(frequency, level) of strongest signal or None if empty."""
+        if not self.count:
+            return None
+        levels = self.levels[:self.count]
+        i = levels.index(max(levels))
+        return self.frequencies[i], levels[i]
+
+    def above(self, level: int) -> list:
+        """(frequency, level) of points stronger than level."""
+        return [(frequency, value) for frequency, value in self if value > level]
+
+
+class BandScanner:
+    """Sweeps VFO over frequency range and reads S-meter at each point.
+
+    By default (dwell Ft991aConfig.scan_dwell) each point takes one round trip: S-meter of
+    current point is read and VFO moved to next point in the same write, then scanner waits
+    dwell seconds for receiver to settle on the new frequency.
+
+    With dwell=0 frequency sets ("FA") and S-meter reads ("SM") are interleaved and pipelined
+    through Ft991a.batch(), as many points per round trip as fit in Ft991aConfig.batch_write_size.
+    That is several times faster, but S-meter is read right after the frequency changed, before
+    receiver settled, so on a real transceiver a reading may still show (part of) previous point.
+    Use it for emulator or for a coarse look, not for exact levels.
+
+    e.g.:
+        scanner = BandScanner(ft, "14M", "14.35M", "5k", stop_on_busy=True)
+        result = scanner.scan()
+        print(result.busy_frequency, result.strongest())
+    """
+
+    def __init__(self, ft: Ft991a, start: Union[str, int], stop: Union[str, int], step: Union[str, int],
+                 dwell: Optional[float] = None, stop_on_busy: bool = False, restore: bool = True):
+        """
+        :param ft: opened Ft991a
+        :param start: first frequency, int in Hz or string with suffix, e.g. "14M" (refer to parse_frequency)
+        :param stop: last frequency (included if step lands on it)
+        :param step: distance between points
+        :param dwell: seconds to wait between setting frequency and reading S-meter, defaults to
+                      Ft991aConfig.scan_dwell. 0 pipelines points without waiting (see above)
+        :param stop_on_busy: read busy state ("BY") at every point and stop on first busy one,
+                             VFO is left on busy frequency
+        :param restore: set VFO back to starting frequency after scan (not when stopped on busy)
+        """
+        self.ft = ft
+        self.start = int(parse_frequency(start))
+        self.stop = int(parse_frequency(stop))
+        self.step = int(parse_frequency(step))
+        if not self.step:
+            raise ParameterError("Scan step can not be 0.")
+        if self.stop < self.start:
+            raise ParameterError(f"Scan stop {self.stop} is below start {self.start}.")
+        self.dwell = Ft991aConfig.scan_dwell if dwell is None else dwell
+        self.stop_on_busy = stop_on_busy
+        self.restore = restore
+
+        self.frequencies = array("L", range(self.start, self.stop + 1, self.step))
+        self.__stride = 3 if stop_on_busy else 2
+        point_size = sum(len(f"{command}{parameter or ''};") for command, parameter
+                         in self.__point_commands(self.stop))
+        self.__batch_points = max(Ft991aConfig.batch_write_size // point_size, 1)
+
+    def __point_commands(self, frequency: int) -> list:
+        commands = [("FA", f"{frequency:0>9}"), ("SM", "0")]
+        if self.stop_on_busy:
+            commands.append(("BY", None))
+        return commands
+
+    def __record(self, result: ScanResult, i: int, level, busy) -> bool:
+        """Store reading of point i.
+
+        :return: True if scan should stop on this point
+        """
+        if level is None or isinstance(level, MalformedResponse):
+            result.errors += 1
+        else:
+            result.levels[i] = int(level[-3:])
+        result.count = i + 1
+        if self.stop_on_busy and isinstance(busy, str) and busy[-2] == "1":
+            result.busy_frequency = self.frequencies[i]
+            return True
+        return False
+
+    def __scan_pipelined(self, result: ScanResult) -> int:
+        """:return: index of last point VFO was set to"""
+        points = self.__batch_points
+        stride = self.__stride
+        for first in range(0, len(self.frequencies), points):
+            block = self.frequencies[first:first + points]
+            commands = []
+            for frequency in block:
+                commands.extend(self.__point_commands(frequency))
+            answers = self.ft.batch(commands, raise_errors=False)
+            for n in range(len(block)):
+                point = answers[n * stride:(n + 1) * stride]
+                if self.__record(result, first + n, point[1], point[2] if self.stop_on_busy else None):
+                    return first + len(block) - 1
+        return len(self.frequencies) - 1
+
+    def __scan_dwell(self, result: ScanResult) -> int:
+        """:return: index of last point VFO was set to"""
+        self.ft.batch([("FA", f"{self.frequencies[0]:0>9}")])
+        last = len(self.frequencies) - 1
+        for i in range(len(self.frequencies)):
+            time.sleep(self.dwell)
+            # Read this point and move on to next one in the same write
+            commands = self.__point_commands(self.frequencies[i])[1:]
+            if i < last:
+                commands.append(("FA", f"{self.frequencies[i + 1]:0>9}"))
+            answers = self.ft.batch(commands, raise_errors=False)
+            if self.__record(result, i, answers[0], answers[1] if self.stop_on_busy else None):
+                return min(i + 1, last)
+        return last
+
+    def scan(self) -> ScanResult:
+        """Sweep whole range once.
+
+        :return: ScanResult
+        """
+        result = ScanResult(self.frequencies)
+        original = self.ft.read_vfo() if self.restore else None
+        started = time.perf_counter()
+        if self.dwell:
+            last_set = self.__scan_dwell(result)
+        else:
+            last_set = self.__scan_pipelined(result)
+        result.elapsed = time.perf_counter() - started
+
+        if result.busy_frequency is not None:
+            # Pipelining may have moved VFO past busy frequency
+            if last_set != result.count - 1:
+                self.ft.set_vfo(result.busy_frequency)
+        elif original is not None:
+            self.ft.set_vfo(original)
+        return result
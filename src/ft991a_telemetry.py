@@ -0,0 +1,160 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import math
+import threading
+import time
+from array import array
+from typing import Callable, Optional
+
+from ft991a import Ft991a, MalformedResponse
+from ft991a_config import Ft991aConfig
+
+
+class RingBuffer:
+    """Fixed-size buffer of (timestamp, value) samples backed by arrays.
+
+    Storage is allocated once, appending a sample does not create Python objects.
+    Oldest samples are overwritten when buffer is full.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.timestamps = array("d", bytes(8 * size))
+        self.values = array("H", bytes(2 * size))
+        self.count = 0
+        self.__index = 0
+
+    def append(self, timestamp: float, value: int):
+        self.timestamps[self.__index] = timestamp
+        self.values[self.__index] = value
+        self.__index = (self.__index + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def __len__(self):
+        return self.count
+
+    def latest(self) -> Optional[tuple]:
+        """Last (timestamp, value) or None if empty."""
+        if not self.count:
+            return None
+        i = self.__index - 1
+        return self.timestamps[i], self.values[i]
+
+    def __valid(self) -> array:
+        return self.values if self.count == self.size else self.values[:self.count]
+
+    def min(self) -> Optional[int]:
+        return min(self.__valid()) if self.count else None
+
+    def max(self) -> Optional[int]:
+        return max(self.__valid()) if self.count else None
+
+    def mean(self) -> Optional[float]:
+        return sum(self.__valid()) / self.count if self.count else None
+
+    def percentile(self, p: float) -> Optional[int]:
+        """Nearest-rank percentile.
+
+        :param p: between 0 and 100
+        """
+        if not self.count:
+            return None
+        ordered = sorted(self.__valid())
+        rank = min(max(math.ceil(p / 100 * self.count), 1), self.count)
+        return ordered[rank - 1]
+
+    def samples(self) -> list:
+        """All samples as (timestamp, value), oldest first."""
+        start = self.__index if self.count == self.size else 0
+        return [(self.timestamps[(start + i) % self.size], self.values[(start + i) % self.size])
+                for i in range(self.count)]
+
+
+class TelemetrySampler:
+    """Samples S-meter and RM meters continuously into RingBuffers.
+
+    All meters are read with one batched round trip per cycle, as fast as the link allows
+    (or every interval seconds). Sampler's thread talks to Ft991a directly, do not use
+    the same Ft991a from other threads in the meantime (use Ft991aExecutor for that and
+    submit sample() instead of start()).
+
+    e.g.:
+        sampler = TelemetrySampler(ft, meters=("SM", "SWR", "PO"))
+        sampler.add_threshold("SWR", 100, alarm, tx_only=True)
+        sampler.start()
+        ...
+        print(sampler.buffers["SWR"].max())
+    """
+
+    def __init__(self, ft: Ft991a, meters=("SM", "COMP", "ALC", "PO", "SWR", "ID", "VDD"),
+                 size: int = 36000, interval: float = 0.0):
+        """
+        :param ft: opened Ft991a
+        :param meters: "SM" and/or names from Ft991aConfig.r_meter_reading
+        :param size: number of samples kept per meter
+        :param interval: minimal seconds between cycles, 0 for as fast as possible
+        """
+        self.ft = ft
+        self.meters = tuple(meters)
+        self.interval = interval
+        self.buffers = {meter: RingBuffer(size) for meter in self.meters}
+
+        self.__commands = [("SM", "0") if meter == "SM" else ("RM", Ft991aConfig.r_meter_reading[meter])
+                           for meter in self.meters]
+        self.__cycle_commands = self.__commands
+        self.__thresholds = []
+        self.__tx_on = False
+        self.__thread: Optional[threading.Thread] = None
+        self.__running = False
+
+        self.cycles = 0
+        self.errors = 0
+
+    def add_threshold(self, meter: str, limit: int, callback: Callable, tx_only: bool = False):
+        """Call callback(meter, value, timestamp) for every sample of meter above limit.
+
+        :param tx_only: only while transmitting (TX state is then read every cycle as well)
+        """
+        self.__thresholds.append((meter, limit, callback, tx_only))
+        if tx_only:
+            self.__cycle_commands = self.__commands + [("TX", None)]
+
+    def sample(self):
+        """Read all meters once."""
+        answers = self.ft.batch(self.__cycle_commands, raise_errors=False)
+        timestamp = time.monotonic()
+        self.cycles += 1
+
+        if len(answers) > len(self.meters):
+            tx = answers[-1]
+            self.__tx_on = isinstance(tx, str) and tx != "0"
+        for meter, ans in zip(self.meters, answers):
+            if ans is None or isinstance(ans, MalformedResponse):
+                self.errors += 1
+                continue
+            value = int(ans[-3:])
+            self.buffers[meter].append(timestamp, value)
+            for t_meter, limit, callback, t_tx_only in self.__thresholds:
+                if t_meter == meter and value > limit and (self.__tx_on or not t_tx_only):
+                    callback(meter, value, timestamp)
+
+    def __run(self):
+        while self.__running:
+            started = time.monotonic()
+            self.sample()
+            if self.interval:
+                time.sleep(max(self.interval - (time.monotonic() - started), 0))
+
+    def start(self):
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run, name="TelemetrySampler", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        self.__running = False
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
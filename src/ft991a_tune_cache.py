@@ -0,0 +1,76 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import json
+import threading
+import time
+from typing import Optional
+
+from ft991a_config import Ft991aConfig
+
+
+class TuneCache:
+    """When antenna tuner last tuned successfully, per frequency segment.
+
+    Segments are Ft991aConfig.tune_segment_width Hz wide. Entries are kept in
+    Ft991aConfig.tune_cache_file per serial port, so they survive restarts.
+    File is read on first use.
+    """
+
+    def __init__(self, serial_port: str, file_name: Optional[str] = None):
+        self.serial_port = serial_port
+        self.file_name = Ft991aConfig.tune_cache_file if file_name is None else file_name
+        self.__entries: Optional[dict] = None
+        self.__lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def segment(frequency: int) -> str:
+        """e.g. 14074000 -> "281" """
+        return str(frequency // Ft991aConfig.tune_segment_width)
+
+    def __read_file(self) -> dict:
+        try:
+            with open(self.file_name, "r") as tune_file:
+                return json.load(tune_file)
+        except (OSError, ValueError):
+            return {}
+
+    def __load(self) -> dict:
+        if self.__entries is None:
+            self.__entries = self.__read_file().get(self.serial_port, {})
+        return self.__entries
+
+    def __save(self):
+        settings = self.__read_file()
+        settings[self.serial_port] = self.__entries
+        with open(self.file_name, "w") as tune_file:
+            json.dump(settings, tune_file, indent=2)
+
+    def is_tuned(self, frequency: int) -> bool:
+        """Was frequency's segment tuned within Ft991aConfig.tune_cache_ttl?"""
+        with self.__lock:
+            tuned = self.__load().get(self.segment(frequency))
+        if tuned is not None and time.time() - tuned < Ft991aConfig.tune_cache_ttl:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def remember(self, frequency: int):
+        """Record successful tune on frequency."""
+        with self.__lock:
+            self.__load()[self.segment(frequency)] = time.time()
+            self.__save()
+
+    def forget(self, frequency: Optional[int] = None):
+        """Drop entry of frequency's segment, all entries if None (e.g. after changing antenna)."""
+        with self.__lock:
+            if frequency is None:
+                self.__entries = {}
+            else:
+                self.__load().pop(self.segment(frequency), None)
+            self.__save()
@@ -2,37 +2,102 @@
 # When it's good, it's very good.
 # When it's bad, it's better than nothing.
 # When it lies to you, it may be a while before you realize something's wrong.
+import os
+import re
+import threading
+from typing import Optional, Union
+
+
+MENU_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "menu.csv")
+
+# Parameter ranges in menu.csv, e.g. "0 ~ 100 (P2 = 000 ~ 100)", "0: OFF 1: ON", "00 ~ 15"
+P2_PATTERN = re.compile(r"P2\s*=\s*([^,)]*)")
+CHOICE_PATTERN = re.compile(r"(?:^|\s)(\d+)\s?: ")
+RANGE_PATTERN = re.compile(r"^([+\-]?\d+)\s*~\s*([+\-]?\d+)")
+NUMBER_PATTERN = re.compile(r"[+\-]?\d+")
+
+
+class MenuItemNotFoundError(Exception):
+    pass
+
+
+class MenuParameterError(Exception):
+    pass
+
+
+def normalize_name(name: str) -> str:
+    """e.g. "cat-rate" -> "CAT RATE" """
+    return re.sub(r"[^A-Z0-9]+", " ", name.upper()).strip()
+
+
+def load_menu_items(file_name: str = MENU_CSV) -> tuple:
+    with open(file_name, "r") as menu_file:
+        data = menu_file.read()
+    data = data.split("\n")
+    out = []
+    for line in data:
+        if not line or line.startswith("P1;"):
+            continue
+        item = line.split(";")
+        item = MenuFunction(
+            int(item[0]),
+            item[1],
+            item[2],
+            int(item[3] if item[3] != "-" else 0)
+        )
+        out.append(item)
+    return tuple(out)
 
 
 class Menu:
+    """Function menu items from menu.csv, indexed by number and by name.
 
-    def __init__(self):
-        self.MENU_ITEMS = self.__load_menu_items()
-
-    def get_menu_function(self, num):
-        return self.__find_item(num)
-
-    def __find_item(self, num):
-        return [item for item in self.MENU_ITEMS if item.num == num][0]
-
-    @staticmethod
-    def __load_menu_items():
-        with open(r"D:\Lesko\workspace\ham\Yaesu991aCAT\src\menu.csv", "r") as menu_file:
-            data = menu_file.read()
-        data = data.split("\n")
-        out = []
-        for line in data:
-            if line.startswith("P1;"):
-                continue
-            item = line.split(";")
-            item = MenuFunction(
-                int(item[0]),
-                item[1],
-                item[2],
-                int(item[3] if item[3] != "-" else 0)
-            )
-            out.append(item)
-        return out
+    menu.csv is parsed on first use, once per process, and items are shared by all Menu instances.
+    """
+    __items: tuple = ()
+    __by_num: dict = {}
+    __by_name: dict = {}
+    __lock = threading.Lock()
+
+    def __load(self):
+        if not Menu.__items:
+            with Menu.__lock:
+                if not Menu.__items:
+                    items = load_menu_items()
+                    Menu.__by_num = {item.num: item for item in items}
+                    Menu.__by_name = {normalize_name(item.function): item for item in items}
+                    Menu.__items = items
+
+    @property
+    def MENU_ITEMS(self) -> tuple:
+        self.__load()
+        return Menu.__items
+
+    def get_menu_function(self, num: Union[int, str]) -> "MenuFunction":
+        """Menu item by number (e.g. 31, "031") or function name (e.g. "CAT RATE", "cat rate")."""
+        self.__load()
+        if isinstance(num, str) and not num.isdigit():
+            return self.find(num)
+        try:
+            return Menu.__by_num[int(num)]
+        except KeyError:
+            raise MenuItemNotFoundError(f"No menu item '{num}'.") from None
+
+    def find(self, name: str) -> "MenuFunction":
+        """Menu item by function name, case and punctuation are ignored."""
+        self.__load()
+        try:
+            return Menu.__by_name[normalize_name(name)]
+        except KeyError:
+            raise MenuItemNotFoundError(f"No menu item named '{name}'.") from None
+
+    def write_commands(self, settings: dict) -> list:
+        """Validated "EX" set commands.
+
+        :param settings: {menu number or name: value}, e.g. {31: 3, "CAT TOT": "1"}
+        :return: e.g. ["EX0313;", "EX0321;"]
+        """
+        return [f"EX{self.get_menu_function(num).format_param(value)};" for num, value in settings.items()]
 
 
 class MenuFunction:
@@ -43,13 +108,57 @@ class MenuFunction:
         self.param_description = param_description
         self.digits = digits
 
+        # Allowed values of P2, None where menu.csv does not tell
+        self.minimum: Optional[int] = None
+        self.maximum: Optional[int] = None
+        self.choices: Optional[tuple] = None
+        self.signed = "+" in param_description
+        self.__parse_range(param_description.replace("–", "-"))
+
+    def __parse_range(self, description: str):
+        p2 = P2_PATTERN.search(description)
+        choices = [int(choice) for choice in CHOICE_PATTERN.findall(description)]
+        plain = RANGE_PATTERN.match(description)
+        if p2 and NUMBER_PATTERN.search(p2.group(1)):
+            numbers = [int(number) for number in NUMBER_PATTERN.findall(p2.group(1))]
+            self.minimum, self.maximum = min(numbers), max(numbers)
+        elif choices and "~" in description:
+            self.minimum, self.maximum = min(choices), max(choices)
+        elif choices:
+            self.choices = tuple(choices)
+        elif plain:
+            self.minimum, self.maximum = int(plain.group(1)), int(plain.group(2))
+
     def __repr__(self):
         return f"<num: {self.num } function: '{self.function}' " \
                f"param_description: '{self.param_description}' digits: {self.digits}>"
 
+    def format_value(self, value: Union[int, str]) -> str:
+        """Check value against parameter range and format it as P2.
+
+        :param value: int or already formatted string, e.g. 1500 or "+1500"
+        :return: e.g. "+1500"
+        """
+        if not self.digits:
+            raise MenuParameterError(f"Menu item {self.num:0>3} {self.function} is read only.")
+        if isinstance(value, int) and self.signed:
+            param = f"{'-' if value < 0 else '+'}{abs(value):0>{self.digits - 1}}"
+        else:
+            param = str(value).replace("–", "-").rjust(self.digits, "0")
+        try:
+            number = int(param)
+        except ValueError:
+            raise MenuParameterError(f"Value '{value}' of menu item {self.num:0>3} {self.function} "
+                                     f"is not a number.") from None
+        if len(param) != self.digits or \
+                (self.choices is not None and number not in self.choices) or \
+                (self.minimum is not None and not self.minimum <= number <= self.maximum):
+            raise MenuParameterError(f"Value '{value}' out of range for menu item {self.num:0>3} "
+                                     f"{self.function} ({self.param_description}).")
+        return param
+
     def format_param(self, param):
-        param = str(param).rjust(self.digits, "0")
-        return f"{self.read_command()}{param}"
+        return f"{self.read_command()}{self.format_value(param)}"
 
     def read_command(self):
         return f"{self.num:0>3}"
@@ -58,4 +167,4 @@ class MenuFunction:
 if __name__ == '__main__':
 
     m = Menu()
-    print(m.get_menu_function(6).format_param("A"))
+    print(m.find("CAT RATE").format_param(3))
@@ -2,13 +2,14 @@
 # When it's good, it's very good.
 # When it's bad, it's better than nothing.
 # When it lies to you, it may be a while before you realize something's wrong.
-import time
+import os
 
 if __name__ == '__main__':
     import sys
-    sys.path.append("D:/Lesko/workspace/ham/Yaesu991aCAT/src")
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from ft991a import Ft991a
+from ft991a_profile import Profile, ProfileSwitcher
 import argparse
 
 
@@ -42,58 +43,34 @@ The DT Gain defaults to 50!   This will overdrive the rigs modulator which will
 
 __VERSION__ = "1.0.1b"
 
-read_menu_settings = [32, 33, 62, 64, 65, 66, 68, 70, 71, 72]
-write_menu_settings = [(32, "1"),
-                       (33, "1"),
-                       (62, "1"),
-                       (64, "+1500"),
-                       (65, "+1500"),
-                       (66, "00"),
-                       (68, "00"),
-                       (70, "1"),
-                       (71, "1"),
-                       (72, "1")]
-
-read_other_settings = ["MD0;", "FA;", "AG0;", "NA0;", "SH0;", "PC;"]
-write_other_settings = ["MD0C;", "AG0000;",
-                        "NA00;",
-                        "SH020"]
+PROFILE = "ft8"
 
 
 def read_original_settings(ser, save_file="original.dat"):
     print("Reading original settings ...")
-    with open(save_file, "w") as original_file:
-        for ms in read_menu_settings:
-            print(ser.debug_send(f"EX{ms:0>3};"))
-            s = ser.debug_send(f"EX{ms:0>3};")
-            original_file.write(f"{s}\n")
-
-        for os in read_other_settings:
-            print(ser.debug_send(os))
-            original_file.write(f"{ser.debug_send(os)}\n")
+    settings = ProfileSwitcher(ser).current(Profile.load(PROFILE).targets())
+    for answer in settings.values():
+        print(answer)
+    Ft991a.save_snapshot(settings, save_file)
     print("Reading original settings ... DONE")
 
 
-def to_ft8(ser):
+def to_ft8(ser, power=None):
     print("Configuring FT8 ...")
-    for ms, param in write_menu_settings:
-        s = f"EX{ms:0>3}{param};"
+    profile = Profile.load(PROFILE)
+    if power is not None:
+        profile.panel["PC"] = f"{power:0>3}"
+    result = ProfileSwitcher(ser).apply(profile)
+    for s in result.changes:
         print(s)
-        ser.debug_send(s)
-
-    for os in write_other_settings:
-        print(os)
-        ser.debug_send(os)
-    print("Configuring FT8 ... DONE")
+    print(f"Configuring FT8 ... DONE ({len(result.changes)} changed in {result.elapsed:.2f}s)")
 
 
 def restore_original(ser, restore_file="original.dat"):
     print("Restoring original settings ...")
-    with open(restore_file, "r") as original_file:
-        commands = original_file.read().split("\n")
-        for command in commands:
-            print(command)
-            ser.debug_send(command)
+    # Only settings that differ from saved ones are sent
+    for command in ser.restore(Ft991a.load_snapshot(restore_file)):
+        print(command)
     print("Restoring original settings ... DONE")
 
 
@@ -104,28 +81,31 @@ def main():
     parser.add_argument("com_port", help="COM port on which FT991A is connected", type=str)
     parser.add_argument("action", choices=["save", "ft8", "restore"], help="r: read and save, ft8: configure for FT8, "
                                                                            "o: restore original")
-    parser.add_argument("-b", "--baud", type=int, default=38400, help="Set baud rate - defaults to 38400")
+    parser.add_argument("-b", "--baud", type=int, default=None, help="Set baud rate - defaults to the one "
+                                                                     "transceiver answers at")
     parser.add_argument("-f", "--file", type=str, default="original.dat", help="File to save to or read from - "
                                                                                "defaults to 'origimal.dat'")
     parser.add_argument("-p", "--power", type=str, default=8, help="Output power level to set - defaults to 8W")
-    parser.add_argument("-t", "--tune", action="store_true", default=False, help="Tune on ft8 middle frequency (14.073M)")
+    parser.add_argument("-t", "--tune", action="store_true", default=False, help="Tune on ft8 middle frequency (14.073M), "
+                                                                                 "skipped if tuned there recently")
+    parser.add_argument("--retune", action="store_true", default=False, help="With --tune, tune even if tuned "
+                                                                             "there recently")
     args = parser.parse_args()
 
-    ft = Ft991a(args.com_port, args.baud)
-    ft.open_serial()
+    if args.baud is None:
+        # Only probe, other CAT software on this port relies on current CAT RATE
+        ft = Ft991a.connect(args.com_port, upgrade=False)
+    else:
+        ft = Ft991a(args.com_port, args.baud)
+        ft.open_serial()
 
     if args.action == "save":
         read_original_settings(ft, save_file=args.file)
     elif args.action == "ft8":
-        if args.action == "save":
-            read_original_settings(ft, save_file=args.file)
-        to_ft8(ft)
-        time.sleep(1)
+        to_ft8(ft, power=args.power)
         if args.tune:
-            ft.set_vfo("14.073M", "A")
-            ft.antenna_tuner_ctrl("TUNE", wait_complete=True)
-        ft.set_vfo("14.074M", "A")
-        ft.debug_send(f"PC{args.power:0>3};")
+            ft.tune("14.073M", force=args.retune)
+            ft.set_vfo("14.074M", "A")
     elif args.action == "restore":
         restore_original(ft, restore_file=args.file)
 
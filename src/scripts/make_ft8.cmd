@@ -2,7 +2,7 @@ rm -rf dist
 rm -rf build
 rm ft8.spec
 
-pyinstaller -F ft8.py
+pyinstaller -F --add-data "../commands.csv;." --add-data "../menu.csv;." --add-data "../profiles;profiles" ft8.py
 
 cp dist/ft8.exe bin/ft8.exe
 
@@ -0,0 +1,29 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from ft991a import Ft991a  # noqa: E402
+from ft991a_emulator import Ft991aEmulator  # noqa: E402
+
+
+@pytest.fixture
+def emulator():
+    emulator = Ft991aEmulator()
+    emulator.start()
+    yield emulator
+    emulator.stop()
+
+
+@pytest.fixture
+def ft(emulator):
+    ft = Ft991a(emulator.port, 38400)
+    ft.open_serial()
+    yield ft
+    ft.close_serial()
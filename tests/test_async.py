@@ -0,0 +1,74 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import asyncio
+
+import pytest
+
+from ft991a import Ft991a
+from ft991a_async import AsyncFt991a
+
+
+def run(emulator, coroutine):
+    """Run coroutine(ft) on AsyncFt991a connected to emulator."""
+    async def main():
+        ft = AsyncFt991a(emulator.port, 38400)
+        await ft.open_serial()
+        try:
+            return await coroutine(ft)
+        finally:
+            await ft.close_serial()
+
+    return asyncio.run(main())
+
+
+def test_reads_and_sets(emulator):
+    async def session(ft):
+        await ft.set_vfo("7.1M")
+        await ft.set_mode("DATA-USB")
+        await ft.write_menu({"CAT TOT": 2})
+        return await ft.read_vfo(), await ft.read_mode(), await ft.read_menu(["CAT TOT"])
+
+    assert run(emulator, session) == (7100000, "DATA-USB", {32: "2"})
+
+
+def test_read_meters_like_sync_client(emulator):
+    emulator.meters.update({"SM": 120, "SWR": 30})
+    sync = Ft991a(emulator.port, 38400)
+    sync.open_serial()
+    expected = sync.read_meters(("SM", "SWR", "PO"))
+    sync.close_serial()
+
+    async def session(ft):
+        return await ft.read_meters(("SM", "SWR", "PO"))
+
+    assert run(emulator, session) == expected
+    assert expected[0].value == 120
+
+
+def test_concurrent_callers_get_own_answers(emulator):
+    async def session(ft):
+        return await asyncio.gather(*(ft.read_vfo("A" if i % 2 else "B") for i in range(20)))
+
+    assert run(emulator, session) == [7074000 if i % 2 == 0 else 14250000 for i in range(20)]
+
+
+@pytest.fixture(params=["reader", "poll"])
+def transport_mode(request, monkeypatch):
+    """Event loop reader callback (POSIX) or polling task (where loop has no add_reader)."""
+    if request.param == "poll":
+        def no_reader(*args):
+            raise NotImplementedError
+        monkeypatch.setattr(asyncio.SelectorEventLoop, "add_reader", no_reader)
+    return request.param
+
+
+def test_survives_line_noise(emulator, transport_mode):
+    async def session(ft):
+        await ft.read_vfo()
+        emulator.send_raw(b"\xff\xfe;")
+        await asyncio.sleep(0.05)
+        return await ft.read_vfo()
+
+    assert run(emulator, session) == 14250000
@@ -0,0 +1,69 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import time
+
+from ft991a_auto_information import FrameEvent, FrequencyEvent, ModeEvent, parse_frame
+
+
+def wait_for(condition, timeout=2.0):
+    give_up = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < give_up, "condition not met in time"
+        time.sleep(0.01)
+
+
+def test_parse_frame():
+    assert parse_frame("FA014250000;") == FrequencyEvent(vfo="A", frequency=14250000)
+    assert parse_frame("MD0C;") == ModeEvent(mode="DATA-USB")
+    assert parse_frame("AG0100;") == FrameEvent(command="AG", parameter="0100")
+    assert parse_frame("FAxyz;") == FrameEvent(command="FA", parameter="xyz")
+    assert parse_frame("?;") is None
+
+
+def test_auto_information_keeps_state_and_calls_subscribers(ft, emulator):
+    modes = []
+    ai = ft.start_auto_information()
+    ai.subscribe(modes.append, ModeEvent)
+    ft.set_mode("CW")
+    emulator.set_frequency("7.03M")
+    wait_for(lambda: ai.state.vfo_a == 7030000)
+
+    assert modes == [ModeEvent(mode="CW")]
+    assert ai.state.mode == "CW"
+    assert ft.read_mode() == "CW"
+
+    ai.unsubscribe(modes.append)
+    ft.set_mode("USB")
+    wait_for(lambda: ai.state.mode == "USB")
+    assert ModeEvent(mode="USB") not in modes
+    ft.stop_auto_information()
+    assert emulator.state["AI;"] == "AI0;"
+
+
+def test_auto_information_reader_survives_failing_subscriber(ft, emulator):
+    calls = []
+
+    def failing(event):
+        calls.append(event)
+        raise ValueError("subscriber bug")
+
+    ai = ft.start_auto_information()
+    ai.subscribe(failing, FrequencyEvent)
+    emulator.set_frequency("7.1M")
+    wait_for(lambda: calls)
+
+    assert ft.read_vfo() == 7100000
+    assert ai.state.vfo_a == 7100000
+    ft.stop_auto_information()
+
+
+def test_auto_information_reader_survives_line_noise(ft, emulator):
+    ai = ft.start_auto_information()
+    emulator.send_raw(b"\xff\xfe\x80;")
+    emulator.set_frequency("3.5M")
+    wait_for(lambda: ai.state.vfo_a == 3500000)
+
+    assert ft.read_vfo() == 3500000
+    ft.stop_auto_information()
@@ -0,0 +1,61 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import pytest
+
+from ft991a import Ft991a, MalformedResponse
+from ft991a_emulator import Ft991aEmulator
+
+
+def test_batch_splits_answers_and_errors_per_command(ft):
+    answers = ft.batch(["FA", "FA1;", ("AG", "0"), "AG0050;", "EX999;", "FB;", "MD0C;", "MD0;"], raise_errors=False)
+
+    assert answers[0] == "014250000"
+    assert isinstance(answers[1], MalformedResponse)
+    assert answers[2] == "0100"
+    assert answers[3] is None
+    assert isinstance(answers[4], MalformedResponse)
+    assert answers[5] == "007074000"
+    assert answers[6] is None
+    assert answers[7] == "0C"
+    assert ft.read_af_gain() == 50
+
+
+def test_batch_spanning_many_chunks(ft):
+    channels = range(1, 40)
+    answers = ft.batch([("EX", f"{num:0>3}") for num in channels], raw=True)
+
+    assert answers == [f"EX{num:0>3}{ft.read_menu([num])[num]};" for num in channels]
+
+
+def test_batch_raises_first_error_after_sending_all(ft):
+    with pytest.raises(MalformedResponse):
+        ft.batch(["FA1;", "AG0050;"])
+    assert ft.read_af_gain() == 50
+
+
+@pytest.fixture
+def slow_answers():
+    """Transceiver answering each command only after 40 ms, longer than set commands wait for an error."""
+    emulator = Ft991aEmulator(response_latency=0.04)
+    emulator.start()
+    ft = Ft991a(emulator.port, 38400)
+    ft.open_serial()
+    yield ft
+    ft.close_serial()
+    emulator.stop()
+
+
+def test_batch_with_slow_answers_matches_errors_by_position(slow_answers):
+    ft = slow_answers
+    answers = ft.batch(["FA1;", "FA;", "AG0050;", "EX999;", "MD0C;", "AG0;"], raise_errors=False)
+
+    assert isinstance(answers[0], MalformedResponse)
+    assert answers[1] == "014250000"
+    assert answers[2] is None
+    assert isinstance(answers[3], MalformedResponse)
+    assert answers[4] is None
+    assert answers[5] == "0050"
+    # Nothing left over for next command
+    assert ft.read_vfo() == 14250000
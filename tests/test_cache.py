@@ -0,0 +1,46 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import time
+
+from ft991a import Ft991a
+from ft991a_cache import StateCache
+
+
+def test_state_cache_entries_expire_and_invalidate():
+    cache = StateCache({"FA": 0.05, "AG": 10.0})
+    cache.put("FA;", "FA014250000;")
+    cache.update("AG0150;")
+    cache.put("SM0;", "SM0100;")
+
+    assert cache.get("FA;") == "FA014250000;"
+    assert cache.get("AG0;") == "AG0150;"
+    assert cache.get("SM0;") is None
+    time.sleep(0.06)
+    assert cache.get("FA;") is None
+
+    cache.put("FA;", "FA007000000;")
+    # VFO-B to VFO-A changes VFO-A
+    cache.update("BA;")
+    assert cache.get("FA;") is None
+    cache.invalidate("AG")
+    assert cache.get("AG0;") is None
+    assert (cache.hits, cache.misses) == (2, 3)
+
+
+def test_cache_serves_repeated_reads_and_follows_sets(emulator):
+    ft = Ft991a(emulator.port, 38400, cache=True)
+    ft.open_serial()
+    try:
+        assert ft.read_vfo() == 14250000
+        received = emulator.received
+        assert ft.read_vfo() == 14250000
+        assert emulator.received == received
+
+        ft.set_vfo("7.1M")
+        assert ft.read_vfo() == 7100000
+        ft.vfoa_to_vfob()
+        assert ft.read_vfo("B") == 7100000
+    finally:
+        ft.close_serial()
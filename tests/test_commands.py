@@ -0,0 +1,37 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import pytest
+
+from ft991a import COMMANDS, ActionNotSupportedError, CommandNotFoundError, ParameterError
+
+
+def test_codec_formats_and_decodes():
+    ag = COMMANDS["AG"]
+    assert ag.get() == "AG;"
+    assert ag.get("0") == "AG0;"
+    assert ag.get(True) == "AG1;"
+    assert ag.is_read("AG0;")
+    assert not ag.is_read("AG0100;")
+    assert ag.decode("0100") == 100
+    assert ag.pattern.match("AG0100;").group(1) == "0100"
+
+    assert COMMANDS["NB"].decode("01") is True
+    assert COMMANDS["CT"].decode("01") == "1"
+    with pytest.raises(ParameterError):
+        ag.get(1.5)
+
+
+def test_read_and_set_any_command(ft, emulator):
+    assert ft.read_command("FA") == 14250000
+    ft.set_command("NB", "01")
+    assert ft.read_command("NB", 0) is True
+    assert emulator.state["NB0;"] == "NB01;"
+
+    with pytest.raises(ActionNotSupportedError):
+        ft.set_command("ID", "0670")
+    with pytest.raises(ActionNotSupportedError):
+        ft.read_command("AB")
+    with pytest.raises(CommandNotFoundError):
+        ft.read_command("XX")
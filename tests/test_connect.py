@@ -0,0 +1,46 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import pytest
+
+from ft991a import Ft991a
+from ft991a_config import Ft991aConfig
+from ft991a_emulator import Ft991aEmulator
+
+
+@pytest.fixture
+def slow_link(tmp_path, monkeypatch):
+    """Transceiver with CAT RATE 9600 and CAT TOT 100 ms, ignoring input at any other rate."""
+    monkeypatch.setattr(Ft991aConfig, "link_settings_file", str(tmp_path / "link.json"))
+    emulator = Ft991aEmulator(model_baud_rate=True)
+    emulator.state["EX031;"] = "EX0311;"
+    emulator.state["EX032;"] = "EX0321;"
+    emulator.start()
+    yield emulator
+    emulator.stop()
+
+
+def test_probe_finds_cat_rate(slow_link):
+    ft = Ft991a(slow_link.port, 38400)
+    ft.open_serial()
+    try:
+        assert ft.probe_baud_rate() == 9600
+        assert ft.read_vfo() == 14250000
+        assert ft.negotiate_link(upgrade=False) == 9600
+    finally:
+        ft.close_serial()
+    assert Ft991a.remembered_baud_rate(slow_link.port) == 9600
+
+
+def test_connect_upgrades_link(slow_link):
+    ft = Ft991a.connect(slow_link.port)
+    try:
+        assert ft.baud_rate == 38400
+        assert slow_link.state["EX031;"] == "EX0313;"
+        assert slow_link.state["EX032;"] == "EX0320;"
+        assert ft.read_vfo() == 14250000
+        assert ft.link.profile()["commands"]["FA"]["samples"] >= 5
+    finally:
+        ft.close_serial()
+    assert Ft991a.remembered_baud_rate(slow_link.port) == 38400
@@ -0,0 +1,73 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import os
+import time
+
+import serial
+
+from ft991a import MalformedResponse
+from ft991a_emulator import Ft991aEmulator
+
+SETTINGS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "last_settings.dat")
+
+
+def test_process_reads_sets_and_errors():
+    emulator = Ft991aEmulator()
+
+    assert emulator.process("FA;") == "FA014250000;"
+    assert emulator.process("FA007074000;") == ""
+    assert emulator.process("FA;") == "FA007074000;"
+    assert emulator.process("FA7074;") == "?;"
+    assert emulator.process("XX;") == "?;"
+    assert emulator.process("ID0671;") == "?;"
+    assert emulator.process("EX0323;") == ""
+    assert emulator.menu_value(32) == "3"
+    assert emulator.process("EX03233;") == "?;"
+    assert emulator.process("AB;") == ""
+    assert emulator.process("FB;") == "FB007074000;"
+
+
+def test_reset_from_settings_file():
+    emulator = Ft991aEmulator(settings_file=SETTINGS_FILE)
+    emulator.process("AG0200;")
+    with open(SETTINGS_FILE, "r") as s_file:
+        settings = [answer for answer in s_file.read().split("\n") if answer.endswith(";")]
+
+    emulator.reset(SETTINGS_FILE)
+    assert emulator.process("EX031;") == "EX0313;"
+    assert all(emulator.process(f"{answer[:5]};") == answer for answer in settings if answer.startswith("EX"))
+    emulator.reset()
+    assert emulator.process("AG0;") == "AG0100;"
+
+
+def test_powered_off_answers_nothing(ft, emulator):
+    ft.power_off()
+    assert all(isinstance(answer, MalformedResponse) for answer in ft.batch(["FA;", "AG0;"], raise_errors=False))
+    assert emulator.process("FA;") == ""
+    ft.power_on()
+    assert ft.read_vfo() == 14250000
+
+
+def test_cat_tot_drops_incomplete_command(emulator):
+    emulator.model_cat_tot = True
+    emulator.state["EX032;"] = "EX0320;"
+    with serial.Serial(emulator.port, 38400, timeout=0.2) as port:
+        port.write(b"FA")
+        time.sleep(0.05)
+        port.write(b"AG0;")
+        assert port.read(7) == b"AG0100;"
+        port.write(b"FA;")
+        assert port.read(12) == b"FA014250000;"
+
+
+def test_meters_and_signals(emulator):
+    emulator.meters["SWR"] = 42
+    emulator.signals = {7074000: 180}
+
+    assert emulator.process("RM6;") == "RM6042;"
+    assert emulator.process("SM0;") == "SM0000;"
+    emulator.set_frequency("7.075M")
+    assert emulator.process("SM0;") == "SM0180;"
+    assert emulator.process("BY;") == "BY10;"
@@ -0,0 +1,74 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import threading
+import time
+
+import pytest
+
+from ft991a import Ft991a, ParameterError
+from ft991a_emulator import Ft991aEmulator
+from ft991a_executor import Ft991aExecutor
+
+
+@pytest.fixture
+def slow_ft():
+    """Transceiver at real 38400 baud, long calls take about a second."""
+    emulator = Ft991aEmulator(model_wire_time=True, response_latency=0.001)
+    emulator.start()
+    ft = Ft991a(emulator.port, 38400)
+    ft.open_serial()
+    yield ft
+    ft.close_serial()
+    emulator.stop()
+
+
+def test_executor_tx_off_preempts_long_call(slow_ft):
+    executor = Ft991aExecutor(slow_ft)
+    executor.start()
+    try:
+        snapshot = executor.snapshot()
+        time.sleep(0.1)
+        submitted = time.perf_counter()
+        executor.tx_off().result(timeout=5)
+        tx_off_latency = time.perf_counter() - submitted
+
+        assert not snapshot.done()
+        assert tx_off_latency < 0.3
+        assert snapshot.result(timeout=10)
+    finally:
+        executor.stop()
+
+
+def test_executor_runs_queued_calls_by_priority(ft):
+    executor = Ft991aExecutor(ft)
+    executor.start()
+    release = threading.Event()
+    order = []
+    try:
+        blocker = executor.submit_call(release.wait, 5)
+        futures = [executor.submit_call(order.append, name, priority=priority)
+                   for name, priority in (("poll 1", 10), ("tx_off", 0), ("poll 2", 10), ("status", 5))]
+        release.set()
+        for future in [blocker, *futures]:
+            future.result(timeout=5)
+    finally:
+        executor.stop()
+
+    assert order == ["tx_off", "status", "poll 1", "poll 2"]
+
+
+def test_executor_runs_methods_on_worker(ft):
+    executor = Ft991aExecutor(ft)
+    executor.start()
+    try:
+        executor.set_vfo("7.074M")
+        assert executor.read_vfo().result(timeout=5) == 7074000
+        with pytest.raises(ParameterError):
+            executor.set_squelch_level(101).result(timeout=5)
+        with pytest.raises(AttributeError):
+            executor.no_such_method()
+    finally:
+        executor.stop()
+    assert ft.between_commands is None
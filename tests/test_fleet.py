@@ -0,0 +1,61 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import time
+
+import pytest
+
+from ft991a_config import Ft991aConfig
+from ft991a_emulator import Ft991aEmulator
+from ft991a_fleet import Ft991aFleet, restore_snapshot, save_snapshot, snapshot_file
+
+
+@pytest.fixture
+def emulators(tmp_path, monkeypatch):
+    monkeypatch.setattr(Ft991aConfig, "link_settings_file", str(tmp_path / "link.json"))
+    emulators = [Ft991aEmulator() for _ in range(3)]
+    for emulator in emulators:
+        emulator.start()
+    yield emulators
+    for emulator in emulators:
+        emulator.stop()
+
+
+def test_fleet_runs_on_every_transceiver(emulators, tmp_path):
+    ports = [emulator.port for emulator in emulators]
+    with Ft991aFleet(ports + ["/dev/no-such-port"]) as fleet:
+        assert sorted(fleet.radios) == sorted(ports)
+        fleet.run("set_vfo", "7.074M")
+        results = fleet.run("read_vfo")
+
+        assert sorted(results) == sorted(ports)
+        assert all(result.value == 7074000 and result.error is None for result in results.values())
+        assert all(emulator.state["FA;"] == "FA007074000;" for emulator in emulators)
+
+        results = fleet.call(save_snapshot, str(tmp_path))
+        assert all(result.value > 100 for result in results.values())
+        fleet.run("set_vfo", "14.074M")
+        results = fleet.call(restore_snapshot, str(tmp_path))
+        assert all(result.value == 1 for result in results.values())
+        assert all(emulator.state["FA;"] == "FA007074000;" for emulator in emulators)
+
+
+def test_failing_transceiver_does_not_stop_others(emulators):
+    def slow_on_first(ft):
+        if ft.serial_port == emulators[0].port:
+            time.sleep(1)
+        return ft.read_vfo()
+
+    with Ft991aFleet([emulator.port for emulator in emulators[:2]]) as fleet:
+        results = fleet.run("set_squelch_level", 500)
+        assert all(result.error is not None for result in results.values())
+
+        results = fleet.call(slow_on_first, timeout=0.5)
+        assert isinstance(results[emulators[0].port].error, TimeoutError)
+        assert results[emulators[1].port].value == 14250000
+
+
+def test_snapshot_file_per_port():
+    assert snapshot_file("snapshots", "/dev/ttyUSB0") == "snapshots/dev_ttyUSB0.dat"
+    assert snapshot_file("", "COM3") == "COM3.dat"
@@ -0,0 +1,86 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import asyncio
+import time
+
+from ft991a_async import AsyncFt991a
+from ft991a_config import Ft991aConfig
+from ft991a_executor import Ft991aExecutor
+from ft991a_link import LinkProfile
+
+
+def test_deadline_is_learned_per_command():
+    link = LinkProfile()
+    assert link.deadline("FA;", True, 0.5) == 0.5
+    for _ in range(Ft991aConfig.link_min_samples):
+        link.observe("FA;", 0.004)
+
+    assert link.deadline("FA;", True, 0.5) == Ft991aConfig.link_min_deadline
+    assert link.deadline("SM0;", True, 0.5) == 0.5
+    # Set waits for a possible error as long as any answer takes
+    assert link.deadline("AG0100;", False, 0.5) == Ft991aConfig.link_min_deadline
+    assert link.deadline("PS;", True, 0.5) == Ft991aConfig.command_deadlines["PS"]
+
+
+def test_missed_answer_widens_deadline_and_gap():
+    link = LinkProfile()
+    for _ in range(Ft991aConfig.link_min_samples):
+        link.observe("FA;", 0.05)
+    deadline = link.deadline("FA;", True, 0.5)
+
+    link.timeout("FA;")
+    assert link.deadline("FA;", True, 0.5) > deadline
+    assert link.gap == Ft991aConfig.link_min_gap
+    link.observe("FA;", 0.05)
+    assert link.gap == 0.0
+
+
+def test_wake_gap_widens_up_to_limit():
+    link = LinkProfile()
+    assert link.wake_gap == Ft991aConfig.time_between_dummy
+    for _ in range(5):
+        link.wake_failed()
+    assert link.wake_gap == Ft991aConfig.max_time_between_dummy
+    assert link.profile()["wake_gap"] == Ft991aConfig.max_time_between_dummy
+
+
+def test_power_on_is_not_preempted(ft, emulator):
+    ft.power_off()
+    executor = Ft991aExecutor(ft)
+    executor.start()
+    try:
+        powered = executor.power_on()
+        time.sleep(0.3)
+        # Urgent call must wait, anything sent between dummy command and "PS1;" breaks wake up
+        executor.tx_off().result(timeout=10)
+
+        assert powered.done()
+        assert powered.exception() is None
+        assert emulator.state["PS;"] == "PS1;"
+    finally:
+        executor.stop()
+
+
+def test_slow_answer_after_learned_deadline(ft, emulator):
+    for _ in range(10):
+        ft.read_vfo()
+    emulator.response_latency = 0.15
+
+    assert ft.read_vfo() == 14250000
+
+
+def test_async_slow_answer_after_learned_deadline(emulator):
+    async def run():
+        ft = AsyncFt991a(emulator.port, 38400)
+        await ft.open_serial()
+        try:
+            for _ in range(10):
+                await ft.read_vfo()
+            emulator.response_latency = 0.15
+            return await ft.read_vfo()
+        finally:
+            await ft.close_serial()
+
+    assert asyncio.run(run()) == 14250000
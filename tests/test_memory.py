@@ -0,0 +1,44 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import pytest
+
+from ft991a import ParameterError
+
+
+PLAN = """channel,frequency,mode,tag,operation_mode
+1,145.6875M,FM,Zagarski vrh,-
+2,145.600M,FM,,simplex
+3,7.074M,DATA-USB,FT8 40m,
+"""
+
+
+@pytest.fixture
+def plan_file(tmp_path):
+    file_name = tmp_path / "plan.csv"
+    file_name.write_text(PLAN)
+    return str(file_name)
+
+
+def test_write_memory_plan_touches_only_changed_channels(ft, plan_file):
+    assert ft.write_memory_plan(plan_file) == [1, 2, 3]
+    assert ft.write_memory_plan(plan_file) == []
+
+    bank = ft.read_memory_bank(range(1, 4))
+    assert bank[1].frequency == 145687500
+    assert bank[1].tag == "Zagarski vrh"
+    assert bank[3].mode == "DATA-USB"
+
+    ft.write_memory_channel(2, frequency="145.500M", mode="FM")
+    assert ft.write_memory_plan(plan_file) == [2]
+
+
+def test_write_memory_plan_refuses_tag_transceiver_would_cut(ft, emulator, plan_file):
+    plan = ft.load_memory_plan(plan_file)
+    plan[0]["tag"] = "Zagarski vrh 1"
+    received = emulator.received
+
+    with pytest.raises(ParameterError):
+        ft.write_memory_plan(plan)
+    assert emulator.received == received
@@ -0,0 +1,61 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import os
+
+import pytest
+
+from menu import Menu, MenuItemNotFoundError, MenuParameterError
+
+LAST_SETTINGS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src", "last_settings.dat")
+
+
+def test_every_saved_rig_value_is_valid():
+    menu = Menu()
+    with open(LAST_SETTINGS, "r") as s_file:
+        answers = [line.strip() for line in s_file if line.startswith("EX")]
+    assert len(answers) == len(menu.MENU_ITEMS)
+    for answer in answers:
+        item = menu.get_menu_function(answer[2:5])
+        if item.digits:
+            assert item.format_value(answer[5:-1]) == answer[5:-1], answer
+
+
+def test_find_by_number_or_name():
+    menu = Menu()
+    assert menu.get_menu_function(31) is menu.get_menu_function("031")
+    assert menu.get_menu_function("cat-rate") is menu.find("CAT RATE")
+    with pytest.raises(MenuItemNotFoundError):
+        menu.get_menu_function(999)
+    with pytest.raises(MenuItemNotFoundError):
+        menu.find("NO SUCH ITEM")
+
+
+def test_ranges_parsed_from_description():
+    menu = Menu()
+    delay = menu.get_menu_function("AGC FAST DELAY")
+    assert (delay.minimum, delay.maximum, delay.digits) == (20, 4000, 4)
+    assert menu.get_menu_function("CAT RATE").choices == (0, 1, 2, 3)
+    contour = menu.get_menu_function("CONTOUR LEVEL")
+    assert (contour.minimum, contour.maximum, contour.signed) == (-40, 20, True)
+
+
+def test_format_value():
+    menu = Menu()
+    assert menu.get_menu_function("AGC FAST DELAY").format_value(20) == "0020"
+    assert menu.get_menu_function("OTHER DISP (SSB)").format_value(-1500) == "-1500"
+    assert menu.get_menu_function("OTHER DISP (SSB)").format_value("+1500") == "+1500"
+    assert menu.get_menu_function("DATA PORT SELECT").format_value(0) == "0"
+    for num, value in ((1, 10), (31, 4), (64, 3010), (1, "abcd")):
+        with pytest.raises(MenuParameterError):
+            menu.get_menu_function(num).format_value(value)
+    with pytest.raises(MenuParameterError):
+        menu.get_menu_function("RADIO ID").format_value("0")
+
+
+def test_write_commands_validate_everything_first():
+    menu = Menu()
+    assert menu.write_commands({"CAT TOT": 1, 64: -1500}) == ["EX0321;", "EX064-1500;"]
+    with pytest.raises(MenuParameterError):
+        menu.write_commands({"CAT TOT": 1, "CAT RATE": 9})
@@ -0,0 +1,81 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import urllib.error
+import urllib.request
+
+import pytest
+
+from ft991a_metrics import LatencyHistogram, Metrics
+
+
+def test_histogram_percentiles_within_bucket_resolution():
+    histogram = LatencyHistogram(sub_buckets=16)
+    for ms in range(1, 101):
+        histogram.add(ms / 1000)
+
+    assert histogram.count == 100
+    assert (histogram.min, histogram.max) == (0.001, 0.1)
+    for p in (50, 90, 99):
+        assert p / 1000 <= histogram.percentile(p) <= p / 1000 * (1 + 1 / 16)
+    assert histogram.percentile(100) == 0.1
+    assert histogram.cumulative((0.0105, 1.0)) == [10, 100]
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_metrics_count_commands_and_methods(ft, emulator):
+    metrics = ft.enable_metrics()
+    ft.read_vfo()
+    ft.set_vfo("7.1M")
+    ft.batch(["FA;", "FA123;", "AG0;"], raise_errors=False)
+    ft.disable_metrics()
+    ft.read_vfo()
+
+    snapshot = metrics.snapshot()
+    assert snapshot["labels"] == {"port": emulator.port}
+    assert snapshot["commands"]["FA"]["calls"] == 4
+    assert snapshot["commands"]["FA"]["errors"] == 1
+    assert snapshot["commands"]["AG"]["calls"] == 1
+    assert snapshot["methods"]["read_vfo"]["calls"] == 1
+    assert snapshot["methods"]["read_vfo"]["latency"]["p50"] > 0
+
+
+def test_prometheus_text():
+    metrics = Metrics({"port": "/dev/tty\"0\""})
+    metrics.observe_command("FA;", 0.004, 3, 12)
+    metrics.observe_command("FA;", None, 3, 0, timeout=True)
+    metrics.observe_method("read_vfo", 0.004)
+    lines = metrics.prometheus().splitlines()
+
+    assert "# TYPE ft991a_command_calls_total counter" in lines
+    assert 'ft991a_command_calls_total{port="/dev/tty\\"0\\"",command="FA"} 2' in lines
+    assert 'ft991a_command_timeouts_total{port="/dev/tty\\"0\\"",command="FA"} 1' in lines
+    assert 'ft991a_command_latency_seconds_bucket{port="/dev/tty\\"0\\"",command="FA",le="0.002"} 0' in lines
+    assert 'ft991a_command_latency_seconds_bucket{port="/dev/tty\\"0\\"",command="FA",le="0.005"} 1' in lines
+    assert 'ft991a_method_calls_total{port="/dev/tty\\"0\\"",method="read_vfo"} 1' in lines
+
+
+def test_serve_over_http():
+    metrics = Metrics()
+    metrics.observe_method("read_vfo", 0.004)
+    server = metrics.serve(port=0)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain")
+            assert response.read().decode("utf-8") == metrics.prometheus()
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/other", timeout=5)
+    finally:
+        metrics.stop_serving()
+
+
+def test_enable_metrics_twice_does_not_wrap_again(ft):
+    ft.enable_metrics()
+    metrics = ft.enable_metrics()
+    ft.read_vfo()
+
+    assert not hasattr(ft.read_vfo.__wrapped__, "__wrapped__")
+    assert metrics.snapshot()["methods"]["read_vfo"]["calls"] == 1
+    ft.disable_metrics()
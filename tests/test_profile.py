@@ -0,0 +1,59 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import json
+
+import pytest
+
+from ft991a import ParameterError
+from ft991a_profile import Profile, ProfileError, ProfileSwitcher, available_profiles
+
+
+def test_profile_targets_in_restore_order():
+    targets = Profile.load("ft8").targets()
+
+    assert targets["MD0;"] == "MD0C;"
+    assert targets["PC;"] == "PC008;"
+    assert list(targets)[-1] == "FA;"
+    codes = [read[:2] for read in targets]
+    assert codes.index("EX") < codes.index("MD") < codes.index("SH")
+    assert "ft8" in available_profiles()
+
+
+def test_bad_profiles_are_refused(tmp_path):
+    with pytest.raises(ProfileError):
+        Profile.load("no such profile")
+    file_name = tmp_path / "bad.json"
+    file_name.write_text(json.dumps({"name": "bad", "colour": "red"}))
+    with pytest.raises(ProfileError):
+        Profile.load(str(file_name))
+    with pytest.raises(ParameterError):
+        Profile("bad", mode="SSB").targets()
+    with pytest.raises(ProfileError):
+        Profile("bad", panel={"AG0100": ""}).targets()
+
+
+def test_deltas_send_nothing(ft, emulator, tmp_path):
+    switcher = ProfileSwitcher(ft, rollback_file=str(tmp_path / "rollback.json"))
+    deltas = switcher.deltas(Profile.load("ft8"))
+
+    assert "MD0C;" in deltas
+    assert "FA014074000;" in deltas
+    assert emulator.state["MD0;"] == "MD02;"
+    assert switcher.saved() == {}
+
+
+def test_profile_apply_and_rollback(ft, tmp_path):
+    before = ft.snapshot()
+    switcher = ProfileSwitcher(ft, rollback_file=str(tmp_path / "rollback.json"))
+
+    result = switcher.apply(Profile.load("ft8"))
+    assert result.changes
+    assert ft.read_mode() == "DATA-USB"
+    assert switcher.apply(Profile.load("ft8")).changes == []
+    switcher.apply(Profile.load("rtty"))
+
+    switcher.rollback()
+    assert ft.snapshot() == before
+    assert switcher.saved() == {}
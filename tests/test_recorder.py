@@ -0,0 +1,63 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import math
+
+import pytest
+
+from ft991a import Ft991a
+from ft991a_recorder import INBOUND, OUTBOUND, ReplayMismatchError, load_recording, round_trips
+
+
+@pytest.fixture
+def recording(ft, tmp_path):
+    file_name = str(tmp_path / "traffic.log")
+    for frequency in ("7.1M", "3.5M"):
+        ft.start_recording(file_name)
+        ft.set_vfo(frequency)
+        ft.read_vfo()
+        ft.stop_recording()
+    return file_name
+
+
+def test_load_recording_sessions(ft, recording):
+    sessions = load_recording(recording)
+
+    assert len(sessions) == 2
+    assert sessions[0].serial_port == ft.serial_port
+    assert sessions[0].baud_rate == 38400
+    assert [(record.direction, record.data) for record in sessions[1].records] == [
+        (OUTBOUND, "FA003500000;"), (OUTBOUND, "FA;"), (INBOUND, "FA003500000;")]
+    assert list(round_trips(sessions[1])) == ["FA"]
+    assert 0 < round_trips(sessions[1])["FA"][0] < 1
+
+
+def test_replay_checks_writes(recording):
+    replay = Ft991a.replay(recording, session=0, speed=math.inf)
+    with pytest.raises(ReplayMismatchError):
+        replay.set_vfo("3.5M")
+
+    replay = Ft991a.replay(recording, session=0, speed=math.inf, strict=False)
+    replay.set_vfo("3.5M")
+    replay.set_vfo("7.1M")
+    assert replay.read_vfo() == 7100000
+    assert replay.ser.mismatches == 1
+    assert replay.ser.finished
+
+
+def test_replay_answers_like_recorded_session(ft, tmp_path):
+    recording = str(tmp_path / "traffic.log")
+    ft.start_recording(recording)
+    recorded = [ft.read_vfo(), ft.read_status(), ft.read_menu([31, 32])]
+    ft.set_vfo("7.1M")
+    recorded.append(ft.read_vfo())
+    ft.stop_recording()
+
+    replay = Ft991a.replay(recording, speed=math.inf)
+    replayed = [replay.read_vfo(), replay.read_status(), replay.read_menu([31, 32])]
+    replay.set_vfo("7.1M")
+    replayed.append(replay.read_vfo())
+
+    assert replayed == recorded
+    assert replay.ser.finished
@@ -0,0 +1,53 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import socket
+import threading
+
+import pytest
+
+from ft991a_rigctld import RIG_EINVAL, RIG_ENIMPL, Ft991aRigctlServer
+
+
+@pytest.fixture
+def server(ft):
+    server = Ft991aRigctlServer(ft, port=0)
+    server.start()
+    yield server
+    server.stop()
+
+
+def ask(server, text: str, lines: int) -> list:
+    with socket.create_connection(server.server_address, timeout=5) as client:
+        client.sendall(text.encode("ascii"))
+        answer = client.makefile("r")
+        return [answer.readline().rstrip("\n") for _ in range(lines)]
+
+
+def test_commands_over_tcp(server, emulator):
+    assert ask(server, "F 7074000\nf\n", 2) == ["RPRT 0", "7074000"]
+    assert emulator.state["FA;"] == "FA007074000;"
+    assert ask(server, "M PKTUSB 0 \\get_mode\n", 3) == ["RPRT 0", "PKTUSB", "0"]
+    assert ask(server, "+f\n", 3) == ["get_freq:", "Frequency: 7074000", "RPRT 0"]
+    assert ask(server, "l AF\n", 1) == [f"{100 / 255:.6f}"]
+
+
+def test_errors_are_reported_as_hamlib_codes(server):
+    assert ask(server, "L FOO 1\n", 1) == [f"RPRT {RIG_EINVAL}"]
+    assert ask(server, "F 7.1.0\n", 1) == [f"RPRT {RIG_EINVAL}"]
+    assert ask(server, "\\get_rit\n", 1) == [f"RPRT {RIG_ENIMPL}"]
+
+
+def test_clients_share_identical_reads(server, emulator):
+    emulator.response_latency = 0.1
+    answers = []
+    clients = [threading.Thread(target=lambda: answers.extend(ask(server, "f\n", 1))) for _ in range(5)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+
+    assert answers == ["14250000"] * 5
+    assert server.reads == 5
+    assert server.coalesced >= 1
@@ -0,0 +1,46 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import pytest
+
+from ft991a import ParameterError
+from ft991a_config import Ft991aConfig
+from ft991a_scanner import BandScanner
+
+
+@pytest.fixture(params=[0.0, 0.001], ids=["pipelined", "dwell"])
+def dwell(request):
+    return request.param
+
+
+def test_finds_signals_and_restores_vfo(ft, emulator, dwell):
+    emulator.signals = {14100000: 200, 14200000: 90}
+    result = BandScanner(ft, "14.05M", "14.25M", "10k", dwell=dwell).scan()
+
+    assert len(result) == 21
+    assert result.errors == 0
+    assert result.strongest() == (14100000, 200)
+    assert [frequency for frequency, _ in result.above(80)] == [14100000, 14200000]
+    assert ft.read_vfo() == 14250000
+
+
+def test_stops_on_busy_frequency(ft, emulator, dwell):
+    emulator.signals = {14150000: 200}
+    ft.set_squelch_level(50)
+    result = BandScanner(ft, "14.1M", "14.2M", "10k", dwell=dwell, stop_on_busy=True).scan()
+
+    assert result.busy_frequency == 14150000
+    assert result.count == 6
+    assert ft.read_vfo() == 14150000
+
+
+def test_settles_by_default():
+    assert BandScanner(None, "14M", "14.1M", "10k").dwell == Ft991aConfig.scan_dwell > 0
+
+
+def test_rejects_bad_range():
+    with pytest.raises(ParameterError):
+        BandScanner(None, "14M", "14.1M", 0)
+    with pytest.raises(ParameterError):
+        BandScanner(None, "14.1M", "14M", "10k")
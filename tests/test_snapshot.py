@@ -0,0 +1,50 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+from ft991a import Ft991a
+from ft991a_config import Ft991aConfig
+
+
+def test_restore_brings_back_snapshot(ft):
+    before = ft.snapshot()
+    assert before["FA;"] == "FA014250000;"
+    assert before["EX032;"].startswith("EX032")
+
+    ft.set_vfo("7.1M")
+    ft.set_af_gain(200)
+    ft.set_mode("CW")
+
+    changes = ft.restore(before)
+    assert sorted(changes) == sorted([before["FA;"], before["AG0;"], before["MD0;"]])
+    assert changes[-1] == before["FA;"]
+    assert ft.snapshot() == before
+
+
+def test_restore_sends_nothing_when_unchanged(ft, emulator):
+    snapshot = ft.snapshot()
+    reads = [read for read in snapshot if read not in Ft991aConfig.restore_skip]
+    received = emulator.received
+    assert ft.restore(snapshot) == []
+    assert ft.restore(snapshot) == []
+    # Only reads went out
+    assert emulator.received - received == 2 * sum(len(read) for read in reads)
+
+
+def test_restore_skips_tuner_and_auto_information(ft, emulator):
+    snapshot = ft.snapshot()
+    snapshot["AC;"] = "AC002;"
+    snapshot["AI;"] = "AI1;"
+    snapshot["PS;"] = "PS0;"
+
+    assert ft.restore(snapshot) == []
+    assert emulator.state["AI;"] == "AI0;"
+    assert emulator.state["PS;"] == "PS1;"
+    assert ft.read_command("AC") != "AC002"
+
+
+def test_snapshot_file_round_trip(ft, tmp_path):
+    snapshot = ft.snapshot()
+    file_name = str(tmp_path / "snapshot.dat")
+    Ft991a.save_snapshot(snapshot, file_name)
+    assert Ft991a.load_snapshot(file_name) == snapshot
@@ -0,0 +1,50 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import time
+
+from ft991a_telemetry import RingBuffer, TelemetrySampler
+
+
+def test_ring_buffer_keeps_newest_samples():
+    buffer = RingBuffer(3)
+    assert buffer.latest() is None
+    assert buffer.max() is None
+    for i, value in enumerate((10, 20, 30, 40)):
+        buffer.append(float(i), value)
+
+    assert len(buffer) == 3
+    assert buffer.samples() == [(1.0, 20), (2.0, 30), (3.0, 40)]
+    assert buffer.latest() == (3.0, 40)
+    assert (buffer.min(), buffer.max(), buffer.mean()) == (20, 40, 30)
+    assert buffer.percentile(50) == 30
+
+
+def test_sampler_reads_meters_and_calls_thresholds(ft, emulator):
+    emulator.meters.update({"SM": 120, "SWR": 90, "PO": 200})
+    alarms = []
+    sampler = TelemetrySampler(ft, meters=("SM", "SWR", "PO"), size=100)
+    sampler.add_threshold("SWR", 50, lambda meter, value, timestamp: alarms.append((meter, value)), tx_only=True)
+    sampler.add_threshold("SM", 100, lambda meter, value, timestamp: alarms.append((meter, value)))
+
+    sampler.sample()
+    assert alarms == [("SM", 120)]
+    ft.tx_on()
+    sampler.sample()
+    ft.tx_off()
+
+    assert alarms == [("SM", 120), ("SM", 120), ("SWR", 90)]
+    assert sampler.buffers["PO"].samples()[-1][1] == 200
+    assert (sampler.cycles, sampler.errors) == (2, 0)
+
+
+def test_sampler_thread(ft, emulator):
+    sampler = TelemetrySampler(ft, meters=("SM",), size=10)
+    sampler.start()
+    time.sleep(0.2)
+    sampler.stop()
+
+    assert sampler.cycles > 1
+    assert len(sampler.buffers["SM"]) == min(sampler.cycles, 10)
+    assert sampler.buffers["SM"].latest()[1] == emulator.meters["SM"]
@@ -0,0 +1,45 @@
+# Documentation is like sex.
+# When it's good, it's very good.
+# When it's bad, it's better than nothing.
+# When it lies to you, it may be a while before you realize something's wrong.
+import pytest
+
+from ft991a import TuneTimeoutError
+from ft991a_tune_cache import TuneCache
+
+
+@pytest.fixture
+def tune_file(ft, emulator, tmp_path):
+    emulator.tune_time = 0.2
+    file_name = str(tmp_path / "tune.json")
+    ft.tune_cache = TuneCache(ft.serial_port, file_name)
+    return file_name
+
+
+def test_tune_skips_recently_tuned_segment(ft, emulator, tune_file):
+    assert ft.tune("14.074M")
+    assert ft.read_antenna_tuner().on
+    assert ft.read_vfo() == 14074000
+    assert not ft.tune("14.076M")
+    assert ft.tune("14.2M")
+    assert ft.tune("14.2M", force=True)
+
+    cache = TuneCache(ft.serial_port, tune_file)
+    assert cache.is_tuned(14074000)
+    cache.forget(14074000)
+    assert not TuneCache(ft.serial_port, tune_file).is_tuned(14074000)
+    assert TuneCache("/dev/other", tune_file).is_tuned(14200000) is False
+
+
+def test_skipped_tune_turns_tuner_on(ft, emulator, tune_file):
+    ft.tune("7.074M")
+    ft.antenna_tuner_ctrl("OFF")
+    assert not ft.tune()
+    assert ft.read_antenna_tuner().on
+
+
+def test_wait_tune_complete_times_out(ft, emulator, tune_file):
+    emulator.tune_time = 5.0
+    ft.antenna_tuner_ctrl("TUNE")
+    with pytest.raises(TuneTimeoutError):
+        ft.wait_tune_complete(timeout=0.2)